@@ -5,10 +5,12 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import Config
+from app.services.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 
 
@@ -16,18 +18,47 @@ def create_app(config_class=Config):
     """应用工厂函数"""
     app = Flask(__name__)
     app.config.from_object(config_class)
+    
+    # 位于反向代理之后时从 X-Forwarded-For 获取真实客户端 IP（限流按 IP 计数）
+    if app.config.get('PROXY_COUNT'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'])
+
+    from app.services import pool_metrics, db_routing, json_provider, request_metrics, sql_profiler, tracing
+    from app.services import token_cache
+    json_provider.init_app(app)
+    pool_metrics.configure(app)
 
     # 初始化扩展
     db.init_app(app)
+    db_routing.init_app(app)
+    pool_metrics.init_app(app)
+    request_metrics.init_app(app)
+    sql_profiler.init_app(app)
+    tracing.init_app(app)
     jwt.init_app(app)
+    token_cache.init_app(app)
     CORS(app)
 
+    from app.services.borrow_store import borrow_events
+    from app.services import singleflight, passwords, rate_limit, revocation, user_cache, compression, enrollment
+    borrow_events.init_app(app)
+    singleflight.init_app(app)
+    passwords.init_app(app)
+    rate_limit.init_app(app)
+    revocation.init_app(app)
+    user_cache.init_app(app)
+    compression.init_app(app)
+    enrollment.init_app(app)
+
     # 注册蓝图
-    from app.routes import auth_bp, books_bp, borrows_bp, users_bp, statistics_bp
+    from app.routes import auth_bp, books_bp, borrows_bp, users_bp, statistics_bp, metrics_bp, prometheus_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(books_bp, url_prefix='/api/books')
     app.register_blueprint(borrows_bp, url_prefix='/api/borrows')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(statistics_bp, url_prefix='/api/statistics')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    app.register_blueprint(prometheus_bp)
+    tracing.trace_views(app)
 
     return app
@@ -0,0 +1,196 @@
+"""
+异步（ASGI）读路径
+
+    uvicorn asgi:app
+
+图书列表、图书详情与借阅记录列表由协程处理，查询使用 SQLAlchemy 异步引擎，
+等待数据库期间不占用线程，单个进程可同时挂起大量进行中的请求。
+其余请求转交 Flask 应用（asgiref 在线程池中执行 WSGI 调用）。
+
+限流、JWT 校验、CORS 等仍由 Flask 完成：协程内推入 Flask 请求上下文，
+before_request 钩子与令牌校验放到线程中执行（可能查询数据库），
+响应经过 after_request 钩子，因此两条路径的响应格式、错误码和限流规则一致。
+"""
+import asyncio
+import re
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.test import EnvironBuilder
+
+from app.models import Book, Borrow
+from app.routes.books import book_search_filters
+from app.routes.borrows import borrow_list_filters, mark_overdue
+from app.services import async_db
+from app.services.db_routing import choose_replica
+
+
+async def get_books():
+    """查询图书列表（与 GET /api/books 相同）"""
+    app = current_app._get_current_object()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', app.config.get('ITEMS_PER_PAGE', 10), type=int)
+    statement = select(Book).where(*book_search_filters(request.args)).order_by(Book.created_at.desc())
+
+    async with async_db.get_session(app, choose_replica(app)) as session:
+        pagination = await async_db.paginate(session, statement, page, per_page)
+
+    books = [book.to_dict() for book in pagination.items]
+    for book in books:
+        book['available'] = book['available_stock'] > 0
+
+    return jsonify({
+        'books': books,
+        'pagination': _pagination(pagination)
+    }), 200
+
+
+async def get_book(book_id: int):
+    """获取图书详情（与 GET /api/books/<id> 相同）"""
+    app = current_app._get_current_object()
+    async with async_db.get_session(app, choose_replica(app)) as session:
+        book = await session.get(Book, book_id)
+
+    if not book:
+        return jsonify({'error': {'code': 'BOOK_NOT_FOUND', 'message': '图书不存在'}}), 404
+
+    book_dict = book.to_dict()
+    book_dict['available'] = book.available_stock > 0
+
+    return jsonify({'book': book_dict}), 200
+
+
+async def get_borrows():
+    """获取借阅记录（与 GET /api/borrows 相同）"""
+    app = current_app._get_current_object()
+    is_admin = get_jwt().get('role') == 'admin'
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', app.config.get('ITEMS_PER_PAGE', 10), type=int)
+    statement = (
+        select(Borrow)
+        .where(*borrow_list_filters(request.args, int(get_jwt_identity()), is_admin))
+        .options(selectinload(Borrow.user), selectinload(Borrow.book))
+        .order_by(Borrow.created_at.desc())
+    )
+
+    async with async_db.get_session(app) as session:
+        pagination = await async_db.paginate(session, statement, page, per_page)
+
+    return jsonify({
+        'borrows': mark_overdue([borrow.to_dict() for borrow in pagination.items]),
+        'pagination': _pagination(pagination)
+    }), 200
+
+
+# (路径正则, 视图, 认证方式)：'optional' 携带令牌时校验，'required' 必须登录
+ROUTES = [
+    (re.compile(r'^/api/books$'), get_books, 'optional'),
+    (re.compile(r'^/api/books/(?P<book_id>\d+)$'), get_book, 'optional'),
+    (re.compile(r'^/api/borrows$'), get_borrows, 'required'),
+]
+
+
+def _pagination(pagination) -> dict:
+    return {
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev
+    }
+
+
+def _environ(app, scope) -> dict:
+    """由 ASGI scope 构造 WSGI environ（与 create_app 相同地处理反向代理头）"""
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = EnvironBuilder(
+        path=scope['path'],
+        base_url=f"{scope.get('scheme', 'http')}://localhost{scope.get('root_path', '')}",
+        method=scope['method'],
+        headers=[(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', [])],
+        environ_base={'REMOTE_ADDR': client[0], 'REMOTE_PORT': client[1]},
+    ).get_environ()
+    # WSGI 约定 QUERY_STRING 为原始字节按 latin-1 解码的字符串
+    environ['QUERY_STRING'] = scope.get('query_string', b'').decode('latin-1')
+    if app.config.get('PROXY_COUNT'):
+        environ = ProxyFix(lambda env, start_response: env, x_for=app.config['PROXY_COUNT'])(environ, None)
+    return environ
+
+
+def _before_request(app, auth: str):
+    """执行 before_request 钩子（限流）并校验令牌，返回需要直接响应的结果或 None"""
+    rv = app.preprocess_request()
+    if rv is None and auth:
+        verify_jwt_in_request(optional=auth == 'optional')
+    return rv
+
+
+async def _dispatch(app, view, auth: str, scope, send, **kwargs) -> None:
+    # 推入上下文时按同步路由匹配端点（限流规则按端点名查找）
+    ctx = app.request_context(_environ(app, scope))
+    ctx.push()
+    try:
+        try:
+            rv = await asyncio.to_thread(_before_request, app, auth)
+            if rv is None:
+                rv = await view(**kwargs)
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.process_response(app.make_response(rv))
+    except Exception as e:
+        response = app.make_response(app.handle_exception(e))
+    finally:
+        ctx.pop()
+
+    body = response.get_data()
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(app, receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_db.dispose_engines(app)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def create_asgi_app(app):
+    """
+    创建 ASGI 应用：只读接口走协程，其余请求转交 Flask
+
+    Args:
+        app: create_app 创建的 Flask 应用
+
+    Raises:
+        RuntimeError: 缺少 asgiref、greenlet 或异步数据库驱动
+    """
+    async_db.check_dependencies(app)
+    from asgiref.wsgi import WsgiToAsgi
+
+    wsgi = WsgiToAsgi(app)
+
+    async def asgi(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await _lifespan(app, receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, view, auth in ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    kwargs = {k: int(v) for k, v in match.groupdict().items()}
+                    return await _dispatch(app, view, auth, scope, send, **kwargs)
+        return await wsgi(scope, receive, send)
+
+    asgi.flask_app = app
+    return asgi
@@ -4,5 +4,11 @@
 from app.models.user import User
 from app.models.book import Book
 from app.models.borrow import Borrow, BorrowStatus
+from app.models.cohort import CohortRetention
+from app.models.sketch import ReaderSketch
+from app.models.revocation import TokenRevocation
+from app.models.summary import ReaderSummary
+from app.models.import_job import ImportJob
 
-__all__ = ['User', 'Book', 'Borrow', 'BorrowStatus']
+__all__ = ['User', 'Book', 'Borrow', 'BorrowStatus', 'CohortRetention', 'ReaderSketch', 'TokenRevocation',
+           'ReaderSummary', 'ImportJob']
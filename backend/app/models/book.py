@@ -129,5 +129,5 @@ class Book(db.Model):
             'location': self.location,
             'total_stock': self.total_stock,
             'available_stock': self.available_stock,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
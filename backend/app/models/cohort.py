@@ -0,0 +1,28 @@
+"""
+读者留存队列数据模型
+"""
+from datetime import datetime
+from app import db
+
+
+class CohortRetention(db.Model):
+    """
+    读者留存矩阵
+
+    每行对应一个注册月份队列（cohort_month）在注册后第 month_offset 个月
+    仍有借阅行为的读者数，由留存计算任务每日增量更新。
+    """
+    __tablename__ = 'cohort_retention'
+    __table_args__ = (
+        db.UniqueConstraint('cohort_month', 'month_offset', name='uq_cohort_month_offset'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    cohort_month = db.Column(db.Date, nullable=False)
+    month_offset = db.Column(db.SmallInteger, nullable=False)
+    cohort_size = db.Column(db.Integer, default=0, nullable=False)
+    active_users = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<CohortRetention {self.cohort_month} +{self.month_offset}>'
@@ -0,0 +1,48 @@
+"""
+读者批量导入任务数据模型
+"""
+from datetime import datetime
+from app import db
+
+
+class ImportJob(db.Model):
+    """
+    读者批量导入任务
+
+    导入接口创建任务后立即返回，后台线程完成校验、哈希与写入后更新状态与报告。
+    任务保存在数据库中，任一工作进程都能查询进度。执行任务的工作进程被重启时，
+    任务停留在 running 状态，需要重新上传（已创建的读者会按“已存在”报告）。
+    status: pending（排队）、running（执行中）、done（完成）、failed（异常终止）
+    errors: 逐行错误报告 [{'row', 'username', 'code', 'message'}]
+    """
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    filename = db.Column(db.String(255))
+    total = db.Column(db.Integer, nullable=False, default=0)
+    created = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)
+    message = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> dict:
+        """将导入任务转换为字典（状态与报告）"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'total': self.total,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'message': self.message,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
@@ -0,0 +1,26 @@
+"""
+令牌吊销记录数据模型
+"""
+from datetime import datetime
+from app import db
+
+
+class TokenRevocation(db.Model):
+    """
+    令牌吊销记录
+
+    kind 为 jti 时 value 为被吊销令牌的 jti；kind 为 user 时 value 为用户ID，
+    表示该用户在 revoked_at 之前签发的所有令牌失效（禁用账户、变更角色）。
+    kind 为 family 时 value 为令牌族ID，同一次登录经轮换签发的全部令牌失效（refresh token 被重放）。
+    记录在 expires_at 之后不再有意义，会被定期清理。
+    """
+    __tablename__ = 'token_revocations'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(64), nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TokenRevocation {self.kind}:{self.value}>'
@@ -0,0 +1,27 @@
+"""
+读者基数草图数据模型
+"""
+from datetime import datetime
+from app import db
+
+
+class ReaderSketch(db.Model):
+    """
+    借阅读者 HyperLogLog 草图
+
+    scope 为 month 时 key 为 YYYY-MM；scope 为 book 时 key 为 <图书ID>:<年份>。
+    data 保存压缩后的寄存器数组。
+    """
+    __tablename__ = 'reader_sketches'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_reader_sketch_scope_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    scope = db.Column(db.String(10), nullable=False)
+    key = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReaderSketch {self.scope}:{self.key}>'
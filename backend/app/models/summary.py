@@ -0,0 +1,31 @@
+"""
+读者借阅汇总数据模型
+"""
+from datetime import datetime
+from app import db
+
+
+class ReaderSummary(db.Model):
+    """
+    读者借阅汇总
+
+    每个读者一行，借书、还书时在同一事务中增量更新：
+    - 各状态借阅数与总借阅数
+    - yearly_counts: {"年份": 借阅数}
+    - top_authors: Space-Saving 计数器 [[次数, 误差上界, 作者]]，最多保留固定数量的作者
+    - open_loans: 未归还借阅 [[借阅ID, 应还日期]]，用于计算当前逾期数
+    """
+    __tablename__ = 'reader_summaries'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_count = db.Column(db.Integer, default=0, nullable=False)
+    borrowed_count = db.Column(db.Integer, default=0, nullable=False)
+    returned_count = db.Column(db.Integer, default=0, nullable=False)
+    overdue_count = db.Column(db.Integer, default=0, nullable=False)
+    yearly_counts = db.Column(db.JSON, nullable=False, default=dict)
+    top_authors = db.Column(db.JSON, nullable=False, default=list)
+    open_loans = db.Column(db.JSON, nullable=False, default=list)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReaderSummary {self.user_id}>'
@@ -2,21 +2,29 @@
 用户数据模型
 """
 from datetime import datetime
-import bcrypt
 from app import db
+from app.services.passwords import get_password_hasher
 
 
 class User(db.Model):
     """用户模型"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # 管理员用户列表按角色、状态筛选后按注册时间倒序分页
+        db.Index('idx_users_role_active_created', 'role', 'is_active', 'created_at'),
+        db.Index('idx_users_active_created', 'is_active', 'created_at'),
+        db.Index('idx_users_created', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
+    # 学号（读者可选），唯一索引同时用于前缀搜索
+    student_id = db.Column(db.String(32), unique=True, nullable=True)
     role = db.Column(db.Enum('admin', 'reader'), default='reader', nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     # 关联借阅记录
     borrows = db.relationship('Borrow', backref='user', lazy='dynamic')
@@ -26,17 +34,12 @@ class User(db.Model):
 
     def set_password(self, password: str) -> None:
         """
-        使用 bcrypt 加密密码并存储
+        使用 bcrypt 加密密码并存储（在密码哈希进程池中计算）
         
         Args:
             password: 明文密码
         """
-        password_bytes = password.encode('utf-8')
-        # bcrypt 限制密码最大72字节，超出部分截断
-        if len(password_bytes) > 72:
-            password_bytes = password_bytes[:72]
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password: str) -> bool:
         """
@@ -48,12 +51,16 @@ class User(db.Model):
         Returns:
             密码是否匹配
         """
-        password_bytes = password.encode('utf-8')
-        # bcrypt 限制密码最大72字节，超出部分截断
-        if len(password_bytes) > 72:
-            password_bytes = password_bytes[:72]
-        hash_bytes = self.password_hash.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hash_bytes)
+        return get_password_hasher().verify(password, self.password_hash)
+
+    def password_needs_rehash(self) -> bool:
+        """
+        检查密码哈希的计算成本是否与当前配置一致
+        
+        Returns:
+            是否需要按当前成本重新哈希
+        """
+        return get_password_hasher().needs_rehash(self.password_hash)
 
     @staticmethod
     def is_valid_bcrypt_hash(hash_string: str) -> bool:
@@ -6,5 +6,7 @@ from app.routes.books import books_bp
 from app.routes.borrows import borrows_bp
 from app.routes.users import users_bp
 from app.routes.statistics import statistics_bp
+from app.routes.metrics import metrics_bp, prometheus_bp
 
-__all__ = ['auth_bp', 'books_bp', 'borrows_bp', 'users_bp', 'statistics_bp']
+__all__ = ['auth_bp', 'books_bp', 'borrows_bp', 'users_bp', 'statistics_bp', 'metrics_bp',
+           'prometheus_bp']
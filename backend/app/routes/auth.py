@@ -1,19 +1,42 @@
 """
 认证路由
 """
-import re
+import uuid
+
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import (
+    create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt_identity, get_jwt
+)
 from app import db
 from app.models.user import User
+from app.services.enrollment import validate_registration
+from app.services.passwords import PasswordPoolBusy
+from app.services.revocation import revoke_token
+from app.services.user_cache import get_user_state
 
 auth_bp = Blueprint('auth', __name__)
 
 
-def validate_email(email: str) -> bool:
-    """验证邮箱格式"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+def issue_tokens(user, family: str = None) -> dict:
+    """
+    签发 access token（携带角色等声明）与 refresh token
+
+    两者都带有令牌族ID（fam 声明）：登录时新建，轮换 refresh token 时沿用，
+    refresh token 被重放时按族整体吊销。
+    """
+    family = family or uuid.uuid4().hex
+    return {
+        'access_token': create_access_token(
+            identity=str(user.id),
+            additional_claims={
+                'username': user.username,
+                'role': user.role,
+                'email': user.email,
+                'fam': family
+            }
+        ),
+        'refresh_token': create_refresh_token(identity=str(user.id), additional_claims={'fam': family})
+    }
 
 
 @auth_bp.route('/register', methods=['POST'])
@@ -32,6 +55,7 @@ def register():
     - 201: 注册成功
     - 400: 参数验证失败
     - 409: 用户名或邮箱已存在
+    - 503: 服务繁忙（密码哈希队列已满）
     """
     data = request.get_json()
     
@@ -43,23 +67,11 @@ def register():
     password = data.get('password', '')
     email = data.get('email', '').strip()
     
-    # 验证用户名
-    if not username:
-        return jsonify({'error': {'code': 'INVALID_USERNAME', 'message': '用户名不能为空'}}), 400
-    if len(username) < 2 or len(username) > 50:
-        return jsonify({'error': {'code': 'INVALID_USERNAME', 'message': '用户名长度应在2-50个字符之间'}}), 400
-    
-    # 验证密码
-    if not password:
-        return jsonify({'error': {'code': 'INVALID_PASSWORD', 'message': '密码不能为空'}}), 400
-    if len(password) < 6:
-        return jsonify({'error': {'code': 'INVALID_PASSWORD', 'message': '密码长度至少6个字符'}}), 400
-    
-    # 验证邮箱格式
-    if not email:
-        return jsonify({'error': {'code': 'INVALID_EMAIL', 'message': '邮箱不能为空'}}), 400
-    if not validate_email(email):
-        return jsonify({'error': {'code': 'INVALID_EMAIL', 'message': '邮箱格式无效'}}), 400
+    # 验证用户名、密码与邮箱格式（与批量导入共用同一套规则）
+    error = validate_registration(username, password, email)
+    if error:
+        code, message = error
+        return jsonify({'error': {'code': code, 'message': message}}), 400
     
     # 检查用户名是否已存在
     if User.query.filter_by(username=username).first():
@@ -105,10 +117,11 @@ def login():
     }
     
     返回:
-    - 200: 登录成功，返回 JWT token
+    - 200: 登录成功，返回 access token 与 refresh token
     - 400: 参数验证失败
     - 401: 用户名或密码错误
     - 403: 账户已被禁用
+    - 503: 服务繁忙（密码校验队列已满）
     """
     data = request.get_json()
     
@@ -131,22 +144,26 @@ def login():
     if not user.is_active:
         return jsonify({'error': {'code': 'ACCOUNT_DISABLED', 'message': '账户已被禁用'}}), 403
     
-    # 生成 JWT token，包含用户角色信息
-    access_token = create_access_token(
-        identity=str(user.id),
-        additional_claims={
-            'username': user.username,
-            'role': user.role,
-            'email': user.email
-        }
-    )
+    # 密码哈希成本与当前配置不一致时，借登录时的明文密码透明升级；
+    # 哈希进程池繁忙时跳过升级（下次登录再做），不让已通过校验的登录失败
+    if user.password_needs_rehash():
+        try:
+            user.set_password(password)
+        except PasswordPoolBusy:
+            pass
+        else:
+            db.session.commit()
+    
+    # 生成 JWT token，access token 包含用户角色信息
+    tokens = issue_tokens(user)
     
     # 根据角色返回不同的重定向路径
     redirect_path = '/admin/dashboard' if user.role == 'admin' else '/reader/dashboard'
     
     return jsonify({
         'message': '登录成功',
-        'access_token': access_token,
+        'access_token': tokens['access_token'],
+        'refresh_token': tokens['refresh_token'],
         'user': {
             'id': user.id,
             'username': user.username,
@@ -157,15 +174,65 @@ def login():
     }), 200
 
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    刷新令牌
+    
+    请求头携带 refresh token。重新读取用户状态签发新的 access token，
+    并轮换 refresh token：旧的 refresh token 随即吊销，新令牌沿用同一令牌族。
+    旧的 refresh token 再次出现时整个令牌族被吊销，需重新登录。
+    
+    返回:
+    - 200: 刷新成功，返回新的 access token 与 refresh token
+    - 401: refresh token 无效、已过期或已被使用
+    - 403: 账户已被禁用
+    """
+    user = get_user_state(get_jwt_identity())
+    
+    if not user:
+        return jsonify({'error': {'code': 'USER_NOT_FOUND', 'message': '用户不存在'}}), 401
+    
+    if not user.is_active:
+        return jsonify({'error': {'code': 'ACCOUNT_DISABLED', 'message': '账户已被禁用'}}), 403
+    
+    claims = get_jwt()
+    revoke_token(claims)
+    db.session.commit()
+    
+    return jsonify(issue_tokens(user, claims.get('fam'))), 200
+
+
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
     """
     用户登出
     
+    吊销当前 access token（按 jti）；请求体中提供 refresh token 时一并吊销。
+    
+    请求体（可选）:
+    {
+        "refresh_token": "string"
+    }
+    
     返回:
     - 200: 登出成功
     """
-    # JWT 是无状态的，客户端只需删除 token 即可
-    # 这里可以添加 token 黑名单逻辑（如果需要）
+    revoke_token(get_jwt())
+    
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_claims = decode_token(data['refresh_token'])
+        except Exception:
+            refresh_claims = None
+        # 只吊销属于当前用户的 refresh token
+        if refresh_claims and refresh_claims.get('type') == 'refresh' \
+                and refresh_claims.get('sub') == get_jwt_identity():
+            revoke_token(refresh_claims)
+    
+    db.session.commit()
+    
     return jsonify({'message': '登出成功'}), 200
@@ -5,6 +5,9 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt
 from app import db
 from app.models.book import Book
+from app.services.borrow_store import borrow_events
+from app.services.singleflight import coalesce
+from app.services.db_routing import read_replica
 
 books_bp = Blueprint('books', __name__)
 
@@ -105,36 +108,27 @@ def add_book():
     }), 201
 
 
-@books_bp.route('', methods=['GET'])
-def get_books():
+def book_search_filters(args) -> list:
     """
-    查询图书列表
-    
-    查询参数:
-    - keyword: 搜索关键词（书名、作者、ISBN）
-    - title: 书名
-    - author: 作者
-    - isbn: ISBN
-    - page: 页码（默认1）
-    - per_page: 每页数量（默认10）
+    根据查询参数构建图书搜索条件（同步接口与异步读路径共用）
     
-    返回:
-    - 200: 查询成功
+    Args:
+        args: 查询参数（keyword、title、author、isbn）
+        
+    Returns:
+        过滤条件列表
     """
-    keyword = request.args.get('keyword', '').strip()
-    title = request.args.get('title', '').strip()
-    author = request.args.get('author', '').strip()
-    isbn = request.args.get('isbn', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', current_app.config.get('ITEMS_PER_PAGE', 10), type=int)
+    keyword = args.get('keyword', '').strip()
+    title = args.get('title', '').strip()
+    author = args.get('author', '').strip()
+    isbn = args.get('isbn', '').strip()
     
-    # 构建查询
-    query = Book.query
+    filters = []
     
     # 通用关键词搜索（书名、作者、ISBN）
     if keyword:
         keyword_filter = f'%{keyword}%'
-        query = query.filter(
+        filters.append(
             db.or_(
                 Book.title.ilike(keyword_filter),
                 Book.author.ilike(keyword_filter),
@@ -144,13 +138,40 @@ def get_books():
     
     # 精确字段搜索
     if title:
-        query = query.filter(Book.title.ilike(f'%{title}%'))
+        filters.append(Book.title.ilike(f'%{title}%'))
     
     if author:
-        query = query.filter(Book.author.ilike(f'%{author}%'))
+        filters.append(Book.author.ilike(f'%{author}%'))
     
     if isbn:
-        query = query.filter(Book.isbn.ilike(f'%{isbn}%'))
+        filters.append(Book.isbn.ilike(f'%{isbn}%'))
+    
+    return filters
+
+
+@books_bp.route('', methods=['GET'])
+@read_replica
+@coalesce
+def get_books():
+    """
+    查询图书列表
+    
+    查询参数:
+    - keyword: 搜索关键词（书名、作者、ISBN）
+    - title: 书名
+    - author: 作者
+    - isbn: ISBN
+    - page: 页码（默认1）
+    - per_page: 每页数量（默认10）
+    
+    返回:
+    - 200: 查询成功
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', current_app.config.get('ITEMS_PER_PAGE', 10), type=int)
+    
+    # 构建查询
+    query = Book.query.filter(*book_search_filters(request.args))
     
     # 分页
     pagination = query.order_by(Book.created_at.desc()).paginate(
@@ -177,6 +198,7 @@ def get_books():
 
 
 @books_bp.route('/<int:book_id>', methods=['GET'])
+@read_replica
 def get_book(book_id):
     """
     获取图书详情
@@ -265,6 +287,8 @@ def update_book(book_id):
     
     db.session.commit()
     
+    borrow_events.record_book(book)
+    
     return jsonify({
         'message': '图书更新成功',
         'book': book.to_dict()
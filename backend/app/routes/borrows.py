@@ -4,16 +4,20 @@
 from datetime import date
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import User, Book, Borrow, BorrowStatus
+from app.models import Book, Borrow, BorrowStatus
+from app.services.borrow_store import borrow_events
+from app.services import reader_sketches, reader_summary, tracing
+from app.services.db_routing import mark_write
+from app.services.user_cache import get_user_state
 
 borrows_bp = Blueprint('borrows', __name__)
 
 
 def get_current_user():
-    """获取当前登录用户"""
-    user_id = get_jwt_identity()
-    return User.query.get(int(user_id))
+    """获取当前登录用户的状态（角色、启用状态等，来自用户状态缓存）"""
+    return get_user_state(get_jwt_identity())
 
 
 def check_user_has_overdue(user_id: int) -> bool:
@@ -27,11 +31,12 @@ def check_user_has_overdue(user_id: int) -> bool:
         是否有逾期未还图书
     """
     today = date.today()
-    overdue_count = Borrow.query.filter(
-        Borrow.user_id == user_id,
-        Borrow.status == BorrowStatus.BORROWED.value,
-        Borrow.due_date < today
-    ).count()
+    with tracing.span('borrow.check_overdue', **{'user.id': user_id}):
+        overdue_count = Borrow.query.filter(
+            Borrow.user_id == user_id,
+            Borrow.status == BorrowStatus.BORROWED.value,
+            Borrow.due_date < today
+        ).count()
     return overdue_count > 0
 
 
@@ -70,13 +75,15 @@ def borrow_book():
     
     # 管理员可以为其他用户借书
     if claims.get('role') == 'admin' and data.get('user_id'):
-        borrower_id = data.get('user_id')
-        borrower = User.query.get(borrower_id)
+        borrower = get_user_state(data.get('user_id'))
         if not borrower:
             return jsonify({'error': {'code': 'USER_NOT_FOUND', 'message': '用户不存在'}}), 404
+        borrower_id = borrower.id
     else:
         borrower_id = current_user_id
-        borrower = User.query.get(borrower_id)
+        borrower = get_current_user()
+        if not borrower:
+            return jsonify({'error': {'code': 'USER_NOT_FOUND', 'message': '用户不存在'}}), 404
     
     # 检查用户是否被禁用
     if not borrower.is_active:
@@ -111,14 +118,61 @@ def borrow_book():
     book.available_stock -= 1
     
     db.session.add(borrow)
+    
+    # 更新去重读者草图与读者借阅汇总（与借阅记录同一事务提交）
+    reader_sketches.record_borrow(borrower_id, book_id, today)
+    reader_summary.record_borrow(borrow, book)
+    
     db.session.commit()
     
+    borrow_events.record_borrow(borrow, book)
+    # 随后一段时间内该客户端读主库，能看到刚扣减的库存
+    mark_write()
+    
     return jsonify({
         'message': '借阅成功',
         'borrow': borrow.to_dict()
     }), 201
 
 
+def borrow_list_filters(args, current_user_id: int, is_admin: bool) -> list:
+    """
+    根据查询参数与调用者身份构建借阅记录过滤条件（同步接口与异步读路径共用）
+    
+    Args:
+        args: 查询参数（user_id、status）
+        current_user_id: 当前用户ID
+        is_admin: 是否为管理员
+        
+    Returns:
+        过滤条件列表
+    """
+    user_id = args.get('user_id', type=int)
+    status = args.get('status', '').strip()
+    filters = []
+    
+    # 非管理员只能查看自己的借阅记录
+    if is_admin and user_id:
+        filters.append(Borrow.user_id == user_id)
+    elif not is_admin:
+        filters.append(Borrow.user_id == current_user_id)
+    
+    # 状态筛选
+    if status and status in [s.value for s in BorrowStatus]:
+        filters.append(Borrow.status == status)
+    
+    return filters
+
+
+def mark_overdue(borrows: list) -> list:
+    """为未归还的借阅记录字典标记是否逾期"""
+    today = date.today()
+    for borrow_dict in borrows:
+        if borrow_dict['status'] == BorrowStatus.BORROWED.value:
+            borrow_dict['is_overdue'] = today > borrow_dict['due_date']
+    return borrows
+
+
 @borrows_bp.route('', methods=['GET'])
 @jwt_required()
 def get_borrows():
@@ -139,37 +193,20 @@ def get_borrows():
     is_admin = claims.get('role') == 'admin'
     
     # 获取查询参数
-    user_id = request.args.get('user_id', type=int)
-    status = request.args.get('status', '').strip()
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', current_app.config.get('ITEMS_PER_PAGE', 10), type=int)
     
     # 构建查询
-    query = Borrow.query
-    
-    # 非管理员只能查看自己的借阅记录
-    if is_admin and user_id:
-        query = query.filter(Borrow.user_id == user_id)
-    elif not is_admin:
-        query = query.filter(Borrow.user_id == current_user_id)
-    
-    # 状态筛选
-    if status and status in [s.value for s in BorrowStatus]:
-        query = query.filter(Borrow.status == status)
+    query = Borrow.query.options(joinedload(Borrow.user), joinedload(Borrow.book)).filter(
+        *borrow_list_filters(request.args, current_user_id, is_admin)
+    )
     
     # 分页
     pagination = query.order_by(Borrow.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
-    borrows = [borrow.to_dict() for borrow in pagination.items]
-    
-    # 标记逾期记录
-    today = date.today()
-    for borrow_dict in borrows:
-        if borrow_dict['status'] == BorrowStatus.BORROWED.value:
-            due_date = date.fromisoformat(borrow_dict['due_date'])
-            borrow_dict['is_overdue'] = today > due_date
+    borrows = mark_overdue([borrow.to_dict() for borrow in pagination.items])
     
     return jsonify({
         'borrows': borrows,
@@ -231,8 +268,13 @@ def return_book(borrow_id):
     if book:
         book.available_stock += 1
     
+    reader_summary.record_return(borrow)
+    
     db.session.commit()
     
+    borrow_events.record_return(borrow)
+    mark_write()
+    
     response_data = {
         'message': '归还成功',
         'borrow': borrow.to_dict()
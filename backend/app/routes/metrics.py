@@ -0,0 +1,121 @@
+"""
+运行指标路由
+"""
+import hmac
+
+from flask import Blueprint, Response, jsonify, current_app, request
+from flask_jwt_extended import jwt_required, get_jwt
+from app.services.pool_metrics import all_engines, pool_status
+from app.services import request_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+# Prometheus 抓取地址 /metrics，不在 /api 之下
+prometheus_bp = Blueprint('prometheus', __name__)
+
+
+def require_admin():
+    """检查是否为管理员"""
+    claims = get_jwt()
+    return claims.get('role') == 'admin'
+
+
+@metrics_bp.route('/db', methods=['GET'])
+@jwt_required()
+def get_db_pool_metrics():
+    """
+    获取数据库连接池指标（管理员）
+    
+    每个引擎（主库、各 bind 及只读库）返回连接池大小、溢出上限、当前取出/空闲连接数，
+    以及累计的取连接次数、溢出次数、超时次数和取连接等待时间分布。
+    
+    返回:
+    - 200: 连接池指标
+    - 403: 权限不足
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看指标'}}), 403
+    
+    engines = {
+        name: pool_status(engine)
+        for name, engine in all_engines(current_app).items()
+    }
+    
+    return jsonify({'engines': engines}), 200
+
+
+@metrics_bp.route('/traces', methods=['GET'])
+@jwt_required()
+def get_traces():
+    """
+    最近记录的请求追踪（管理员）
+    
+    只包含处理该请求的工作进程记录的追踪；需要汇总时配置 TRACING_FILE。
+    
+    查询参数:
+    - limit: 返回条数（默认50，最大200）
+    - min_ms: 只返回耗时不少于该毫秒数的追踪
+    
+    返回:
+    - 200: 追踪摘要列表，按时间倒序
+    - 403: 权限不足
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看指标'}}), 403
+    
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    min_ms = request.args.get('min_ms', 0, type=float)
+    traces = current_app.extensions['trace_buffer'].recent(limit, min_ms)
+    
+    return jsonify({'traces': traces}), 200
+
+
+@metrics_bp.route('/traces/<trace_id>', methods=['GET'])
+@jwt_required()
+def get_trace(trace_id):
+    """
+    单个请求追踪的全部 span（管理员）
+    
+    返回 OTLP/JSON 格式（ExportTraceServiceRequest），可直接导入支持 OTLP 的追踪系统。
+    
+    返回:
+    - 200: 追踪详情
+    - 403: 权限不足
+    - 404: 追踪不存在（未采样或已被新的追踪覆盖）
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看指标'}}), 403
+    
+    trace = current_app.extensions['trace_buffer'].get(trace_id.lower())
+    if trace is None:
+        return jsonify({'error': {'code': 'NOT_FOUND', 'message': '追踪不存在'}}), 404
+    
+    return jsonify(trace), 200
+
+
+@prometheus_bp.route('/metrics', methods=['GET'])
+def get_prometheus_metrics():
+    """
+    Prometheus 指标（文本格式）
+    
+    包括各路由的请求数、耗时、响应大小、SQL 条数与耗时，缓存命中次数，以及连接池指标。
+    配置 METRICS_TOKEN 时需携带 Authorization: Bearer <METRICS_TOKEN>。
+    
+    返回:
+    - 200: 指标文本
+    - 401: 令牌缺失或错误
+    - 404: 未启用请求指标
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('REQUEST_METRICS_ENABLED'):
+        return jsonify({'error': {'code': 'NOT_FOUND', 'message': '未启用请求指标'}}), 404
+    
+    token = app.config.get('METRICS_TOKEN')
+    if token:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(provided.encode(), token.encode()):
+            return jsonify({'error': {'code': 'UNAUTHORIZED', 'message': '指标令牌无效'}}), 401
+    
+    return Response(
+        request_metrics.render(request_metrics.all_samples(app)),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -4,14 +4,24 @@
 import csv
 import io
 from datetime import datetime, date
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt
-from sqlalchemy import func, extract, desc
+from sqlalchemy import func, desc
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import User, Book, Borrow, BorrowStatus
+from app.models import User, Book, Borrow, BorrowStatus, CohortRetention
+from app.services.borrow_store import borrow_events, BUCKETS, GROUP_BY
+from app.services.singleflight import coalesce
+from app.services.db_routing import read_replica
+from app.services import reader_sketches
+from app.services.hll import HyperLogLog
+from app.services.cohort import get_retention_matrix, month_start, add_months, MAX_MONTH_OFFSET
 
 statistics_bp = Blueprint('statistics', __name__)
 
+# 导出时每次从数据库读取、向客户端发送的行数
+EXPORT_BATCH_SIZE = 500
+
 
 def require_admin():
     """检查是否为管理员"""
@@ -21,6 +31,8 @@ def require_admin():
 
 @statistics_bp.route('/borrows', methods=['GET'])
 @jwt_required()
+@read_replica
+@coalesce
 def get_borrow_statistics():
     """
     获取借阅统计
@@ -77,12 +89,12 @@ def get_borrow_period_stats(period: str, year: int) -> list:
     if period == 'month':
         # 按月统计
         stats = db.session.query(
-            extract('month', Borrow.borrow_date).label('period'),
+            Borrow.borrow_month.label('period'),
             func.count(Borrow.id).label('count')
         ).filter(
-            extract('year', Borrow.borrow_date) == year
+            Borrow.borrow_year == year
         ).group_by(
-            extract('month', Borrow.borrow_date)
+            Borrow.borrow_month
         ).order_by('period').all()
         
         # 填充所有月份
@@ -99,12 +111,12 @@ def get_borrow_period_stats(period: str, year: int) -> list:
     elif period == 'quarter':
         # 按季度统计
         stats = db.session.query(
-            func.ceil(extract('month', Borrow.borrow_date) / 3).label('period'),
+            Borrow.borrow_quarter.label('period'),
             func.count(Borrow.id).label('count')
         ).filter(
-            extract('year', Borrow.borrow_date) == year
+            Borrow.borrow_year == year
         ).group_by(
-            func.ceil(extract('month', Borrow.borrow_date) / 3)
+            Borrow.borrow_quarter
         ).order_by('period').all()
         
         # 填充所有季度
@@ -122,12 +134,13 @@ def get_borrow_period_stats(period: str, year: int) -> list:
     else:  # year
         # 按年统计（最近5年）
         stats = db.session.query(
-            extract('year', Borrow.borrow_date).label('period'),
+            Borrow.borrow_year.label('period'),
             func.count(Borrow.id).label('count')
         ).filter(
-            extract('year', Borrow.borrow_date) >= year - 4
+            Borrow.borrow_year >= year - 4,
+            Borrow.borrow_year <= year
         ).group_by(
-            extract('year', Borrow.borrow_date)
+            Borrow.borrow_year
         ).order_by('period').all()
         
         result = []
@@ -152,21 +165,29 @@ def get_book_ranking(year: int, limit: int) -> list:
     Returns:
         排行榜数据列表
     """
+    # 先在 (borrow_year, book_id) 索引上完成分组计数，再关联图书信息
+    counts = db.session.query(
+        Borrow.book_id,
+        func.count(Borrow.id).label('borrow_count')
+    ).filter(
+        Borrow.borrow_year == year
+    ).group_by(
+        Borrow.book_id
+    ).order_by(
+        desc('borrow_count')
+    ).limit(limit).subquery()
+    
     stats = db.session.query(
         Book.id,
         Book.title,
         Book.author,
         Book.isbn,
-        func.count(Borrow.id).label('borrow_count')
+        counts.c.borrow_count
     ).join(
-        Borrow, Book.id == Borrow.book_id
-    ).filter(
-        extract('year', Borrow.borrow_date) == year
-    ).group_by(
-        Book.id, Book.title, Book.author, Book.isbn
+        counts, Book.id == counts.c.book_id
     ).order_by(
-        desc('borrow_count')
-    ).limit(limit).all()
+        desc(counts.c.borrow_count)
+    ).all()
     
     return [{
         'rank': idx + 1,
@@ -188,22 +209,25 @@ def get_total_stats(year: int) -> dict:
     Returns:
         总体统计数据
     """
+    # 年度各状态借阅量（一次分组查询）
+    status_counts = dict(db.session.query(
+        Borrow.status,
+        func.count(Borrow.id)
+    ).filter(
+        Borrow.borrow_year == year
+    ).group_by(
+        Borrow.status
+    ).all())
+    
     # 年度总借阅量
-    total_borrows = Borrow.query.filter(
-        extract('year', Borrow.borrow_date) == year
-    ).count()
+    total_borrows = sum(status_counts.values())
     
     # 年度归还量
-    total_returns = Borrow.query.filter(
-        extract('year', Borrow.borrow_date) == year,
-        Borrow.status.in_([BorrowStatus.RETURNED.value, BorrowStatus.OVERDUE.value])
-    ).count()
+    total_returns = status_counts.get(BorrowStatus.RETURNED.value, 0) + \
+        status_counts.get(BorrowStatus.OVERDUE.value, 0)
     
     # 年度逾期量
-    total_overdue = Borrow.query.filter(
-        extract('year', Borrow.borrow_date) == year,
-        Borrow.status == BorrowStatus.OVERDUE.value
-    ).count()
+    total_overdue = status_counts.get(BorrowStatus.OVERDUE.value, 0)
     
     # 当前借阅中
     current_borrowed = Borrow.query.filter(
@@ -221,6 +245,8 @@ def get_total_stats(year: int) -> dict:
 
 @statistics_bp.route('/users', methods=['GET'])
 @jwt_required()
+@read_replica
+@coalesce
 def get_user_statistics():
     """
     获取用户统计
@@ -253,6 +279,49 @@ def get_user_statistics():
     }), 200
 
 
+@statistics_bp.route('/users/distinct', methods=['GET'])
+@jwt_required()
+@read_replica
+@coalesce
+def get_distinct_reader_statistics():
+    """
+    获取不同借阅读者数（HyperLogLog 近似值）
+    
+    查询参数:
+    - period: 统计周期 (month/quarter/year)，默认 month
+    - year: 年份，默认当前年
+    - book_id: 图书ID（可选，返回该图书当年的不同读者数）
+    
+    返回:
+    - 200: 统计数据
+    - 403: 权限不足
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看统计'}}), 403
+    
+    period = request.args.get('period', 'month').strip().lower()
+    year = request.args.get('year', date.today().year, type=int)
+    book_id = request.args.get('book_id', type=int)
+    
+    if period not in ['month', 'quarter', 'year']:
+        period = 'month'
+    
+    result = {
+        'year': year,
+        'approximate': True,
+        'relative_error': round(HyperLogLog().relative_error, 4)
+    }
+    
+    if book_id:
+        result['book_id'] = book_id
+        result['distinct_readers'] = reader_sketches.distinct_readers_for_book(book_id, year)
+    else:
+        result['period'] = period
+        result['period_stats'] = reader_sketches.distinct_readers_by_period(period, year)
+    
+    return jsonify(result), 200
+
+
 def get_user_ranking(year: int, limit: int) -> list:
     """
     获取活跃用户排行榜
@@ -264,20 +333,28 @@ def get_user_ranking(year: int, limit: int) -> list:
     Returns:
         排行榜数据列表
     """
+    # 先在 (borrow_year, user_id) 索引上完成分组计数，再关联用户信息
+    counts = db.session.query(
+        Borrow.user_id,
+        func.count(Borrow.id).label('borrow_count')
+    ).filter(
+        Borrow.borrow_year == year
+    ).group_by(
+        Borrow.user_id
+    ).order_by(
+        desc('borrow_count')
+    ).limit(limit).subquery()
+    
     stats = db.session.query(
         User.id,
         User.username,
         User.email,
-        func.count(Borrow.id).label('borrow_count')
+        counts.c.borrow_count
     ).join(
-        Borrow, User.id == Borrow.user_id
-    ).filter(
-        extract('year', Borrow.borrow_date) == year
-    ).group_by(
-        User.id, User.username, User.email
+        counts, User.id == counts.c.user_id
     ).order_by(
-        desc('borrow_count')
-    ).limit(limit).all()
+        desc(counts.c.borrow_count)
+    ).all()
     
     return [{
         'rank': idx + 1,
@@ -315,8 +392,112 @@ def get_user_stats() -> dict:
     }
 
 
+@statistics_bp.route('/events', methods=['GET'])
+@jwt_required()
+@read_replica
+@coalesce
+def get_event_statistics():
+    """
+    借阅事件分析（基于内存列式存储，不查询业务库）
+    
+    查询参数:
+    - bucket: 时间分桶 (day/week/month)，不传则不分桶
+    - group_by: 分组维度 (book/user/location/publisher/status)，不传则不分组
+    - start: 起始借阅日期（包含），格式 YYYY-MM-DD
+    - end: 截止借阅日期（不包含），格式 YYYY-MM-DD
+    - status: 借阅状态筛选 (borrowed/returned/overdue)
+    
+    返回:
+    - 200: 统计数据
+    - 400: 参数验证失败
+    - 403: 权限不足
+    - 503: 事件存储未启用
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看统计'}}), 403
+    
+    bucket = request.args.get('bucket', '').strip().lower() or None
+    group_by = request.args.get('group_by', '').strip().lower() or None
+    status = request.args.get('status', '').strip().lower() or None
+    
+    if bucket and bucket not in BUCKETS:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': f'bucket 必须是 {"/".join(BUCKETS)}'}}), 400
+    if group_by and group_by not in GROUP_BY:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': f'group_by 必须是 {"/".join(GROUP_BY)}'}}), 400
+    if status and status not in [s.value for s in BorrowStatus]:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '借阅状态无效'}}), 400
+    
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '日期格式应为 YYYY-MM-DD'}}), 400
+    
+    store = borrow_events.get_store()
+    if store is None:
+        return jsonify({'error': {'code': 'STORE_DISABLED', 'message': '借阅事件存储未启用'}}), 503
+    if not store.is_loaded:
+        return jsonify({'error': {'code': 'STORE_LOADING', 'message': '借阅事件存储正在加载，请稍后重试'}}), \
+            503, {'Retry-After': '5'}
+    
+    rows = store.aggregate(bucket=bucket, group_by=group_by, start=start, end=end, status=status)
+    
+    return jsonify({
+        'bucket': bucket,
+        'group_by': group_by,
+        'rows': rows,
+        'total': sum(row['count'] for row in rows)
+    }), 200
+
+
+@statistics_bp.route('/cohorts', methods=['GET'])
+@jwt_required()
+@read_replica
+@coalesce
+def get_cohort_statistics():
+    """
+    获取读者留存队列矩阵（读取每日预计算结果）
+    
+    查询参数:
+    - from: 起始注册月份，格式 YYYY-MM，默认为 11 个月前
+    - to: 截止注册月份，格式 YYYY-MM，默认为当前月
+    
+    返回:
+    - 200: 留存矩阵
+    - 400: 参数验证失败
+    - 403: 权限不足
+    """
+    if not require_admin():
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足，仅管理员可查看统计'}}), 403
+    
+    current_month = month_start(date.today())
+    try:
+        last_cohort = _parse_month(request.args.get('to')) or current_month
+        first_cohort = _parse_month(request.args.get('from')) or add_months(last_cohort, -11)
+    except ValueError:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '月份格式应为 YYYY-MM'}}), 400
+    
+    computed_at = db.session.query(func.max(CohortRetention.computed_at)).scalar()
+    
+    return jsonify({
+        'from': first_cohort.strftime('%Y-%m'),
+        'to': last_cohort.strftime('%Y-%m'),
+        'max_offset': MAX_MONTH_OFFSET,
+        'computed_at': computed_at.isoformat() if computed_at else None,
+        'cohorts': get_retention_matrix(first_cohort, last_cohort)
+    }), 200
+
+
+def _parse_month(value: str):
+    """解析 YYYY-MM 格式的月份，空值返回 None"""
+    if not value:
+        return None
+    return datetime.strptime(value.strip(), '%Y-%m').date()
+
+
 @statistics_bp.route('/export/borrows', methods=['GET'])
 @jwt_required()
+@read_replica
 def export_borrow_statistics():
     """
     导出借阅统计数据为 CSV
@@ -334,52 +515,41 @@ def export_borrow_statistics():
     
     year = request.args.get('year', date.today().year, type=int)
     
-    # 获取借阅记录
-    borrows = Borrow.query.filter(
-        extract('year', Borrow.borrow_date) == year
-    ).order_by(Borrow.borrow_date.desc()).all()
-    
-    # 生成 CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    # 分批读取借阅记录；用户和图书随记录一起查询，流式读取期间不能再发起其他查询
+    borrows = Borrow.query.options(
+        joinedload(Borrow.user), joinedload(Borrow.book)
+    ).filter(
+        Borrow.borrow_year == year
+    ).order_by(Borrow.borrow_date.desc()).yield_per(EXPORT_BATCH_SIZE)
     
-    # 写入表头
-    writer.writerow([
+    header = [
         '借阅ID', '用户ID', '用户名', '图书ID', '书名', 'ISBN',
         '借阅日期', '应还日期', '归还日期', '状态', '逾期天数'
-    ])
-    
-    # 写入数据
-    for borrow in borrows:
-        overdue_days = borrow.calculate_overdue_days() if borrow.return_date else 0
-        writer.writerow([
-            borrow.id,
-            borrow.user_id,
-            borrow.user.username if borrow.user else '',
-            borrow.book_id,
-            borrow.book.title if borrow.book else '',
-            borrow.book.isbn if borrow.book else '',
-            borrow.borrow_date.isoformat() if borrow.borrow_date else '',
-            borrow.due_date.isoformat() if borrow.due_date else '',
-            borrow.return_date.isoformat() if borrow.return_date else '',
-            borrow.status,
-            overdue_days if overdue_days > 0 else ''
-        ])
-    
-    # 返回 CSV 响应
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={
-            'Content-Disposition': f'attachment; filename=borrow_statistics_{year}.csv',
-            'Content-Type': 'text/csv; charset=utf-8'
-        }
-    )
+    ]
+    
+    def rows():
+        for borrow in borrows:
+            overdue_days = borrow.calculate_overdue_days() if borrow.return_date else 0
+            yield [
+                borrow.id,
+                borrow.user_id,
+                borrow.user.username if borrow.user else '',
+                borrow.book_id,
+                borrow.book.title if borrow.book else '',
+                borrow.book.isbn if borrow.book else '',
+                borrow.borrow_date.isoformat() if borrow.borrow_date else '',
+                borrow.due_date.isoformat() if borrow.due_date else '',
+                borrow.return_date.isoformat() if borrow.return_date else '',
+                borrow.status,
+                overdue_days if overdue_days > 0 else ''
+            ]
+    
+    return _csv_response(header, rows(), f'borrow_statistics_{year}.csv')
 
 
 @statistics_bp.route('/export/users', methods=['GET'])
 @jwt_required()
+@read_replica
 def export_user_statistics():
     """
     导出用户统计数据为 CSV
@@ -407,39 +577,51 @@ def export_user_statistics():
         func.count(Borrow.id).label('borrow_count')
     ).outerjoin(
         Borrow, 
-        (User.id == Borrow.user_id) & (extract('year', Borrow.borrow_date) == year)
+        (User.id == Borrow.user_id) & (Borrow.borrow_year == year)
     ).group_by(
         User.id, User.username, User.email, User.role, User.is_active, User.created_at
-    ).order_by(desc('borrow_count')).all()
-    
-    # 生成 CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 写入表头
-    writer.writerow([
-        '用户ID', '用户名', '邮箱', '角色', '状态', '注册时间', f'{year}年借阅次数'
-    ])
-    
-    # 写入数据
-    for stat in user_stats:
-        writer.writerow([
-            stat.id,
-            stat.username,
-            stat.email,
-            '管理员' if stat.role == 'admin' else '读者',
-            '启用' if stat.is_active else '禁用',
-            stat.created_at.strftime('%Y-%m-%d %H:%M:%S') if stat.created_at else '',
-            stat.borrow_count
-        ])
-    
-    # 返回 CSV 响应
-    output.seek(0)
+    ).order_by(desc('borrow_count')).yield_per(EXPORT_BATCH_SIZE)
+    
+    header = ['用户ID', '用户名', '邮箱', '角色', '状态', '注册时间', f'{year}年借阅次数']
+    
+    def rows():
+        for stat in user_stats:
+            yield [
+                stat.id,
+                stat.username,
+                stat.email,
+                '管理员' if stat.role == 'admin' else '读者',
+                '启用' if stat.is_active else '禁用',
+                stat.created_at.strftime('%Y-%m-%d %H:%M:%S') if stat.created_at else '',
+                stat.borrow_count
+            ]
+    
+    return _csv_response(header, rows(), f'user_statistics_{year}.csv')
+
+
+def _csv_response(header: list, rows, filename: str) -> Response:
+    """
+    流式 CSV 响应：每 EXPORT_BATCH_SIZE 行发出一块，不在内存中生成整个文件
+
+    查询在响应发送过程中执行，生成器需保留请求上下文（数据库会话、只读库设置）。
+    """
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(header)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+    
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={
-            'Content-Disposition': f'attachment; filename=user_statistics_{year}.csv',
+            'Content-Disposition': f'attachment; filename={filename}',
             'Content-Type': 'text/csv; charset=utf-8'
         }
     )
@@ -1,10 +1,18 @@
 """
 用户管理路由
 """
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
+import base64
+import json
+from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from app import db
+from app.models.import_job import ImportJob
 from app.models.user import User
+from app.services import reader_summary
+from app.services.enrollment import ImportFileError, read_rows, start_import
+from app.services.revocation import revoke_user_tokens, revoke_users_tokens
+from app.services.user_cache import get_user_state, invalidate_user
 
 users_bp = Blueprint('users', __name__)
 
@@ -23,6 +31,56 @@ def admin_required(fn):
     return wrapper
 
 
+SEARCH_FIELDS = ('username', 'email', 'student_id')
+
+
+def _search_field(q: str, field: str = None) -> str:
+    """确定前缀搜索的列：未指定时含 @ 视为邮箱，纯数字视为学号，否则为用户名"""
+    if field in SEARCH_FIELDS:
+        return field
+    if '@' in q:
+        return 'email'
+    if q.isdigit():
+        return 'student_id'
+    return 'username'
+
+
+def _prefix_filter(column, prefix: str):
+    """
+    前缀匹配 LIKE 'prefix%'，转义通配符
+
+    不能改写为区间 [prefix, 末字符 +1)：区间按列的排序规则比较而不是按码点，
+    utf8mb4_unicode_ci 下 ':'、'['、'{' 排在数字和字母之前，以 9、z 结尾的前缀会得到空区间。
+    MySQL 对不以通配符开头的 LIKE 同样在索引上做范围扫描。
+    """
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return column.like(escaped + '%', escape='\\')
+
+
+def _encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _user_to_dict(user: User) -> dict:
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'student_id': user.student_id,
+        'role': user.role,
+        'is_active': user.is_active,
+        'created_at': user.created_at
+    }
+
+
 @users_bp.route('', methods=['GET'])
 @admin_required
 def get_users():
@@ -30,19 +88,27 @@ def get_users():
     获取用户列表（管理员）
     
     查询参数:
-    - page: 页码，默认1
-    - per_page: 每页数量，默认10
+    - q: 前缀搜索（用户名、邮箱或学号）
+    - field: 搜索列（username/email/student_id），默认按 q 的内容推断
     - role: 角色筛选（admin/reader）
     - is_active: 状态筛选（true/false）
+    - per_page: 每页数量，默认10，最大100
+    - cursor: 游标分页，首页传空字符串，之后传上一页返回的 next_cursor
+    - page: 页码分页（未提供 cursor 时使用），默认1
+    
+    未搜索时按注册时间倒序，搜索时按搜索列升序。
     
     返回:
     - 200: 用户列表
+    - 400: 游标无效
     - 403: 权限不足
     """
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
     role = request.args.get('role')
     is_active = request.args.get('is_active')
+    q = (request.args.get('q') or '').strip()
+    cursor = request.args.get('cursor')
     
     # 构建查询
     query = User.query
@@ -54,31 +120,296 @@ def get_users():
         is_active_bool = is_active.lower() == 'true'
         query = query.filter_by(is_active=is_active_bool)
     
-    # 分页查询
-    pagination = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # 排序键：搜索时为唯一的搜索列，否则为 (created_at, id) 倒序
+    if q:
+        column = getattr(User, _search_field(q, request.args.get('field')))
+        query = query.filter(_prefix_filter(column, q))
+        order_by = [column.asc()]
+    else:
+        column = None
+        order_by = [User.created_at.desc(), User.id.desc()]
     
-    users = [{
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'role': user.role,
-        'is_active': user.is_active,
-        'created_at': user.created_at.isoformat() if user.created_at else None
-    } for user in pagination.items]
+    # 页码分页（兼容原有调用）
+    if cursor is None:
+        pagination = query.order_by(*order_by).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        return jsonify({
+            'users': [_user_to_dict(user) for user in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
+        }), 200
+    
+    # 游标分页：从上一页最后一行之后继续，不做 OFFSET 和 COUNT
+    if cursor:
+        values = _decode_cursor(cursor)
+        if values is None or len(values) != (1 if q else 2):
+            return jsonify({'error': {'code': 'INVALID_CURSOR', 'message': '分页游标无效'}}), 400
+        if q:
+            query = query.filter(column > values[0])
+        else:
+            try:
+                created_at = datetime.fromisoformat(values[0])
+            except (TypeError, ValueError):
+                return jsonify({'error': {'code': 'INVALID_CURSOR', 'message': '分页游标无效'}}), 400
+            query = query.filter(db.or_(
+                User.created_at < created_at,
+                db.and_(User.created_at == created_at, User.id < values[1])
+            ))
+    
+    users = query.order_by(*order_by).limit(per_page + 1).all()
+    has_more = len(users) > per_page
+    users = users[:per_page]
+    
+    next_cursor = None
+    if has_more:
+        last = users[-1]
+        next_cursor = _encode_cursor(
+            [getattr(last, column.key)] if q else [last.created_at.isoformat(), last.id]
+        )
     
     return jsonify({
-        'users': users,
+        'users': [_user_to_dict(user) for user in users],
+        'next_cursor': next_cursor,
         'pagination': {
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages
+            'per_page': per_page,
+            'next_cursor': next_cursor
         }
     }), 200
 
 
+def _parse_datetime(value):
+    """解析 ISO 格式的日期或日期时间，无效时返回 None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _bulk_filter(data: dict):
+    """
+    将批量更新的筛选条件转换为 SQL 条件
+
+    Returns:
+        (条件列表, 错误信息)
+    """
+    criteria = data.get('filter') or {}
+    if not isinstance(criteria, dict):
+        return None, 'filter 必须是对象'
+    if 'ids' in data:
+        criteria = {**criteria, 'ids': data['ids']}
+    
+    conditions = []
+    
+    if 'ids' in criteria:
+        ids = criteria['ids']
+        if not isinstance(ids, list) or not ids or \
+                not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, 'ids 必须是非空的整数数组'
+        if len(ids) > current_app.config.get('USER_BULK_MAX_IDS', 10000):
+            return None, 'ids 数量超出上限'
+        conditions.append(User.id.in_(ids))
+    
+    if 'role' in criteria:
+        if criteria['role'] not in ('admin', 'reader'):
+            return None, '角色必须是 admin 或 reader'
+        conditions.append(User.role == criteria['role'])
+    
+    # 届别：学号前缀（如 "2019"），与搜索共用 LIKE 前缀匹配
+    if 'cohort' in criteria:
+        cohort = criteria['cohort']
+        if not isinstance(cohort, str) or not cohort.strip():
+            return None, 'cohort 必须是非空字符串'
+        conditions.append(_prefix_filter(User.student_id, cohort.strip()))
+    
+    for key, op in (('created_from', '__ge__'), ('created_to', '__lt__')):
+        if key in criteria:
+            value = _parse_datetime(criteria[key])
+            if value is None:
+                return None, f'{key} 必须是 ISO 格式的日期'
+            conditions.append(getattr(User.created_at, op)(value))
+    
+    if not conditions:
+        return None, '至少需要一个筛选条件'
+    return conditions, None
+
+
+@users_bp.route('', methods=['PATCH'])
+@admin_required
+def bulk_update_users():
+    """
+    批量更新用户状态或角色（管理员）
+    
+    请求体:
+    {
+        "ids": [integer],  // 可选，用户ID列表
+        "filter": {  // 可选，与 ids 至少提供一项，多个条件同时满足
+            "ids": [integer],
+            "role": "admin" | "reader",
+            "cohort": "string",  // 学号前缀（届别）
+            "created_from": "YYYY-MM-DD",  // 注册时间下限（含）
+            "created_to": "YYYY-MM-DD"  // 注册时间上限（不含）
+        },
+        "is_active": boolean,  // 可选
+        "role": "admin" | "reader"  // 可选，与 is_active 至少提供一项
+    }
+    
+    以一条 UPDATE 完成更新，当前管理员自身不受影响。被禁用或变更角色的用户，
+    其已签发的 token 全部吊销。
+    
+    返回:
+    - 200: 更新成功，返回匹配数、实际更新数与吊销数
+    - 400: 参数验证失败
+    - 403: 权限不足
+    """
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': {'code': 'INVALID_REQUEST', 'message': '请求体不能为空'}}), 400
+    
+    changes = {}
+    if 'is_active' in data:
+        if not isinstance(data['is_active'], bool):
+            return jsonify({'error': {'code': 'INVALID_PARAM', 'message': 'is_active 必须是布尔值'}}), 400
+        changes['is_active'] = data['is_active']
+    if 'role' in data:
+        if data['role'] not in ('admin', 'reader'):
+            return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '角色必须是 admin 或 reader'}}), 400
+        changes['role'] = data['role']
+    if not changes:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '需要提供 is_active 或 role'}}), 400
+    
+    conditions, error = _bulk_filter(data)
+    if error:
+        return jsonify({'error': {'code': 'INVALID_PARAM', 'message': error}}), 400
+    conditions.append(User.id != int(get_jwt_identity()))
+    
+    # 只更新值确实发生变化的行；需要吊销令牌的是被禁用或角色变化的用户
+    changed = db.or_(*[getattr(User, key) != value for key, value in changes.items()])
+    revoke = []
+    if changes.get('is_active') is False:
+        revoke.append(User.is_active == True)
+    if 'role' in changes:
+        revoke.append(User.role != changes['role'])
+    
+    matched = User.query.filter(*conditions).count()
+    
+    # 先锁定待更新的行并取得ID，再以同一条件执行一条 UPDATE
+    rows = db.session.query(User.id, db.or_(*revoke) if revoke else db.false()).filter(
+        *conditions, changed
+    ).with_for_update().all()
+    updated_ids = [user_id for user_id, _ in rows]
+    revoke_ids = [user_id for user_id, needs_revoke in rows if needs_revoke]
+    
+    updated = 0
+    if updated_ids:
+        updated = User.query.filter(*conditions, changed).update(changes, synchronize_session=False)
+        revoke_users_tokens(revoke_ids)
+    db.session.commit()
+    
+    # 批量 UPDATE 不触发 ORM 事件，逐个失效用户状态缓存
+    for user_id in updated_ids:
+        invalidate_user(user_id)
+    
+    return jsonify({
+        'message': '更新成功',
+        'matched': matched,
+        'updated': updated,
+        'revoked': len(revoke_ids)
+    }), 200
+
+
+@users_bp.route('/import', methods=['POST'])
+@admin_required
+def import_users():
+    """
+    批量导入读者（管理员）
+    
+    表单字段:
+    - file: CSV（UTF-8）或 XLSX 文件，表头需包含 username、email、password 列，
+      可选 student_id 列
+    
+    每行按注册接口的规则校验，校验失败或用户名、邮箱冲突的行跳过，其余行全部创建。
+    接口只解析文件并创建导入任务，校验、并行哈希与写入在后台执行，
+    通过 GET /api/users/import/<任务ID> 查询进度与逐行错误报告。
+    
+    返回:
+    - 202: 导入任务已创建，返回任务状态
+    - 400: 文件缺失、格式不支持或行数超出上限
+    - 403: 权限不足
+    """
+    upload = request.files.get('file')
+    
+    if not upload or not upload.filename:
+        return jsonify({'error': {'code': 'INVALID_REQUEST', 'message': '请上传 CSV 或 XLSX 文件'}}), 400
+    
+    try:
+        rows = read_rows(upload.filename, upload.stream)
+    except ImportFileError as e:
+        return jsonify({'error': {'code': 'INVALID_FILE', 'message': str(e)}}), 400
+    
+    max_rows = current_app.config['USER_IMPORT_MAX_ROWS']
+    if len(rows) > max_rows:
+        return jsonify({'error': {'code': 'TOO_MANY_ROWS', 'message': f'单次最多导入 {max_rows} 行'}}), 400
+    
+    job = start_import(rows, upload.filename, int(get_jwt_identity()))
+    
+    return jsonify({
+        'message': '导入任务已创建',
+        'job': job.to_dict()
+    }), 202, {'Location': f'/api/users/import/{job.id}'}
+
+
+@users_bp.route('/import/<int:job_id>', methods=['GET'])
+@admin_required
+def get_import_job(job_id):
+    """
+    查询批量导入任务（管理员）
+    
+    返回:
+    - 200: 任务状态（pending/running/done/failed）、成功数、失败数与逐行错误报告
+    - 403: 权限不足
+    - 404: 任务不存在
+    """
+    job = db.session.get(ImportJob, job_id)
+    
+    if not job:
+        return jsonify({'error': {'code': 'IMPORT_JOB_NOT_FOUND', 'message': '导入任务不存在'}}), 404
+    
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@users_bp.route('/<int:user_id>/summary', methods=['GET'])
+@jwt_required()
+def get_user_summary(user_id):
+    """
+    获取读者借阅概况（本人或管理员）
+    
+    数据来自借书、还书时增量维护的汇总行，不扫描借阅记录；尚无汇总行的读者
+    按其借阅记录临时计算，不写库。
+    
+    返回:
+    - 200: 借阅概况（总借阅数、当前在借、当前逾期、今年借阅数、各状态计数、
+      逐年借阅数、常读作者）
+    - 403: 权限不足
+    - 404: 用户不存在
+    """
+    claims = get_jwt()
+    if claims.get('role') != 'admin' and int(get_jwt_identity()) != user_id:
+        return jsonify({'error': {'code': 'FORBIDDEN', 'message': '权限不足'}}), 403
+    
+    if get_user_state(user_id) is None:
+        return jsonify({'error': {'code': 'USER_NOT_FOUND', 'message': '用户不存在'}}), 404
+    
+    return jsonify(reader_summary.get_summary(user_id)), 200
+
+
 @users_bp.route('/<int:user_id>', methods=['PUT'])
 @admin_required
 def update_user(user_id):
@@ -111,13 +442,21 @@ def update_user(user_id):
     if 'is_active' in data:
         if not isinstance(data['is_active'], bool):
             return jsonify({'error': {'code': 'INVALID_PARAM', 'message': 'is_active 必须是布尔值'}}), 400
-        user.is_active = data['is_active']
     
     # 更新角色
     if 'role' in data:
         if data['role'] not in ('admin', 'reader'):
             return jsonify({'error': {'code': 'INVALID_PARAM', 'message': '角色必须是 admin 或 reader'}}), 400
+    
+    # 禁用账户或变更角色后，此前签发的 token（携带旧角色）立即失效
+    disabled = user.is_active and data.get('is_active') is False
+    role_changed = 'role' in data and data['role'] != user.role
+    if 'is_active' in data:
+        user.is_active = data['is_active']
+    if 'role' in data:
         user.role = data['role']
+    if disabled or role_changed:
+        revoke_user_tokens(user.id)
     
     db.session.commit()
     
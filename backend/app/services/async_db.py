@@ -0,0 +1,137 @@
+"""
+异步数据库访问（ASGI 读路径）
+
+按 SQLALCHEMY_DATABASE_URI 与只读库配置创建 SQLAlchemy 异步引擎：
+MySQL 使用 aiomysql，SQLite 使用 aiosqlite。连接池参数沿用同步引擎的配置。
+"""
+import importlib
+from math import ceil
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+
+ASYNC_DRIVERS = {
+    'mysql': ('mysql+aiomysql', 'aiomysql'),
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+}
+
+
+def async_url(uri: str):
+    """
+    把同步连接串转换为异步驱动的连接串
+
+    Raises:
+        ValueError: 数据库类型不支持异步访问
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'异步读路径不支持数据库类型: {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend][0])
+
+
+def check_dependencies(app) -> None:
+    """
+    检查异步读路径所需的可选依赖
+
+    Raises:
+        RuntimeError: 缺少依赖时给出需要安装的包
+    """
+    uris = [app.config['SQLALCHEMY_DATABASE_URI']] + list(app.config.get('SQLALCHEMY_REPLICA_URIS') or [])
+    modules = {'greenlet', 'asgiref'}
+    modules.update(ASYNC_DRIVERS[async_url(uri).get_backend_name()][1] for uri in uris)
+    missing = []
+    for module in sorted(modules):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            missing.append(module)
+    if missing:
+        raise RuntimeError(f'异步读路径需要安装: {" ".join(missing)}')
+
+
+def _create_engine(app, uri: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    options = {}
+    if not uri.startswith('sqlite'):
+        # 同步引擎的自定义连接池类不适用于异步引擎
+        options = {key: value for key, value in (app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}).items()
+                   if key != 'poolclass'}
+    engine = create_async_engine(async_url(uri), **options)
+    if app.config.get('REQUEST_METRICS_ENABLED'):
+        from app.services import request_metrics
+        request_metrics.instrument_engine(engine.sync_engine)
+    if app.config.get('TRACING_ENABLED'):
+        from app.services import tracing
+        tracing.instrument_engine(engine.sync_engine)
+    return engine
+
+
+def get_engine(app, replica: str = None):
+    """
+    获取异步引擎（首次使用时创建）
+
+    Args:
+        replica: 只读库名称（与 db_routing 的只读库一致），None 表示主库
+    """
+    engines = app.extensions.setdefault('async_engines', {})
+    if replica not in engines:
+        if replica is None:
+            uri = app.config['SQLALCHEMY_DATABASE_URI']
+        else:
+            uri = app.extensions['db_replicas'][replica].url.render_as_string(hide_password=False)
+        engines[replica] = _create_engine(app, uri)
+    return engines[replica]
+
+
+def get_session(app, replica: str = None):
+    """创建异步会话（调用方使用 async with）"""
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    return AsyncSession(get_engine(app, replica), expire_on_commit=False)
+
+
+async def dispose_engines(app) -> None:
+    """关闭所有异步引擎的连接（ASGI 应用关闭时调用）"""
+    for engine in app.extensions.pop('async_engines', {}).values():
+        await engine.dispose()
+
+
+class Page:
+    """分页结果，字段与 Flask-SQLAlchemy 的 Pagination 一致"""
+
+    def __init__(self, items: list, page: int, per_page: int, total: int):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def pages(self) -> int:
+        return ceil(self.total / self.per_page) if self.total else 0
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+
+async def paginate(session, statement, page: int, per_page: int) -> Page:
+    """
+    分页查询（与 paginate(error_out=False) 相同：页码小于 1 时取第 1 页，每页数量无效时取 20）
+
+    Args:
+        session: 异步会话
+        statement: 已排序的 select 语句
+    """
+    page = page if page and page >= 1 else 1
+    per_page = per_page if per_page and per_page >= 1 else 20
+    total = await session.scalar(
+        select(func.count()).select_from(statement.order_by(None).subquery())
+    )
+    result = await session.execute(statement.limit(per_page).offset((page - 1) * per_page))
+    return Page(list(result.unique().scalars()), page, per_page, total)
@@ -0,0 +1,441 @@
+"""
+借阅事件列式存储
+
+将借阅记录以 NumPy 数组（列式）常驻进程内存，统计分析可以直接在数组上做
+向量化的分组与时间分桶聚合，不必为每个新统计需求都去业务库执行聚合查询。
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from flask import current_app
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# 1970-01-01 为星期四，按周分桶时偏移 3 天使每周从星期一开始
+EPOCH = date(1970, 1, 1)
+WEEK_OFFSET = 3
+NO_DAY = -1
+
+STATUS_CODES = {'borrowed': 0, 'returned': 1, 'overdue': 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+BUCKETS = ('day', 'week', 'month')
+GROUP_BY = ('book', 'user', 'location', 'publisher', 'status')
+
+
+def to_day(value) -> int:
+    """将日期转换为自 1970-01-01 起的天数，空值返回 NO_DAY"""
+    if value is None:
+        return NO_DAY
+    return (value - EPOCH).days
+
+
+def from_day(day: int) -> date:
+    """将天数转换回日期"""
+    return EPOCH + timedelta(days=int(day))
+
+
+class _Dictionary:
+    """字符串字典编码（馆藏位置、出版社等低基数维度）"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value) -> int:
+        if not value:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int):
+        return self.values[code] if code >= 0 else None
+
+
+class BorrowEventStore:
+    """
+    借阅事件列式存储
+
+    每条借阅记录占用一行，各列分别保存在独立的 NumPy 数组中：
+    借阅ID、图书ID、用户ID、借阅/应还/归还日期（天数）以及状态码。
+    图书的馆藏位置与出版社按图书ID做字典编码，分组时通过数组下标映射。
+
+    全量加载在锁外构建新数组，完成后在锁内替换；加载期间的增量变更先照常写入
+    当前数组并记录下来，替换前在新数组上重放。同一时刻只进行一次全量加载。
+    """
+
+    # 全量加载时整体替换的状态
+    _STATE = ('size', '_index', 'borrow_id', 'book_id', 'user_id', 'borrow_day', 'due_day',
+              'return_day', 'status', '_book_location', '_book_publisher', '_locations', '_publishers')
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # 全量加载期间记录的增量变更，未在加载时为 None
+        self._pending = None
+        self.loaded_at = None
+        self._allocate(capacity)
+        self._book_location = np.full(16, -1, dtype=np.int32)
+        self._book_publisher = np.full(16, -1, dtype=np.int32)
+        self._locations = _Dictionary()
+        self._publishers = _Dictionary()
+
+    def _allocate(self, capacity: int) -> None:
+        self.size = 0
+        self._index = {}
+        self.borrow_id = np.zeros(capacity, dtype=np.int64)
+        self.book_id = np.zeros(capacity, dtype=np.int32)
+        self.user_id = np.zeros(capacity, dtype=np.int32)
+        self.borrow_day = np.zeros(capacity, dtype=np.int32)
+        self.due_day = np.zeros(capacity, dtype=np.int32)
+        self.return_day = np.full(capacity, NO_DAY, dtype=np.int32)
+        self.status = np.zeros(capacity, dtype=np.int8)
+
+    def _grow(self, needed: int) -> None:
+        """容量不足时按倍数扩容（重新分配数组，已有的切片视图不受影响）"""
+        capacity = len(self.borrow_id)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('borrow_id', 'book_id', 'user_id', 'borrow_day',
+                     'due_day', 'return_day', 'status'):
+            old = getattr(self, name)
+            fill = NO_DAY if name == 'return_day' else 0
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, session, batch_size: int = 50000, wait: bool = True) -> bool:
+        """
+        从数据库全量加载借阅记录与图书维度
+
+        Args:
+            session: SQLAlchemy 会话
+            batch_size: 每批读取的行数
+            wait: 其他线程正在加载时是否等待其完成；不等待时直接返回
+
+        Returns:
+            本次是否执行了加载（等待期间其他线程已完成加载时也返回 False）
+        """
+        from app.models import Book, Borrow
+
+        requested_at = time.monotonic()
+        if not self._load_lock.acquire(blocking=wait):
+            return False
+        try:
+            if self.loaded_at is not None and self.loaded_at >= requested_at:
+                return False
+            with self._lock:
+                self._pending = []
+
+            try:
+                total = session.query(db.func.count(Borrow.id)).scalar() or 0
+                fresh = BorrowEventStore(max(1024, total))
+
+                books = session.query(Book.id, Book.location, Book.publisher)
+                for book_id, location, publisher in books.yield_per(batch_size):
+                    fresh._set_book(book_id, location, publisher)
+
+                rows = session.query(
+                    Borrow.id, Borrow.book_id, Borrow.user_id, Borrow.borrow_date,
+                    Borrow.due_date, Borrow.return_date, Borrow.status
+                ).order_by(Borrow.id)
+                for row in rows.yield_per(batch_size):
+                    fresh._append_row(*row)
+
+                with self._lock:
+                    for change in self._pending:
+                        fresh._apply(*change)
+                    for name in self._STATE:
+                        setattr(self, name, getattr(fresh, name))
+                    self.loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._pending = None
+            return True
+        finally:
+            self._load_lock.release()
+
+    def _set_book(self, book_id: int, location, publisher) -> None:
+        if book_id >= len(self._book_location):
+            capacity = max(book_id + 1, len(self._book_location) * 2)
+            for name in ('_book_location', '_book_publisher'):
+                old = getattr(self, name)
+                new = np.full(capacity, -1, dtype=np.int32)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        self._book_location[book_id] = self._locations.encode(location)
+        self._book_publisher[book_id] = self._publishers.encode(publisher)
+
+    def _append_row(self, borrow_id, book_id, user_id, borrow_date,
+                    due_date, return_date, status) -> None:
+        self._grow(self.size + 1)
+        i = self.size
+        self.borrow_id[i] = borrow_id
+        self.book_id[i] = book_id
+        self.user_id[i] = user_id
+        self.borrow_day[i] = to_day(borrow_date)
+        self.due_day[i] = to_day(due_date)
+        self.return_day[i] = to_day(return_date)
+        self.status[i] = STATUS_CODES.get(status, 0)
+        self._index[borrow_id] = i
+        self.size += 1
+
+    def _apply(self, kind: str, *values) -> None:
+        """在当前数组上执行一项增量变更（需持有锁）"""
+        if kind == 'book':
+            self._set_book(*values)
+        elif kind == 'borrow':
+            if values[0] not in self._index:
+                self._append_row(*values)
+        elif kind == 'return':
+            i = self._index.get(values[0])
+            if i is not None:
+                self.return_day[i] = to_day(values[1])
+                self.status[i] = STATUS_CODES.get(values[2], 0)
+
+    def _record(self, *changes) -> None:
+        """执行增量变更；全量加载进行中时同时记录，供加载完成前重放"""
+        with self._lock:
+            for change in changes:
+                self._apply(*change)
+                if self._pending is not None:
+                    self._pending.append(change)
+
+    def append(self, borrow, book=None) -> None:
+        """
+        追加一条新借阅事件
+
+        Args:
+            borrow: 已提交的借阅记录
+            book: 借阅的图书（用于更新图书维度，可选）
+        """
+        changes = []
+        if book is not None:
+            changes.append(('book', book.id, book.location, book.publisher))
+        changes.append(('borrow', borrow.id, borrow.book_id, borrow.user_id, borrow.borrow_date,
+                        borrow.due_date, borrow.return_date, borrow.status))
+        self._record(*changes)
+
+    def mark_returned(self, borrow) -> None:
+        """
+        更新一条借阅事件的归还日期与状态
+
+        Args:
+            borrow: 已提交的借阅记录
+        """
+        self._record(('return', borrow.id, borrow.return_date, borrow.status))
+
+    def update_book(self, book) -> None:
+        """更新图书维度（馆藏位置、出版社）"""
+        self._record(('book', book.id, book.location, book.publisher))
+
+    def _snapshot(self) -> dict:
+        """获取当前数据的只读切片视图"""
+        with self._lock:
+            n = self.size
+            return {
+                'book_id': self.book_id[:n],
+                'user_id': self.user_id[:n],
+                'borrow_day': self.borrow_day[:n],
+                'status': self.status[:n],
+                'book_location': self._book_location,
+                'book_publisher': self._book_publisher,
+            }
+
+    def aggregate(self, bucket: str = None, group_by: str = None,
+                  start: date = None, end: date = None, status: str = None) -> list:
+        """
+        按时间分桶和维度分组统计借阅次数
+
+        Args:
+            bucket: 时间分桶 (day/week/month)，None 表示不分桶
+            group_by: 分组维度 (book/user/location/publisher/status)，None 表示不分组
+            start: 起始借阅日期（包含）
+            end: 截止借阅日期（不包含）
+            status: 借阅状态筛选
+
+        Returns:
+            统计结果列表，按分桶和分组键排序
+        """
+        data = self._snapshot()
+        days = data['borrow_day']
+
+        mask = np.ones(len(days), dtype=bool)
+        if start is not None:
+            mask &= days >= to_day(start)
+        if end is not None:
+            mask &= days < to_day(end)
+        if status is not None:
+            mask &= data['status'] == STATUS_CODES[status]
+
+        days = days[mask]
+        bucket_keys = self._bucket_keys(days, bucket)
+        group_keys = self._group_keys(data, mask, group_by)
+
+        # 两个键合并成一个 int64 后一次 unique 完成分组计数
+        keys = bucket_keys.astype(np.int64) * (1 << 32) + (group_keys.astype(np.int64) + 1)
+        unique_keys, counts = np.unique(keys, return_counts=True)
+
+        result = []
+        for key, count in zip(unique_keys.tolist(), counts.tolist()):
+            bucket_key, group_key = divmod(key, 1 << 32)
+            row = {'count': count}
+            if bucket:
+                row['period'] = self._bucket_label(bucket_key, bucket)
+            if group_by:
+                row['key'] = self._group_label(group_key - 1, group_by)
+            result.append(row)
+        return result
+
+    @staticmethod
+    def _bucket_keys(days: np.ndarray, bucket: str) -> np.ndarray:
+        if bucket == 'day':
+            return days
+        if bucket == 'week':
+            return (days + WEEK_OFFSET) // 7
+        if bucket == 'month':
+            return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return np.zeros(len(days), dtype=np.int64)
+
+    @staticmethod
+    def _group_keys(data: dict, mask: np.ndarray, group_by: str) -> np.ndarray:
+        if group_by == 'book':
+            return data['book_id'][mask]
+        if group_by == 'user':
+            return data['user_id'][mask]
+        if group_by == 'status':
+            return data['status'][mask]
+        if group_by in ('location', 'publisher'):
+            book_ids = data['book_id'][mask]
+            lookup = data['book_' + group_by]
+            codes = np.full(len(book_ids), -1, dtype=np.int32)
+            known = book_ids < len(lookup)
+            codes[known] = lookup[book_ids[known]]
+            return codes
+        return np.zeros(int(mask.sum()), dtype=np.int32)
+
+    @staticmethod
+    def _bucket_label(key: int, bucket: str) -> str:
+        if bucket == 'day':
+            return from_day(key).isoformat()
+        if bucket == 'week':
+            return from_day(key * 7 - WEEK_OFFSET).isoformat()
+        year, month = divmod(key, 12)
+        return f'{1970 + year:04d}-{month + 1:02d}'
+
+    def _group_label(self, code: int, group_by: str):
+        if group_by == 'status':
+            return STATUS_NAMES.get(code)
+        if group_by == 'location':
+            return self._locations.decode(code)
+        if group_by == 'publisher':
+            return self._publishers.decode(code)
+        return code
+
+
+class BorrowEvents:
+    """
+    借阅事件存储扩展
+
+    每个应用实例持有一个 BorrowEventStore，由每个进程的后台线程在启动时加载
+    （gunicorn 在 fork 工作进程后启动，其他情况在首次访问时启动），之后每隔
+    BORROW_STORE_REFRESH_SECONDS 重新全量加载，以纳入其他工作进程写入的记录；
+    其间由借书、还书接口增量追加。请求只读取当前数据，从不执行加载。
+
+    BORROW_STORE_BACKGROUND 关闭时（测试使用内存数据库）在首次访问时于请求内加载。
+    """
+
+    def init_app(self, app) -> None:
+        app.config.setdefault('BORROW_STORE_ENABLED', True)
+        app.config.setdefault('BORROW_STORE_REFRESH_SECONDS', 300)
+        app.config.setdefault('BORROW_STORE_BACKGROUND', True)
+        app.extensions['borrow_store'] = BorrowEventStore()
+        app.extensions['borrow_store_loader'] = {'pid': None, 'lock': threading.Lock(), 'stop': threading.Event()}
+
+    def start(self, app) -> None:
+        """在当前进程启动后台加载线程（每个进程一个，fork 出的进程需重新启动）"""
+        if not app.config.get('BORROW_STORE_ENABLED') or not app.config['BORROW_STORE_BACKGROUND']:
+            return
+        state = app.extensions['borrow_store_loader']
+        with state['lock']:
+            if state['pid'] == os.getpid():
+                return
+            state['pid'] = os.getpid()
+        threading.Thread(target=self._run_loader, args=(app,), name='borrow-store-loader', daemon=True).start()
+
+    @staticmethod
+    def stop(app) -> None:
+        """停止后台加载线程（在当前加载完成后退出）"""
+        app.extensions['borrow_store_loader']['stop'].set()
+
+    @staticmethod
+    def _run_loader(app) -> None:
+        """立即加载，之后按刷新间隔重新加载；加载失败时 30 秒后重试"""
+        store = app.extensions['borrow_store']
+        stop = app.extensions['borrow_store_loader']['stop']
+        while not stop.is_set():
+            with app.app_context():
+                try:
+                    store.load(db.session)
+                except Exception:
+                    logger.exception('借阅事件存储加载失败')
+                finally:
+                    db.session.remove()
+            refresh = app.config.get('BORROW_STORE_REFRESH_SECONDS')
+            if store.is_loaded and not refresh:
+                return
+            stop.wait(refresh if store.is_loaded else min(refresh or 30, 30))
+
+    @staticmethod
+    def _store():
+        if not current_app.config.get('BORROW_STORE_ENABLED'):
+            return None
+        return current_app.extensions.get('borrow_store')
+
+    def get_store(self) -> BorrowEventStore:
+        """获取存储（后台首次加载完成前 is_loaded 为 False）"""
+        store = self._store()
+        if store is None:
+            return None
+        if current_app.config['BORROW_STORE_BACKGROUND']:
+            self.start(current_app._get_current_object())
+        elif not store.is_loaded:
+            store.load(db.session)
+        return store
+
+    def record_borrow(self, borrow, book=None) -> None:
+        """借书后追加事件（存储尚未加载时跳过，加载时会包含该记录）"""
+        store = self._store()
+        if store is not None and store.is_loaded:
+            store.append(borrow, book)
+
+    def record_return(self, borrow) -> None:
+        """还书后更新事件"""
+        store = self._store()
+        if store is not None and store.is_loaded:
+            store.mark_returned(borrow)
+
+    def record_book(self, book) -> None:
+        """图书信息变更后更新图书维度"""
+        store = self._store()
+        if store is not None and store.is_loaded:
+            store.update_book(book)
+
+
+borrow_events = BorrowEvents()
@@ -0,0 +1,163 @@
+"""
+读者留存队列计算
+
+按注册月份将读者划分为队列，统计每个队列在注册后第 0~12 个月内
+仍有借阅行为的读者数。计算在请求路径之外（每日定时任务）增量执行，
+结果写入 cohort_retention 表，统计接口只读取预计算的矩阵。
+"""
+from datetime import date, datetime
+from sqlalchemy import func, extract
+from app import db
+from app.models import User, Borrow, CohortRetention
+
+# 统计注册后的最大月份偏移
+MAX_MONTH_OFFSET = 12
+
+
+def month_start(value) -> date:
+    """获取日期所在月份的第一天"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """月份加减（结果为当月第一天）"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _first_pending_month(full: bool):
+    """
+    确定需要重新计算的第一个活跃月份
+
+    首次计算（或全量重算）从最早的借阅月份开始；之后从上次计算所在月份开始，
+    因为该月份的数据在上次计算时可能尚不完整。
+    """
+    last_computed = db.session.query(func.max(CohortRetention.computed_at)).scalar()
+    if last_computed and not full:
+        return month_start(last_computed)
+
+    first_borrow = db.session.query(func.min(Borrow.borrow_date)).scalar()
+    if first_borrow is None:
+        return None
+    return month_start(first_borrow)
+
+
+def _cohort_sizes(first_cohort: date, end: date) -> dict:
+    """统计注册月份在 [first_cohort, end) 内各队列的人数"""
+    rows = db.session.query(
+        extract('year', User.created_at).label('year'),
+        extract('month', User.created_at).label('month'),
+        func.count(User.id)
+    ).filter(
+        User.created_at >= datetime.combine(first_cohort, datetime.min.time()),
+        User.created_at < datetime.combine(end, datetime.min.time())
+    ).group_by('year', 'month').all()
+    return {date(int(y), int(m), 1): count for y, m, count in rows}
+
+
+def _active_by_cohort(activity_month: date) -> dict:
+    """统计在指定月份有借阅行为的读者，按其注册月份分组去重计数"""
+    next_month = add_months(activity_month, 1)
+    first_cohort = add_months(activity_month, -MAX_MONTH_OFFSET)
+    rows = db.session.query(
+        extract('year', User.created_at).label('year'),
+        extract('month', User.created_at).label('month'),
+        func.count(func.distinct(Borrow.user_id))
+    ).join(
+        User, User.id == Borrow.user_id
+    ).filter(
+        Borrow.borrow_date >= activity_month,
+        Borrow.borrow_date < next_month,
+        User.created_at >= datetime.combine(first_cohort, datetime.min.time()),
+        User.created_at < datetime.combine(next_month, datetime.min.time())
+    ).group_by('year', 'month').all()
+    return {date(int(y), int(m), 1): count for y, m, count in rows}
+
+
+def compute_cohorts(today: date = None, full: bool = False) -> int:
+    """
+    增量计算留存矩阵
+
+    对每个待计算的活跃月份执行一次分组查询，更新注册于此前 12 个月内
+    各队列对应偏移的单元格；同时刷新这些队列的人数。
+
+    Args:
+        today: 计算基准日期，默认为今天
+        full: 是否忽略上次计算进度，从最早的借阅月份全量重算
+
+    Returns:
+        写入（新增或更新）的单元格数量
+    """
+    today = today or date.today()
+    current_month = month_start(today)
+    activity_month = _first_pending_month(full)
+    if activity_month is None:
+        return 0
+
+    now = datetime.utcnow()
+    first_cohort = add_months(activity_month, -MAX_MONTH_OFFSET)
+    sizes = _cohort_sizes(first_cohort, add_months(current_month, 1))
+
+    existing = {
+        (cell.cohort_month, cell.month_offset): cell
+        for cell in CohortRetention.query.filter(
+            CohortRetention.cohort_month >= first_cohort
+        ).all()
+    }
+
+    written = 0
+    while activity_month <= current_month:
+        active = _active_by_cohort(activity_month)
+        for offset in range(MAX_MONTH_OFFSET + 1):
+            cohort = add_months(activity_month, -offset)
+            cell = existing.get((cohort, offset))
+            if cell is None:
+                if cohort not in sizes:
+                    continue
+                cell = CohortRetention(cohort_month=cohort, month_offset=offset)
+                db.session.add(cell)
+                existing[(cohort, offset)] = cell
+            cell.cohort_size = sizes.get(cohort, 0)
+            cell.active_users = active.get(cohort, 0)
+            cell.computed_at = now
+            written += 1
+        activity_month = add_months(activity_month, 1)
+
+    # 同步此前已计算单元格的队列人数（例如本月仍有新注册读者）
+    for (cohort, _), cell in existing.items():
+        if cohort in sizes:
+            cell.cohort_size = sizes[cohort]
+
+    db.session.commit()
+    return written
+
+
+def get_retention_matrix(first_cohort: date, last_cohort: date) -> list:
+    """
+    读取预计算的留存矩阵
+
+    Args:
+        first_cohort: 起始注册月份（包含）
+        last_cohort: 截止注册月份（包含）
+
+    Returns:
+        按注册月份排序的队列列表
+    """
+    cells = CohortRetention.query.filter(
+        CohortRetention.cohort_month >= first_cohort,
+        CohortRetention.cohort_month <= last_cohort
+    ).order_by(CohortRetention.cohort_month, CohortRetention.month_offset).all()
+
+    cohorts = {}
+    for cell in cells:
+        cohort = cohorts.setdefault(cell.cohort_month, {
+            'cohort': cell.cohort_month.strftime('%Y-%m'),
+            'size': cell.cohort_size,
+            'retention': []
+        })
+        cohort['retention'].append({
+            'offset': cell.month_offset,
+            'active_users': cell.active_users,
+            'rate': round(cell.active_users / cell.cohort_size * 100, 2) if cell.cohort_size else 0
+        })
+    return list(cohorts.values())
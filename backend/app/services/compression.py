@@ -0,0 +1,132 @@
+"""
+响应压缩
+
+按请求的 Accept-Encoding 选择 brotli（已安装 brotli 包时）或 gzip 压缩响应体。
+小于阈值的响应不压缩（压缩收益抵不过 CPU 开销和额外的头部），阈值可按蓝图设置。
+流式响应（CSV 导出）逐块压缩后立即发出，不在内存中汇总整个文件。
+"""
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # 未安装时只提供 gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+
+class _GzipCompressor:
+    """gzip 流式压缩（zlib 的 wbits=31 输出 gzip 格式）"""
+
+    def __init__(self, level: int):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    """brotli 流式压缩"""
+
+    def __init__(self, quality: int):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data)
+
+    def flush(self) -> bytes:
+        return self._brotli.flush()
+
+    def finish(self) -> bytes:
+        return self._brotli.finish()
+
+
+def choose_encoding(accept_encodings) -> str:
+    """
+    按 Accept-Encoding 选择编码，客户端同样接受时优先 brotli
+
+    Returns:
+        'br'、'gzip' 或 None（不压缩）
+    """
+    gzip_quality = accept_encodings.quality('gzip')
+    if brotli is not None:
+        br_quality = accept_encodings.quality('br')
+        if br_quality > 0 and br_quality >= gzip_quality:
+            return 'br'
+    return 'gzip' if gzip_quality > 0 else None
+
+
+def _compressor(app, encoding: str):
+    if encoding == 'br':
+        return _BrotliCompressor(app.config['COMPRESSION_BROTLI_QUALITY'])
+    return _GzipCompressor(app.config['COMPRESSION_GZIP_LEVEL'])
+
+
+def _stream(compressor, original, chunks):
+    """逐块压缩流式响应；每块之后刷新，客户端可以边下载边处理"""
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        # 客户端中途断开时关闭原始生成器，使其释放请求上下文和数据库连接
+        if hasattr(original, 'close'):
+            original.close()
+
+
+def threshold(app, blueprint: str) -> int:
+    """蓝图对应的最小压缩字节数"""
+    return app.config['COMPRESSION_THRESHOLDS'].get(blueprint, app.config['COMPRESSION_MIN_SIZE'])
+
+
+def compress_response(response):
+    """after_request 钩子：按需压缩响应体"""
+    app = current_app._get_current_object()
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESSION_MIMETYPES']):
+        return response
+
+    # 是否压缩取决于请求头，缓存需按 Accept-Encoding 区分
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(_compressor(app, encoding), response.response, response.iter_encoded())
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < threshold(app, request.blueprint):
+            return response
+        compressor = _compressor(app, encoding)
+        response.set_data(compressor.compress(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app) -> None:
+    """注册响应压缩钩子"""
+    app.config.setdefault('COMPRESSION_ENABLED', True)
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESSION_THRESHOLDS', {})
+    app.config.setdefault('COMPRESSION_MIMETYPES', COMPRESSIBLE_MIMETYPES)
+    app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4)
+
+    if app.config['COMPRESSION_ENABLED']:
+        app.after_request(compress_response)
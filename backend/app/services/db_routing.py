@@ -0,0 +1,155 @@
+"""
+读写分离
+
+配置 SQLALCHEMY_REPLICA_URIS 后，为每个只读库创建一个引擎（replica_0、replica_1 ...）。
+标记了 @read_replica 的只读接口在视图执行期间把查询路由到随机选取的一个只读库，
+其余接口、所有写操作（flush 与 INSERT/UPDATE/DELETE）始终使用主库。
+
+只读库存在复制延迟。借书或还书的响应设置签名 Cookie，记录读主库的截止时间
+（REPLICA_STICKY_SECONDS 秒后），客户端随后的请求无论由哪个工作进程处理都读主库，
+保证能看到自己刚写入的库存与借阅记录。其他客户端最迟在复制追平后看到变更。
+"""
+import math
+import random
+import time
+from functools import wraps
+
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import create_engine
+
+REPLICA_KEY_PREFIX = 'replica_'
+# 记录读主库截止时间（Unix 时间戳）的签名 Cookie
+PRIMARY_COOKIE = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    """在 @read_replica 视图内把只读查询路由到只读库的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            key = current_replica()
+            if key is not None:
+                self.info['replica_used'] = True
+                return current_app.extensions['db_replicas'][key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def current_replica():
+    """当前视图使用的只读库名称，读主库时为 None"""
+    if not has_app_context():
+        return None
+    replica = g.get('db_replica')
+    if replica is None or primary_pinned():
+        return None
+    return replica
+
+
+def _serializer(app) -> URLSafeSerializer:
+    return URLSafeSerializer(app.secret_key, salt=PRIMARY_COOKIE)
+
+
+def mark_write() -> None:
+    """记录当前客户端刚刚写入（借书、还书），响应设置 Cookie，粘滞期内其只读请求读主库"""
+    if current_app.extensions.get('db_replicas'):
+        g.db_primary_until = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        g.db_primary_pinned = True
+
+
+def primary_pinned() -> bool:
+    """当前请求是否处于写后粘滞期（携带未过期且签名有效的 Cookie）"""
+    if not has_request_context():
+        return False
+    pinned = g.get('db_primary_pinned')
+    if pinned is None:
+        pinned = False
+        value = request.cookies.get(PRIMARY_COOKIE)
+        if value:
+            try:
+                pinned = float(_serializer(current_app).loads(value)) > time.time()
+            except (BadSignature, TypeError, ValueError):
+                pass
+        g.db_primary_pinned = pinned
+    return pinned
+
+
+def _set_primary_cookie(response):
+    until = g.pop('db_primary_until', None)
+    if until is not None:
+        response.set_cookie(
+            PRIMARY_COOKIE, _serializer(current_app).dumps(until),
+            max_age=math.ceil(until - time.time()),
+            secure=request.is_secure, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+def choose_replica(app):
+    """
+    为只读请求选择只读库
+
+    Returns:
+        只读库名称；未配置只读库或客户端处于写后粘滞期时返回 None（读主库）
+    """
+    replicas = app.extensions.get('db_replicas')
+    if not replicas or primary_pinned():
+        return None
+    return random.choice(list(replicas))
+
+
+def _release_replica() -> None:
+    from app import db
+
+    g.pop('db_replica', None)
+    # 结束只读库上的事务并让已加载对象过期，之后的读写都回到主库
+    if db.session.info.pop('replica_used', False):
+        db.session.rollback()
+
+
+def read_replica(view):
+    """
+    视图装饰器：只读接口的查询使用只读库
+
+    未配置只读库或当前客户端处于写后粘滞期时读主库。
+    需放在 @jwt_required() 之下、@coalesce 之上，使合并键区分主库与只读库。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        app = current_app._get_current_object()
+        if not app.extensions.get('db_replicas'):
+            return view(*args, **kwargs)
+
+        replica = choose_replica(app)
+        if replica is None:
+            return view(*args, **kwargs)
+
+        g.db_replica = replica
+        try:
+            rv = view(*args, **kwargs)
+        except BaseException:
+            _release_replica()
+            raise
+        # 流式响应在视图返回后才查询：保留只读库设置，会话随请求上下文结束而关闭
+        if not (isinstance(rv, Response) and rv.is_streamed):
+            _release_replica()
+        return rv
+    return wrapper
+
+
+def init_app(app) -> None:
+    """
+    为 SQLALCHEMY_REPLICA_URIS 创建只读库引擎，并注册设置写后粘滞 Cookie 的钩子
+
+    只读库引擎不注册为 Flask-SQLAlchemy 的 bind（create_all 等不作用于只读库），
+    沿用主库的连接池参数。
+    """
+    app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+    replicas = {}
+    for i, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+        options = {} if uri.startswith('sqlite') else dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        options.setdefault('echo', app.config.get('SQLALCHEMY_ECHO', False))
+        replicas[f'{REPLICA_KEY_PREFIX}{i}'] = create_engine(uri, **options)
+    app.extensions['db_replicas'] = replicas
+    app.after_request(_set_primary_cookie)
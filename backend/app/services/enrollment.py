@@ -0,0 +1,297 @@
+"""
+读者注册校验与批量导入
+
+注册接口与批量导入共用同一套字段校验规则。批量导入按集合查询用户名与邮箱
+冲突、在进程池中并行计算密码哈希，并以多行 INSERT 分批写入。
+
+导入接口只解析文件并创建导入任务（ImportJob），校验、哈希与写入在后台线程中执行，
+不占用请求的工作进程超时；同一进程内的导入任务依次执行。
+"""
+import csv
+import io
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.import_job import ImportJob
+from app.models.user import User
+from app.services.passwords import get_password_hasher
+from app.services.user_cache import invalidate_all
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = ('username', 'email', 'password')
+OPTIONAL_COLUMNS = ('student_id',)
+
+
+def validate_email(email: str) -> bool:
+    """验证邮箱格式"""
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return bool(re.match(pattern, email))
+
+
+def validate_registration(username: str, password: str, email: str):
+    """
+    校验注册字段
+
+    Args:
+        username: 用户名（已去除首尾空白）
+        password: 明文密码
+        email: 邮箱（已去除首尾空白）
+
+    Returns:
+        校验通过返回 None，否则返回 (错误码, 错误信息)
+    """
+    if not username:
+        return 'INVALID_USERNAME', '用户名不能为空'
+    if len(username) < 2 or len(username) > 50:
+        return 'INVALID_USERNAME', '用户名长度应在2-50个字符之间'
+
+    if not password:
+        return 'INVALID_PASSWORD', '密码不能为空'
+    if len(password) < 6:
+        return 'INVALID_PASSWORD', '密码长度至少6个字符'
+
+    if not email:
+        return 'INVALID_EMAIL', '邮箱不能为空'
+    if not validate_email(email):
+        return 'INVALID_EMAIL', '邮箱格式无效'
+
+    return None
+
+
+class ImportFileError(ValueError):
+    """导入文件无法解析"""
+
+
+def read_rows(filename: str, stream) -> list:
+    """
+    读取 CSV 或 XLSX 文件中的用户行
+
+    Args:
+        filename: 上传的文件名，用于判断格式
+        stream: 文件二进制流
+
+    Returns:
+        [(行号, {'username', 'email', 'password', 'student_id'})]，行号从表头下一行（2）开始
+    """
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        try:
+            text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+            records = list(csv.reader(text))
+        except UnicodeDecodeError:
+            raise ImportFileError('CSV 文件必须使用 UTF-8 编码')
+    elif name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+        except Exception:
+            raise ImportFileError('无法读取 XLSX 文件')
+        records = [list(row) for row in workbook.active.iter_rows(values_only=True)]
+        workbook.close()
+    else:
+        raise ImportFileError('仅支持 CSV 或 XLSX 文件')
+
+    if not records:
+        raise ImportFileError('文件为空')
+
+    header = [str(cell or '').strip().lower() for cell in records[0]]
+    missing = [column for column in IMPORT_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f'缺少列: {", ".join(missing)}')
+    positions = {column: header.index(column) for column in IMPORT_COLUMNS + OPTIONAL_COLUMNS
+                 if column in header}
+
+    rows = []
+    for line, record in enumerate(records[1:], start=2):
+        if not any(cell not in (None, '') for cell in record):
+            continue
+        values = {'student_id': ''}
+        for column, position in positions.items():
+            cell = record[position] if position < len(record) else None
+            values[column] = '' if cell is None else str(cell)
+        rows.append((line, values))
+    return rows
+
+
+def _existing(column, values: set, chunk_size: int = 1000) -> set:
+    """分块 IN 查询已存在的值（小写）"""
+    found = set()
+    values = list(values)
+    for i in range(0, len(values), chunk_size):
+        chunk = values[i:i + chunk_size]
+        found.update(v.lower() for (v,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+
+def _insert_batch(batch: list, errors: list) -> int:
+    """
+    多行 INSERT 写入一批用户
+
+    并发注册可能在冲突检查之后占用同名用户，整批失败时逐行重试以定位冲突行。
+    """
+    try:
+        db.session.execute(insert(User), [values for _, values in batch])
+        db.session.commit()
+        return len(batch)
+    except IntegrityError:
+        db.session.rollback()
+
+    created = 0
+    for line, values in batch:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(User), [values])
+            created += 1
+        except IntegrityError:
+            errors.append({'row': line, 'username': values['username'],
+                           'code': 'USER_EXISTS', 'message': '用户名、邮箱或学号已存在'})
+    db.session.commit()
+    return created
+
+
+def import_readers(rows: list, batch_size: int = None, hash_workers: int = None) -> dict:
+    """
+    批量创建读者账户
+
+    Args:
+        rows: read_rows 的返回值
+        batch_size: 每条 INSERT 语句写入的行数
+        hash_workers: 并行计算哈希的进程数
+
+    Returns:
+        {'created': 成功数, 'failed': 失败数, 'errors': [{'row', 'username', 'code', 'message'}]}
+    """
+    if batch_size is None:
+        batch_size = current_app.config['USER_IMPORT_BATCH_SIZE']
+    if hash_workers is None:
+        hash_workers = current_app.config['USER_IMPORT_HASH_WORKERS']
+
+    errors = []
+    candidates = []
+    seen_usernames, seen_emails, seen_student_ids = set(), set(), set()
+
+    # 逐行校验字段，并检查文件内部的重复
+    for line, values in rows:
+        username = values['username'].strip()
+        email = values['email'].strip()
+        password = values['password']
+        student_id = values.get('student_id', '').strip() or None
+        error = validate_registration(username, password, email)
+        if error is None and student_id and len(student_id) > 32:
+            error = 'INVALID_STUDENT_ID', '学号长度不能超过32个字符'
+        if error is None and username.lower() in seen_usernames:
+            error = 'USER_EXISTS', '用户名在文件中重复'
+        if error is None and email.lower() in seen_emails:
+            error = 'EMAIL_EXISTS', '邮箱在文件中重复'
+        if error is None and student_id and student_id.lower() in seen_student_ids:
+            error = 'STUDENT_ID_EXISTS', '学号在文件中重复'
+        if error is not None:
+            errors.append({'row': line, 'username': username, 'code': error[0], 'message': error[1]})
+            continue
+        seen_usernames.add(username.lower())
+        seen_emails.add(email.lower())
+        if student_id:
+            seen_student_ids.add(student_id.lower())
+        candidates.append((line, username, email, password, student_id))
+
+    # 按集合查询与已有用户的冲突
+    existing_usernames = _existing(User.username, {c[1] for c in candidates})
+    existing_emails = _existing(User.email, {c[2] for c in candidates})
+    existing_student_ids = _existing(User.student_id, {c[4] for c in candidates if c[4]})
+    accepted = []
+    for line, username, email, password, student_id in candidates:
+        if username.lower() in existing_usernames:
+            errors.append({'row': line, 'username': username, 'code': 'USER_EXISTS', 'message': '用户名已存在'})
+        elif email.lower() in existing_emails:
+            errors.append({'row': line, 'username': username, 'code': 'EMAIL_EXISTS', 'message': '邮箱已被注册'})
+        elif student_id and student_id.lower() in existing_student_ids:
+            errors.append({'row': line, 'username': username, 'code': 'STUDENT_ID_EXISTS', 'message': '学号已存在'})
+        else:
+            accepted.append((line, username, email, password, student_id))
+
+    hashes = get_password_hasher().hash_many([c[3] for c in accepted], workers=hash_workers)
+
+    created = 0
+    for i in range(0, len(accepted), batch_size):
+        batch = [
+            (line, {'username': username, 'email': email, 'student_id': student_id,
+                    'password_hash': password_hash, 'role': 'reader', 'is_active': True})
+            for (line, username, email, _, student_id), password_hash
+            in zip(accepted[i:i + batch_size], hashes[i:i + batch_size])
+        ]
+        created += _insert_batch(batch, errors)
+
+    # 多行 INSERT 不经过 ORM 事件，手动清空缓存中“用户不存在”的条目
+    if created:
+        invalidate_all()
+
+    errors.sort(key=lambda e: e['row'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
+
+
+def start_import(rows: list, filename: str = None, user_id: int = None) -> ImportJob:
+    """
+    创建导入任务并提交到后台执行
+
+    USER_IMPORT_BACKGROUND 关闭时（测试）在当前线程内执行完再返回。
+
+    Args:
+        rows: read_rows 的返回值
+        filename: 上传的文件名
+        user_id: 发起导入的管理员ID
+
+    Returns:
+        已提交的导入任务
+    """
+    job = ImportJob(status='pending', filename=filename, total=len(rows), created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    if app.config['USER_IMPORT_BACKGROUND']:
+        app.extensions['user_import_executor'].submit(_run_import, app, job.id, rows)
+    else:
+        _run_import(app, job.id, rows)
+        db.session.refresh(job)
+    return job
+
+
+def _run_import(app, job_id: int, rows: list) -> None:
+    """执行导入任务，把结果与逐行报告写回任务记录"""
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            report = import_readers(rows)
+        except Exception as e:
+            logger.exception('读者导入任务 %s 失败', job_id)
+            db.session.rollback()
+            job = db.session.get(ImportJob, job_id)
+            job.status = 'failed'
+            job.message = str(e)[:255]
+        else:
+            job.status = 'done'
+            job.created = report['created']
+            job.failed = report['failed']
+            job.errors = report['errors']
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+
+def init_app(app) -> None:
+    """初始化批量导入配置与后台执行线程"""
+    app.config.setdefault('USER_IMPORT_MAX_ROWS', 50000)
+    app.config.setdefault('USER_IMPORT_BATCH_SIZE', 1000)
+    app.config.setdefault('USER_IMPORT_HASH_WORKERS', None)
+    app.config.setdefault('USER_IMPORT_BACKGROUND', True)
+    app.extensions['user_import_executor'] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-import')
@@ -0,0 +1,73 @@
+"""
+JSON 序列化（jsonify 与 request.get_json）
+
+已安装 orjson 时用它序列化响应，日期与时间直接输出为 ISO 8601 字符串，
+to_dict() 中可以保留 date/datetime 对象。未安装时回退到标准库 json，
+输出格式相同（键排序、紧凑分隔符、非 ASCII 字符不转义、日期为 ISO 8601）。
+"""
+import decimal
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+from app.services import tracing
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库 json
+    orjson = None
+
+
+def _json_default(o):
+    """标准库 json 与 orjson 都不能直接序列化的类型"""
+    if isinstance(o, date):
+        # Flask 默认输出 HTTP 日期格式（RFC 822），这里统一为 ISO 8601
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """基于 orjson 的 JSON 提供者，缺少 orjson 时由标准库 json 生成相同的输出"""
+
+    default = staticmethod(_json_default)
+    ensure_ascii = False
+
+    def _orjson_option(self, indent: bool = False) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode('utf-8')
+        # 调用方传入 json.dumps 的参数（indent、cls 等）时交给标准库处理；未缩进时与 orjson 一样紧凑
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        with tracing.span('json.serialize') as span:
+            if orjson is None:
+                response = super().response(*args, **kwargs)
+            else:
+                obj = self._prepare_response_obj(args, kwargs)
+                indent = (self.compact is None and self._app.debug) or self.compact is False
+                body = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+                response = self._app.response_class(body + b'\n', mimetype=self.mimetype)
+            span.set_attribute('json.size', response.content_length)
+            return response
+
+
+def init_app(app) -> None:
+    """使用 JSONProvider 替换 Flask 默认的 JSON 提供者"""
+    app.json = JSONProvider(app)
@@ -0,0 +1,167 @@
+"""
+密码哈希服务
+
+bcrypt 每次计算需要数百毫秒 CPU，直接在请求线程中执行会在登录高峰期占满所有
+工作线程。这里把哈希与校验交给独立的、有界的进程池执行：排队数量超过上限时
+立即抛出 PasswordPoolBusy，由接口返回 503 和 Retry-After，而不是继续堆积。
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import bcrypt
+from flask import current_app, has_app_context, jsonify
+
+from app.services import tracing
+
+DEFAULT_ROUNDS = 12
+
+
+class PasswordPoolBusy(Exception):
+    """密码哈希进程池已满"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('密码哈希队列已满')
+        self.retry_after = retry_after
+
+
+def _to_bytes(password: str) -> bytes:
+    """编码密码，bcrypt 限制密码最大72字节，超出部分截断"""
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    return password_bytes
+
+
+def _hash(password_bytes: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password_bytes: bytes, hash_bytes: bytes) -> bool:
+    return bcrypt.checkpw(password_bytes, hash_bytes)
+
+
+def hash_cost(password_hash: str) -> int:
+    """从 bcrypt 哈希（$2b$12$...）中解析计算成本"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    """
+    bcrypt 哈希器
+
+    Args:
+        rounds: bcrypt 计算成本
+        workers: 进程池大小，0 表示在调用线程内直接计算
+        max_pending: 同时提交到进程池（执行中加排队）的最大任务数
+        retry_after: 队列已满时建议客户端重试的秒数
+    """
+
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, workers: int = 0,
+                 max_pending: int = None, retry_after: int = 1):
+        self.rounds = rounds
+        self.workers = workers
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending or max(workers, 1) * 4)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """懒加载进程池（按进程创建，兼容 fork 出的工作进程）"""
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != pid:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._executor_pid = pid
+        return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy(self.retry_after)
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        with tracing.span('bcrypt.hash', **{'bcrypt.rounds': self.rounds}):
+            return self._run(_hash, _to_bytes(password), self.rounds)
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """校验密码"""
+        with tracing.span('bcrypt.verify', **{'bcrypt.rounds': hash_cost(password_hash)}):
+            return self._run(_check, _to_bytes(password), password_hash.encode('utf-8'))
+
+    def hash_many(self, passwords: list, workers: int = None) -> list:
+        """
+        批量计算密码哈希（批量导入用户）
+
+        使用独立的进程池并行计算，不占用登录请求的进程池与排队名额。
+
+        Args:
+            passwords: 明文密码列表
+            workers: 并行进程数，None 表示使用全部 CPU 核心，0 表示在调用线程内逐个计算
+
+        Returns:
+            与输入顺序一致的哈希列表
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        encoded = [_to_bytes(password) for password in passwords]
+        if workers <= 0 or len(encoded) <= 1:
+            return [_hash(password_bytes, self.rounds) for password_bytes in encoded]
+        chunksize = max(1, len(encoded) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_hash, encoded, repeat(self.rounds), chunksize=chunksize))
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """哈希成本与当前配置不一致时需要重新哈希"""
+        return hash_cost(password_hash) != self.rounds
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+
+# 应用上下文之外（脚本、单元测试）使用的默认哈希器
+_default_hasher = PasswordHasher()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """获取当前应用的哈希器"""
+    if has_app_context():
+        hasher = current_app.extensions.get('password_hasher')
+        if hasher is not None:
+            return hasher
+    return _default_hasher
+
+
+def init_app(app) -> None:
+    """根据配置创建哈希器并注册 503 错误处理"""
+    app.config.setdefault('BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+    app.config.setdefault('BCRYPT_POOL_WORKERS', 0)
+    app.config.setdefault('BCRYPT_POOL_MAX_PENDING', None)
+    app.config.setdefault('BCRYPT_RETRY_AFTER', 1)
+    app.extensions['password_hasher'] = PasswordHasher(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        workers=app.config['BCRYPT_POOL_WORKERS'],
+        max_pending=app.config['BCRYPT_POOL_MAX_PENDING'],
+        retry_after=app.config['BCRYPT_RETRY_AFTER']
+    )
+
+    @app.errorhandler(PasswordPoolBusy)
+    def handle_pool_busy(e):
+        response = jsonify({'error': {'code': 'SERVER_BUSY', 'message': '服务繁忙，请稍后重试'}})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
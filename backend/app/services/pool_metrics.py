@@ -0,0 +1,177 @@
+"""
+数据库连接池指标
+
+记录每个引擎连接池的取连接等待时间、在用连接数、新建的溢出连接数与超时次数，
+供管理员指标接口读取，用于根据实际负载调整 DB_POOL_SIZE / DB_MAX_OVERFLOW。
+
+等待时间通过 InstrumentedQueuePool 在取连接处计时（包括新建连接的耗时）；
+SQLite 等不使用 QueuePool 的引擎只记录取还次数与在用连接数。
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# 等待时间直方图的上界（秒）
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """单个连接池的计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflows = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def on_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def on_connect(self, pool) -> None:
+        with self._lock:
+            self.connects += 1
+            # QueuePool 在新建连接之前增加溢出计数，overflow() > 0 表示这条连接超出 pool_size
+            if isinstance(pool, QueuePool) and pool.overflow() > 0:
+                self.overflows += 1
+
+    def on_checkin(self) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(0, self.in_use - 1)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(list(WAIT_BUCKETS) + ['+Inf'], self.wait_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'overflows': self.overflows,
+                'timeouts': self.timeouts,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'wait': {
+                    'count': self.wait_count,
+                    'total_seconds': round(self.wait_total, 6),
+                    'avg_seconds': round(self.wait_total / self.wait_count, 6) if self.wait_count else 0,
+                    'max_seconds': round(self.wait_max, 6),
+                    'buckets': buckets,
+                },
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """对取连接计时的 QueuePool"""
+
+    _metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self._metrics is not None:
+                self._metrics.count('timeouts')
+            raise
+        finally:
+            if self._metrics is not None:
+                self._metrics.observe_wait(time.perf_counter() - start)
+
+
+def instrument_engine(engine) -> PoolMetrics:
+    """为引擎的连接池注册计数事件"""
+    metrics = PoolMetrics()
+    engine.pool._metrics = metrics
+
+    event.listen(engine, 'checkout', lambda dbapi_conn, record, proxy: metrics.on_checkout())
+    event.listen(engine, 'checkin', lambda dbapi_conn, record: metrics.on_checkin())
+    event.listen(engine, 'connect', lambda dbapi_conn, record: metrics.on_connect(engine.pool))
+    event.listen(engine, 'invalidate', lambda dbapi_conn, record, exception: metrics.count('invalidations'))
+
+    @event.listens_for(engine, 'engine_disposed')
+    def keep_metrics(engine):
+        # dispose() 会重建连接池，沿用同一组计数器
+        engine.pool._metrics = metrics
+
+    return metrics
+
+
+def pool_status(engine) -> dict:
+    """连接池当前状态与累计指标"""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(0, pool.overflow()),
+        })
+    metrics = getattr(pool, '_metrics', None)
+    if metrics is not None:
+        status['metrics'] = metrics.snapshot()
+    return status
+
+
+def configure(app) -> None:
+    """
+    在创建引擎之前调用：为非 SQLite 数据库使用可计时的连接池
+
+    需在 db.init_app(app) 之前执行。
+    """
+    app.config.setdefault('POOL_METRICS_ENABLED', True)
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if app.config['POOL_METRICS_ENABLED'] and not uri.startswith('sqlite') and 'poolclass' not in options:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, 'poolclass': InstrumentedQueuePool}
+
+
+def all_engines(app) -> dict:
+    """主库、各 bind 与只读库的引擎，键为显示名称"""
+    from app import db
+
+    with app.app_context():
+        engines = {key or 'default': engine for key, engine in db.engines.items()}
+    engines.update(app.extensions.get('db_replicas', {}))
+    return engines
+
+
+def init_app(app) -> None:
+    """在 db.init_app(app) 与 db_routing.init_app(app) 之后调用：为所有引擎注册指标"""
+    if not app.config.get('POOL_METRICS_ENABLED'):
+        return
+    for engine in all_engines(app).values():
+        instrument_engine(engine)
@@ -0,0 +1,238 @@
+"""
+令牌桶限流
+
+在请求进入视图函数之前按 Config.RATELIMIT_RULES 为各端点限流，
+超限的请求直接返回 429，不再消耗 bcrypt 计算或数据库扫描。
+
+规则格式为 "<维度>:<次数>/<周期>"，例如 "ip:20/minute"：
+- ip: 按客户端 IP
+- username: 按请求体中的 username 字段（登录、注册）
+- user: 按 JWT 中的用户ID（仅对携带有效 token 的请求生效）
+
+端点有多条规则时先检查全部令牌桶，全部有令牌才同时扣减；任一规则拒绝时
+不扣减其他桶（被拒绝的用户名尝试不会耗尽同一 IP 的配额）。
+
+默认使用进程内存储；多进程部署时可将 RATELIMIT_STORAGE 设置为本机 SQLite
+文件路径，各工作进程共享同一组令牌桶。
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rule(rule: str) -> tuple:
+    """
+    解析限流规则
+
+    Returns:
+        (维度, 桶容量, 每秒补充的令牌数)
+    """
+    scope, limit = rule.split(':', 1)
+    count, period = limit.split('/', 1)
+    capacity = int(count)
+    return scope.strip(), capacity, capacity / PERIODS[period.strip()]
+
+
+def _refill(tokens: float, updated: float, capacity: int, rate: float, now: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def _take(states: list, buckets: list) -> float:
+    """
+    全部桶都有令牌时各扣减一个（原地修改 states）
+
+    Args:
+        states: 与 buckets 对应的补充后令牌数
+        buckets: [(键, 桶容量, 每秒补充的令牌数)]
+
+    Returns:
+        0 表示放行，否则为最长的重试等待秒数
+    """
+    wait = max(((1 - tokens) / rate for tokens, (_, _, rate) in zip(states, buckets) if tokens < 1),
+               default=0)
+    if not wait:
+        states[:] = [tokens - 1 for tokens in states]
+    return wait
+
+
+class MemoryBackend:
+    """进程内令牌桶存储"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, rate: float) -> float:
+        """
+        尝试消耗一个令牌
+
+        Returns:
+            0 表示放行，否则为建议的重试等待秒数
+        """
+        return self.consume_all([(key, capacity, rate)])
+
+    def consume_all(self, buckets: list) -> float:
+        """
+        全部桶都有令牌时各消耗一个，否则都不消耗
+
+        Args:
+            buckets: [(键, 桶容量, 每秒补充的令牌数)]
+
+        Returns:
+            0 表示放行，否则为建议的重试等待秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            states = [_refill(*self._buckets.get(key, (capacity, now)), capacity, rate, now)
+                      for key, capacity, rate in buckets]
+            wait = _take(states, buckets)
+            for (key, _, _), tokens in zip(buckets, states):
+                self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now: float) -> None:
+        """淘汰最久未使用的一半令牌桶（被淘汰的桶下次按满桶重建）"""
+        oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in oldest[:len(oldest) // 2]:
+            del self._buckets[key]
+
+
+class SQLiteBackend:
+    """
+    基于本机 SQLite 文件的令牌桶存储，供同一主机上的多个工作进程共享
+
+    Args:
+        path: SQLite 文件路径
+        max_age: 超过该秒数未更新的桶已补满，定期删除（取规则中最长的周期）
+        prune_interval: 每个进程两次清理之间的最短秒数
+    """
+
+    def __init__(self, path: str, max_age: float = PERIODS['day'], prune_interval: float = 60):
+        self.path = path
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self._pruned_at = time.time()
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+            '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, capacity: int, rate: float) -> float:
+        return self.consume_all([(key, capacity, rate)])
+
+    def consume_all(self, buckets: list) -> float:
+        """全部桶都有令牌时各消耗一个，否则都不消耗（在同一事务内检查与扣减）"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            states = []
+            for key, capacity, rate in buckets:
+                row = conn.execute(
+                    'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+                ).fetchone()
+                states.append(_refill(*(row or (capacity, now)), capacity, rate, now))
+            wait = _take(states, buckets)
+            conn.executemany(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                [(key, tokens, now) for (key, _, _), tokens in zip(buckets, states)]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if now - self._pruned_at >= self.prune_interval:
+            self.prune(now)
+        return wait
+
+    def prune(self, now: float = None) -> int:
+        """删除超过 max_age 未更新的桶（已补满，删除后按满桶重建，结果不变）"""
+        now = now or time.time()
+        self._pruned_at = now
+        cursor = self._connect().execute(
+            'DELETE FROM rate_limit_buckets WHERE updated < ?', (now - self.max_age,)
+        )
+        return cursor.rowcount
+
+    def reset(self) -> None:
+        """丢弃当前线程的连接（fork 出的子进程不能复用父进程的 SQLite 连接）"""
+        self._local = threading.local()
+
+
+def _scope_value(scope: str):
+    """获取限流维度对应的键值，无法确定时返回 None（跳过该规则）"""
+    if scope == 'ip':
+        return request.remote_addr
+    if scope == 'username':
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        return username.strip().lower() if isinstance(username, str) and username.strip() else None
+    if scope == 'user':
+        try:
+            verify_jwt_in_request(optional=True)
+        except Exception:
+            return None
+        return get_jwt_identity()
+    raise ValueError(f'未知的限流维度: {scope}')
+
+
+def check_rate_limit():
+    """before_request 钩子：按端点规则限流"""
+    if not current_app.config.get('RATELIMIT_ENABLED'):
+        return None
+
+    rules = current_app.config.get('RATELIMIT_RULES', {}).get(request.endpoint)
+    if not rules:
+        return None
+
+    buckets = []
+    for rule in rules:
+        scope, capacity, rate = parse_rule(rule)
+        value = _scope_value(scope)
+        if value is not None:
+            buckets.append((f'{request.endpoint}:{scope}:{value}', capacity, rate))
+    if not buckets:
+        return None
+
+    wait = current_app.extensions['rate_limiter'].consume_all(buckets)
+    if wait:
+        response = jsonify({'error': {'code': 'RATE_LIMITED', 'message': '请求过于频繁，请稍后重试'}})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response
+    return None
+
+
+def init_app(app) -> None:
+    """根据配置创建令牌桶存储并注册限流钩子"""
+    app.config.setdefault('RATELIMIT_ENABLED', False)
+    app.config.setdefault('RATELIMIT_STORAGE', 'memory')
+    app.config.setdefault('RATELIMIT_RULES', {})
+
+    storage = app.config['RATELIMIT_STORAGE']
+    if storage and storage != 'memory':
+        periods = [PERIODS[rule.split('/', 1)[1].strip()]
+                   for rules in app.config['RATELIMIT_RULES'].values() for rule in rules]
+        app.extensions['rate_limiter'] = SQLiteBackend(storage, max_age=max(periods, default=PERIODS['day']))
+    else:
+        app.extensions['rate_limiter'] = MemoryBackend()
+
+    app.before_request(check_rate_limit)
@@ -0,0 +1,163 @@
+"""
+借阅读者去重计数草图
+
+借书时把读者写入当月草图和该图书当年草图，统计时按需合并：
+月度草图合并为季度、年度结果，查询代价与借阅记录数量无关。
+每个草图只有一行，只有寄存器真正变化时才对这一行加锁写入。
+"""
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Borrow, ReaderSketch
+from app.services.hll import HyperLogLog
+
+SCOPE_MONTH = 'month'
+SCOPE_BOOK = 'book'
+
+QUARTER_NAMES = ['第一季度', '第二季度', '第三季度', '第四季度']
+
+
+def month_key(year: int, month: int) -> str:
+    return f'{year:04d}-{month:02d}'
+
+
+def book_key(book_id: int, year: int) -> str:
+    return f'{book_id}:{year}'
+
+
+def _update_sketch(scope: str, key: str, user_id: int) -> None:
+    """
+    将读者加入草图
+
+    先不加锁读取：寄存器不会变化时（读者本月已借过书、寄存器已饱和）不加锁也不写库；
+    需要写入时再加行锁重新读取。
+    """
+    row = ReaderSketch.query.filter_by(scope=scope, key=key).first()
+    if row is not None:
+        if not HyperLogLog.from_bytes(row.data).add(user_id):
+            return
+        row = ReaderSketch.query.filter_by(scope=scope, key=key).with_for_update().populate_existing().first()
+    if row is None:
+        sketch = HyperLogLog()
+        sketch.add(user_id)
+        try:
+            with db.session.begin_nested():
+                db.session.add(ReaderSketch(scope=scope, key=key, data=sketch.to_bytes()))
+            return
+        except IntegrityError:
+            # 并发请求已创建同一草图，改为更新
+            row = ReaderSketch.query.filter_by(scope=scope, key=key).with_for_update().first()
+
+    sketch = HyperLogLog.from_bytes(row.data)
+    if sketch.add(user_id):
+        row.data = sketch.to_bytes()
+
+
+def record_borrow(user_id: int, book_id: int, borrow_date) -> None:
+    """
+    借书时更新草图（在借书事务内调用，随借阅记录一起提交）
+
+    Args:
+        user_id: 借阅用户ID
+        book_id: 图书ID
+        borrow_date: 借阅日期
+    """
+    _update_sketch(SCOPE_MONTH, month_key(borrow_date.year, borrow_date.month), user_id)
+    _update_sketch(SCOPE_BOOK, book_key(book_id, borrow_date.year), user_id)
+
+
+def _merged(scope: str, keys: list) -> HyperLogLog:
+    """读取并合并多个草图"""
+    merged = HyperLogLog()
+    rows = ReaderSketch.query.filter(
+        ReaderSketch.scope == scope,
+        ReaderSketch.key.in_(keys)
+    ).all()
+    for row in rows:
+        merged.merge(HyperLogLog.from_bytes(row.data))
+    return merged
+
+
+def distinct_readers_by_period(period: str, year: int) -> list:
+    """
+    按周期估计不同借阅读者数
+
+    Args:
+        period: 统计周期 (month/quarter/year)
+        year: 年份（year 周期时统计最近5年）
+
+    Returns:
+        统计数据列表
+    """
+    if period == 'year':
+        years = range(year - 4, year + 1)
+        keys = [month_key(y, m) for y in years for m in range(1, 13)]
+    else:
+        years = [year]
+        keys = [month_key(year, m) for m in range(1, 13)]
+
+    sketches = {
+        row.key: HyperLogLog.from_bytes(row.data)
+        for row in ReaderSketch.query.filter(
+            ReaderSketch.scope == SCOPE_MONTH,
+            ReaderSketch.key.in_(keys)
+        ).all()
+    }
+
+    def merge_months(y, months):
+        merged = HyperLogLog()
+        for m in months:
+            sketch = sketches.get(month_key(y, m))
+            if sketch is not None:
+                merged.merge(sketch)
+        return merged.count()
+
+    if period == 'month':
+        return [{
+            'period': m,
+            'period_name': f'{m}月',
+            'distinct_readers': merge_months(year, [m])
+        } for m in range(1, 13)]
+
+    if period == 'quarter':
+        return [{
+            'period': q,
+            'period_name': QUARTER_NAMES[q - 1],
+            'distinct_readers': merge_months(year, range(q * 3 - 2, q * 3 + 1))
+        } for q in range(1, 5)]
+
+    return [{
+        'period': y,
+        'period_name': f'{y}年',
+        'distinct_readers': merge_months(y, range(1, 13))
+    } for y in years]
+
+
+def distinct_readers_for_book(book_id: int, year: int) -> int:
+    """估计某图书当年的不同借阅读者数"""
+    return _merged(SCOPE_BOOK, [book_key(book_id, year)]).count()
+
+
+def rebuild_sketches(batch_size: int = 50000) -> int:
+    """
+    根据借阅记录全量重建草图（用于首次上线或导入历史数据后）
+
+    Returns:
+        重建的草图数量
+    """
+    sketches = {}
+    rows = db.session.query(Borrow.user_id, Borrow.book_id, Borrow.borrow_date)
+    for user_id, book_id, borrow_date in rows.yield_per(batch_size):
+        for scope, key in ((SCOPE_MONTH, month_key(borrow_date.year, borrow_date.month)),
+                           (SCOPE_BOOK, book_key(book_id, borrow_date.year))):
+            sketch = sketches.get((scope, key))
+            if sketch is None:
+                sketch = sketches[(scope, key)] = HyperLogLog()
+            sketch.add(user_id)
+
+    ReaderSketch.query.delete()
+    db.session.add_all([
+        ReaderSketch(scope=scope, key=key, data=sketch.to_bytes())
+        for (scope, key), sketch in sketches.items()
+    ])
+    db.session.commit()
+    return len(sketches)
@@ -0,0 +1,230 @@
+"""
+读者借阅汇总
+
+借书、还书时在同一事务中增量更新 reader_summaries 中该读者的一行，
+读者概况接口只需按主键读取这一行，不再扫描借阅记录。汇总行由写路径
+（读者首次借书、还书时）或 rebuild-reader-summaries 命令创建；读接口从不写库，
+尚无汇总行的读者按其借阅记录在内存中计算。
+
+常读作者使用 Space-Saving 算法维护：最多保留 AUTHOR_CAPACITY 个计数器（最小堆），
+新作者在计数器已满时替换计数最小者并继承其计数。排名靠前的作者计数是准确的
+近似值，误差不超过记录的误差上界。
+"""
+import heapq
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Book, Borrow, BorrowStatus, ReaderSummary
+
+AUTHOR_CAPACITY = 20
+TOP_AUTHORS = 5
+
+
+def add_author(counters: list, author: str, capacity: int = AUTHOR_CAPACITY) -> list:
+    """
+    Space-Saving 计数：作者借阅次数加一
+
+    Args:
+        counters: [[次数, 误差上界, 作者]] 最小堆
+        author: 作者
+        capacity: 最多保留的计数器数量
+
+    Returns:
+        新的计数器堆（不修改传入的列表）
+    """
+    heap = [list(counter) for counter in counters]
+    for counter in heap:
+        if counter[2] == author:
+            counter[0] += 1
+            heapq.heapify(heap)
+            return heap
+    if len(heap) < capacity:
+        heapq.heappush(heap, [1, 0, author])
+    else:
+        smallest = heap[0][0]
+        heapq.heapreplace(heap, [smallest + 1, smallest, author])
+    return heap
+
+
+def top_authors(counters: list, limit: int = TOP_AUTHORS) -> list:
+    """按次数从高到低返回前 limit 位作者"""
+    return [
+        {'author': author, 'count': count}
+        for count, _, author in heapq.nlargest(limit, counters, key=lambda c: (c[0], -c[1]))
+    ]
+
+
+def _compute(user_ids: list = None) -> dict:
+    """
+    根据借阅记录计算汇总
+
+    Args:
+        user_ids: 只计算这些读者，None 表示全部
+
+    Returns:
+        {用户ID: ReaderSummary 字段字典}
+    """
+    def scoped(query):
+        return query.filter(Borrow.user_id.in_(user_ids)) if user_ids is not None else query
+
+    summaries = {}
+
+    def summary(user_id):
+        if user_id not in summaries:
+            summaries[user_id] = {
+                'user_id': user_id, 'total_count': 0, 'borrowed_count': 0, 'returned_count': 0,
+                'overdue_count': 0, 'yearly_counts': {}, 'top_authors': [], 'open_loans': []
+            }
+        return summaries[user_id]
+
+    status_fields = {
+        BorrowStatus.BORROWED.value: 'borrowed_count',
+        BorrowStatus.RETURNED.value: 'returned_count',
+        BorrowStatus.OVERDUE.value: 'overdue_count',
+    }
+    for user_id, status, count in scoped(
+        db.session.query(Borrow.user_id, Borrow.status, func.count(Borrow.id))
+    ).group_by(Borrow.user_id, Borrow.status):
+        summary(user_id)[status_fields[status]] = count
+        summary(user_id)['total_count'] += count
+
+    for user_id, year, count in scoped(
+        db.session.query(Borrow.user_id, Borrow.borrow_year, func.count(Borrow.id))
+    ).group_by(Borrow.user_id, Borrow.borrow_year):
+        summary(user_id)['yearly_counts'][str(year)] = count
+
+    authors = {}
+    for user_id, author, count in scoped(
+        db.session.query(Borrow.user_id, Book.author, func.count(Borrow.id))
+        .join(Book, Book.id == Borrow.book_id)
+    ).group_by(Borrow.user_id, Book.author):
+        authors.setdefault(user_id, []).append([count, 0, author])
+    for user_id, counters in authors.items():
+        heap = heapq.nlargest(AUTHOR_CAPACITY, counters)
+        heapq.heapify(heap)
+        summary(user_id)['top_authors'] = heap
+
+    for user_id, borrow_id, due_date in scoped(
+        db.session.query(Borrow.user_id, Borrow.id, Borrow.due_date)
+        .filter(Borrow.status == BorrowStatus.BORROWED.value)
+    ).order_by(Borrow.due_date):
+        summary(user_id)['open_loans'].append([borrow_id, due_date.isoformat()])
+
+    if user_ids is not None:
+        for user_id in user_ids:
+            summary(user_id)
+    return summaries
+
+
+def _lock_or_build(user_id: int):
+    """
+    锁定读者汇总行，不存在时根据借阅记录（含本事务中尚未提交的变更）创建
+
+    Returns:
+        (汇总行, 是否新建)；新建的行已包含本事务的变更，调用方无需再增量更新
+    """
+    row = ReaderSummary.query.filter_by(user_id=user_id).with_for_update().first()
+    if row is not None:
+        return row, False
+    try:
+        with db.session.begin_nested():
+            row = ReaderSummary(**_compute([user_id])[user_id])
+            db.session.add(row)
+        return row, True
+    except IntegrityError:
+        # 并发请求已创建该行（不含本事务的变更），改为增量更新
+        return ReaderSummary.query.filter_by(user_id=user_id).with_for_update().first(), False
+
+
+def record_borrow(borrow: Borrow, book: Book) -> None:
+    """
+    借书时更新汇总（在借书事务内调用，随借阅记录一起提交）
+
+    Args:
+        borrow: 新建的借阅记录（已加入会话）
+        book: 借阅的图书
+    """
+    db.session.flush()
+    row, built = _lock_or_build(borrow.user_id)
+    if built:
+        return
+    year = str(borrow.borrow_date.year)
+    row.total_count += 1
+    row.borrowed_count += 1
+    row.yearly_counts = {**row.yearly_counts, year: row.yearly_counts.get(year, 0) + 1}
+    row.top_authors = add_author(row.top_authors, book.author)
+    row.open_loans = sorted(row.open_loans + [[borrow.id, borrow.due_date.isoformat()]],
+                            key=lambda loan: loan[1])
+
+
+def record_return(borrow: Borrow) -> None:
+    """
+    还书时更新汇总（在还书事务内调用，随借阅记录一起提交）
+
+    Args:
+        borrow: 已更新为归还状态的借阅记录
+    """
+    row, built = _lock_or_build(borrow.user_id)
+    if built:
+        return
+    row.borrowed_count = max(0, row.borrowed_count - 1)
+    if borrow.status == BorrowStatus.OVERDUE.value:
+        row.overdue_count += 1
+    else:
+        row.returned_count += 1
+    row.open_loans = [loan for loan in row.open_loans if loan[0] != borrow.id]
+
+
+def get_summary(user_id: int, today: date = None) -> dict:
+    """
+    读取读者借阅概况（按主键读取一行；尚无汇总行时根据借阅记录在内存中计算，不写库）
+
+    Args:
+        user_id: 用户ID
+        today: 计算当前逾期的基准日期，默认今天
+
+    Returns:
+        概况字典
+    """
+    today = today or date.today()
+    row = db.session.get(ReaderSummary, user_id)
+    if row is None:
+        # 不加入会话，避免读请求提交时写入
+        row = ReaderSummary(**_compute([user_id])[user_id])
+
+    due_dates = [date.fromisoformat(due) for _, due in row.open_loans]
+    return {
+        'user_id': user_id,
+        'total_borrows': row.total_count,
+        'currently_borrowed': row.borrowed_count,
+        'current_overdue': sum(1 for due in due_dates if due < today),
+        'next_due_date': min(due_dates).isoformat() if due_dates else None,
+        'borrowed_this_year': row.yearly_counts.get(str(today.year), 0),
+        'status_counts': {
+            BorrowStatus.BORROWED.value: row.borrowed_count,
+            BorrowStatus.RETURNED.value: row.returned_count,
+            BorrowStatus.OVERDUE.value: row.overdue_count,
+        },
+        'yearly': [
+            {'year': int(year), 'count': count}
+            for year, count in sorted(row.yearly_counts.items())
+        ],
+        'top_authors': top_authors(row.top_authors),
+    }
+
+
+def rebuild_summaries() -> int:
+    """
+    根据借阅记录全量重建读者汇总（首次上线或导入历史数据后）
+
+    Returns:
+        重建的汇总行数
+    """
+    summaries = _compute()
+    ReaderSummary.query.delete()
+    db.session.add_all([ReaderSummary(**fields) for fields in summaries.values()])
+    db.session.commit()
+    return len(summaries)
@@ -0,0 +1,391 @@
+"""
+请求指标（Prometheus 文本格式）
+
+按路由记录请求数（含状态码）、耗时、响应大小、每个请求的 SQL 条数与 SQL 耗时，
+并汇总缓存命中次数与连接池指标，由 /metrics 输出。
+
+每个请求只在开始和结束时各取一次时间、结束时在锁内更新几个计数器；
+每条 SQL 多两次引擎事件回调，开销在微秒级，可在生产环境常开。
+
+gunicorn 多进程部署时，每个工作进程只有自己的计数。配置 METRICS_DIR 后
+各进程定期把快照写入该目录，/metrics 汇总所有进程（含已退出进程）的快照；
+其他进程在快照间隔（METRICS_FLUSH_SECONDS）内的增量要到下次写入后才可见。
+"""
+import bisect
+import glob
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不支持跨进程文件锁
+    fcntl = None
+
+# 直方图上界
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 未匹配到路由（404、405）的请求统一记为同一个路由，避免标签数量失控
+UNMATCHED_ROUTE = '<unmatched>'
+
+# 名称 -> (类型, 说明)
+METRICS = {
+    'library_http_requests_total': ('counter', '按路由、方法和状态码统计的请求数'),
+    'library_http_request_duration_seconds': ('histogram', '请求处理耗时（流式响应为发送完成的时间）'),
+    'library_http_response_size_bytes': ('histogram', '响应体大小（压缩后）'),
+    'library_http_request_db_queries': ('histogram', '每个请求执行的 SQL 条数'),
+    'library_http_request_db_seconds': ('histogram', '每个请求的 SQL 执行总耗时'),
+    'library_cache_hits_total': ('counter', '缓存命中次数'),
+    'library_cache_misses_total': ('counter', '缓存未命中次数'),
+    'library_db_pool_checkouts_total': ('counter', '从连接池取出连接的次数'),
+    'library_db_pool_overflows_total': ('counter', '超出 pool_size 新建的溢出连接数'),
+    'library_db_pool_timeouts_total': ('counter', '等待连接超时的次数'),
+    'library_db_pool_connections_in_use': ('gauge', '当前取出的连接数'),
+    'library_db_pool_wait_seconds': ('histogram', '从连接池取连接的等待时间'),
+}
+
+# 缓存名称 -> app.extensions 中的键
+CACHES = {
+    'jwt_decode': 'jwt_decode_cache',
+    'user_state': 'user_cache',
+    'singleflight': 'singleflight',
+}
+
+
+class _Histogram:
+    """非累计的分桶计数，输出时再累加"""
+
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: tuple) -> dict:
+        result = {}
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            result[(f'{name}_bucket', labels + (('le', _format_bound(bound)),))] = cumulative
+        result[(f'{name}_sum', labels)] = self.sum
+        result[(f'{name}_count', labels)] = cumulative
+        return result
+
+
+def _format_bound(bound) -> str:
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+class RequestMetrics:
+    """进程内的请求指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._histograms = {}
+
+    def _histogram(self, name: str, labels: tuple, buckets: tuple) -> _Histogram:
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram(buckets)
+        return histogram
+
+    def observe(self, method: str, route: str, status: int, seconds: float,
+                size: int = None, queries: int = 0, db_seconds: float = 0.0) -> None:
+        """记录一个已完成的请求"""
+        route_labels = (('route', route),)
+        with self._lock:
+            key = (('method', method), ('route', route), ('status', str(status)))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._histogram('library_http_request_duration_seconds',
+                            (('method', method), ('route', route)), LATENCY_BUCKETS).observe(seconds)
+            if size is not None:
+                self._histogram('library_http_response_size_bytes', route_labels, SIZE_BUCKETS).observe(size)
+            self._histogram('library_http_request_db_queries', route_labels, QUERY_COUNT_BUCKETS).observe(queries)
+            self._histogram('library_http_request_db_seconds', route_labels, LATENCY_BUCKETS).observe(db_seconds)
+
+    def samples(self) -> dict:
+        """{(样本名, 标签): 值}"""
+        with self._lock:
+            result = {('library_http_requests_total', labels): count for labels, count in self._requests.items()}
+            for (name, labels), histogram in self._histograms.items():
+                result.update(histogram.samples(name, labels))
+        return result
+
+
+def _cache_samples(app) -> dict:
+    result = {}
+    for name, key in CACHES.items():
+        cache = app.extensions.get(key)
+        if cache is not None:
+            labels = (('cache', name),)
+            result[('library_cache_hits_total', labels)] = cache.hits
+            result[('library_cache_misses_total', labels)] = cache.misses
+    return result
+
+
+def _pool_samples(app) -> dict:
+    from app.services.pool_metrics import WAIT_BUCKETS, all_engines
+
+    result = {}
+    for name, engine in all_engines(app).items():
+        metrics = getattr(engine.pool, '_metrics', None)
+        if metrics is None:
+            continue
+        labels = (('engine', name),)
+        snapshot = metrics.snapshot()
+        result[('library_db_pool_checkouts_total', labels)] = snapshot['checkouts']
+        result[('library_db_pool_overflows_total', labels)] = snapshot['overflows']
+        result[('library_db_pool_timeouts_total', labels)] = snapshot['timeouts']
+        result[('library_db_pool_connections_in_use', labels)] = snapshot['in_use']
+        wait = snapshot['wait']
+        if wait['count']:
+            for bound in list(WAIT_BUCKETS) + ['+Inf']:
+                result[('library_db_pool_wait_seconds_bucket', labels + (('le', _format_bound(bound)),))] = \
+                    wait['buckets'][str(bound)]
+            result[('library_db_pool_wait_seconds_sum', labels)] = wait['total_seconds']
+            result[('library_db_pool_wait_seconds_count', labels)] = wait['count']
+    return result
+
+
+def collect(app) -> dict:
+    """当前进程的全部样本"""
+    result = app.extensions['request_metrics'].samples()
+    result.update(_cache_samples(app))
+    result.update(_pool_samples(app))
+    return result
+
+
+def merge(*sample_sets) -> dict:
+    """汇总多个进程的样本（计数、直方图与在用连接数都按和计算）"""
+    result = {}
+    for samples in sample_sets:
+        for key, value in samples.items():
+            result[key] = result.get(key, 0) + value
+    return result
+
+
+def render(samples: dict) -> str:
+    """Prometheus 文本格式（0.0.4）"""
+    families = {}
+    for (name, labels), value in samples.items():
+        family = name
+        if name not in METRICS:
+            family = name.rsplit('_', 1)[0]
+        families.setdefault(family, []).append((name, labels, value))
+
+    lines = []
+    for family in sorted(families):
+        kind, help_text = METRICS[family]
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in sorted(families[family], key=_sample_order):
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sample_order(sample):
+    name, labels, _ = sample
+    # 桶按上界数值排序，+Inf 在最后
+    plain = tuple(item for item in labels if item[0] != 'le')
+    le = dict(labels).get('le')
+    return plain, name, float(le) if le is not None else 0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f'worker-{pid}.pickle')
+
+
+def _write(path: str, samples: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(samples, f)
+    os.replace(tmp_path, path)
+
+
+def _read(path: str) -> dict:
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def flush(app, force: bool = False) -> None:
+    """把当前进程的样本写入 METRICS_DIR（距上次写入不足 METRICS_FLUSH_SECONDS 时延后写入）"""
+    directory = app.config.get('METRICS_DIR')
+    if not directory:
+        return
+    state = app.extensions['request_metrics_flush']
+    interval = app.config['METRICS_FLUSH_SECONDS']
+    now = time.monotonic()
+    with state['lock']:
+        if not force and now - state['at'] < interval:
+            # 之后没有新请求时由定时器补写，空闲进程的计数也会在一个间隔内可见
+            if state['timer'] is None:
+                state['timer'] = threading.Timer(interval - (now - state['at']), _flush_pending, (app,))
+                state['timer'].daemon = True
+                state['timer'].start()
+            return
+        state['at'] = now
+    _write(_snapshot_path(directory, os.getpid()), collect(app))
+
+
+def _flush_pending(app) -> None:
+    state = app.extensions['request_metrics_flush']
+    with state['lock']:
+        state['timer'] = None
+    flush(app, force=True)
+
+
+class _DirectoryLock:
+    """METRICS_DIR 上的文件锁：归档时独占，汇总时共享，避免读到归档了一半的快照"""
+
+    def __init__(self, directory: str, exclusive: bool):
+        self.path = os.path.join(directory, 'archive.lock')
+        self.exclusive = exclusive
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def archive_worker(directory: str, pid: int) -> None:
+    """
+    工作进程退出后（gunicorn child_exit 钩子，在主进程中执行）把其快照并入归档
+
+    归档保存所有已退出进程的累计值，使进程重启后计数仍单调递增。
+    在用连接数等瞬时值不计入归档。
+    """
+    path = _snapshot_path(directory, pid)
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(directory, 'archive.pickle')
+    with _DirectoryLock(directory, exclusive=True):
+        samples = {key: value for key, value in _read(path).items()
+                   if METRICS.get(key[0], ('counter',))[0] != 'gauge'}
+        _write(archive_path, merge(_read(archive_path), samples))
+        os.remove(path)
+
+
+def all_samples(app) -> dict:
+    """
+    当前进程的样本，加上 METRICS_DIR 中其他进程与归档的快照
+
+    配置了 METRICS_DIR 时先写出当前进程的快照，再只从文件汇总：各文件中的计数只增不减，
+    无论由哪个工作进程响应抓取，汇总值都单调递增，不会被 Prometheus 误判为计数器重置。
+    """
+    directory = app.config.get('METRICS_DIR')
+    if not directory:
+        return collect(app)
+    flush(app, force=True)
+    with _DirectoryLock(directory, exclusive=False):
+        return merge(*(_read(path) for path in glob.glob(os.path.join(directory, '*.pickle'))))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None or not has_request_context() or 'metrics_start' not in g:
+        return
+    g.metrics_db_queries += 1
+    g.metrics_db_seconds += time.perf_counter() - start
+
+
+def instrument_engine(engine) -> None:
+    """统计引擎上执行的 SQL（异步引擎传入其 sync_engine）"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _start_request() -> None:
+    g.metrics_start = time.perf_counter()
+    g.metrics_db_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _finish_request(response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+
+    app = current_app._get_current_object()
+    metrics = app.extensions['request_metrics']
+    method = request.method
+    route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+    status = response.status_code
+
+    if response.is_streamed and response.content_length is None:
+        # 流式响应在发送过程中才查询数据库，发送完成（关闭响应）时再记录
+        ctx_g = g._get_current_object()
+
+        def on_close():
+            metrics.observe(method, route, status, time.perf_counter() - start, None,
+                            ctx_g.metrics_db_queries, ctx_g.metrics_db_seconds)
+            flush(app)
+        response.call_on_close(on_close)
+    else:
+        metrics.observe(method, route, status, time.perf_counter() - start, response.content_length,
+                        g.metrics_db_queries, g.metrics_db_seconds)
+        flush(app)
+    return response
+
+
+def init_app(app) -> None:
+    """
+    注册请求钩子与 SQL 事件
+
+    需在 db_routing.init_app(app) 之后、其他注册 before_request 的扩展（限流）之前调用，
+    使被限流拒绝的请求也计入；after_request 按注册的逆序执行，记录的是压缩后的大小。
+    """
+    app.config.setdefault('REQUEST_METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_TOKEN', None)
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_SECONDS', 5)
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.extensions['request_metrics_flush'] = {'lock': threading.Lock(), 'at': float('-inf'), 'timer': None}
+    if not app.config['REQUEST_METRICS_ENABLED']:
+        return
+
+    if app.config['METRICS_DIR']:
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+
+    from app.services.pool_metrics import all_engines
+    for engine in all_engines(app).values():
+        instrument_engine(engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
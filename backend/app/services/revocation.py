@@ -0,0 +1,332 @@
+"""
+JWT 吊销
+
+吊销记录持久化在 token_revocations 表中，但请求路径上不查询数据库：
+每个工作进程在内存中维护一个 Bloom 过滤器和一份精确集合。绝大多数令牌
+未被吊销，Bloom 过滤器一次判定即可放行；命中时再查精确集合排除误判。
+
+各工作进程每隔 REVOCATION_SYNC_SECONDS 秒增量拉取其他进程写入的吊销记录。
+增量不按自增ID：并发事务中较小的ID可能在较大的ID被读到之后才提交，按ID推进会永久漏掉它。
+这里按 revoked_at 回看 REVOCATION_SYNC_OVERLAP_SECONDS 秒的重叠窗口，并每隔
+REVOCATION_FULL_SYNC_SECONDS 秒全量重新加载一次未过期的记录，兜底超过窗口的长事务。
+记录在对应令牌过期（JWT_ACCESS_TOKEN_EXPIRES / JWT_REFRESH_TOKEN_EXPIRES）
+后从内存和表中清除。
+
+同一次登录签发的令牌带有相同的 fam 声明（令牌族），refresh token 轮换时沿用。
+已轮换掉的 refresh token 再次出现说明它可能被窃取：吊销整个令牌族，
+合法用户与攻击者手中的令牌一并失效，需重新登录。
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from flask_jwt_extended.default_callbacks import default_revoked_token_callback
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.revocation import TokenRevocation
+
+KIND_JTI = 'jti'
+KIND_USER = 'user'
+KIND_FAMILY = 'family'
+
+
+class BloomFilter:
+    """
+    Bloom 过滤器（双重哈希）
+
+    Args:
+        capacity: 预期元素数量
+        error_rate: 目标误判率
+    """
+
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationList:
+    """
+    进程内吊销列表
+
+    Args:
+        sync_interval: 从数据库增量同步的间隔秒数
+        capacity: Bloom 过滤器初始容量，超出后自动扩容重建
+        overlap: 增量同步按 revoked_at 回看的秒数，需大于最长的写事务与各服务器的时钟偏差
+        full_sync_interval: 全量重新加载未过期记录的间隔秒数
+    """
+
+    def __init__(self, sync_interval: float = 5, capacity: int = 10000, overlap: float = 60,
+                 full_sync_interval: float = 300):
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.overlap = timedelta(seconds=overlap)
+        self.full_sync_interval = full_sync_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._bloom = BloomFilter(self.capacity)
+        self._jtis = {}     # jti -> 过期时间戳
+        self._users = {}    # 用户ID -> (吊销时间戳, 过期时间戳)
+        self._families = {}     # 令牌族ID -> 过期时间戳
+        self._watermark = None      # 已读到的最大 revoked_at
+        self._synced_at = None
+        self._full_synced_at = None
+
+    def _remember(self, kind: str, value: str, revoked_at: float, expires_at: float) -> None:
+        """写入内存（调用方持有锁）"""
+        if kind == KIND_JTI:
+            self._jtis[value] = expires_at
+        elif kind == KIND_FAMILY:
+            self._families[value] = expires_at
+        else:
+            previous = self._users.get(value)
+            if previous is None or previous[0] < revoked_at:
+                self._users[value] = (revoked_at, expires_at)
+        if len(self._jtis) + len(self._users) + len(self._families) > self._bloom.capacity:
+            self._rebuild(self._bloom.capacity * 2)
+        else:
+            self._bloom.add(f'{kind}:{value}')
+
+    def _rebuild(self, capacity: int) -> None:
+        """按当前精确集合重建 Bloom 过滤器（调用方持有锁）"""
+        bloom = BloomFilter(max(self.capacity, capacity))
+        for jti in self._jtis:
+            bloom.add(f'{KIND_JTI}:{jti}')
+        for user_id in self._users:
+            bloom.add(f'{KIND_USER}:{user_id}')
+        for family in self._families:
+            bloom.add(f'{KIND_FAMILY}:{family}')
+        self._bloom = bloom
+
+    def _expire(self, now: float) -> None:
+        """丢弃已过期的条目（调用方持有锁）"""
+        jtis = {k: v for k, v in self._jtis.items() if v > now}
+        users = {k: v for k, v in self._users.items() if v[1] > now}
+        families = {k: v for k, v in self._families.items() if v > now}
+        if (len(jtis) != len(self._jtis) or len(users) != len(self._users)
+                or len(families) != len(self._families)):
+            self._jtis, self._users, self._families = jtis, users, families
+            self._rebuild(len(jtis) + len(users) + len(families))
+
+    def sync(self, force: bool = False) -> None:
+        """
+        从数据库拉取新增的吊销记录，到期时同时清理过期条目
+
+        增量同步读取 revoked_at 不早于（已读到的最大 revoked_at - overlap）的记录，
+        重复读到的记录写入内存是幂等的；force 或到达全量间隔时读取全部未过期记录。
+        内存条目只在过期时清除，同步只做并集，请求线程不会看到中间状态。
+        """
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+
+        with self._lock:
+            if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            full = (force or self._full_synced_at is None
+                    or now - self._full_synced_at >= self.full_sync_interval)
+            query = TokenRevocation.query.filter(TokenRevocation.expires_at > _utcnow())
+            if not full and self._watermark is not None:
+                query = query.filter(TokenRevocation.revoked_at >= self._watermark - self.overlap)
+            rows = query.all()
+            for row in rows:
+                self._remember(row.kind, row.value, _to_timestamp(row.revoked_at),
+                               _to_timestamp(row.expires_at))
+                if self._watermark is None or row.revoked_at > self._watermark:
+                    self._watermark = row.revoked_at
+            if full:
+                self._full_synced_at = now
+            self._expire(time.time())
+            self._synced_at = now
+
+    def is_revoked(self, jwt_payload: dict) -> bool:
+        """判断令牌是否已被吊销"""
+        self.sync()
+
+        jti = jwt_payload.get('jti')
+        if f'{KIND_JTI}:{jti}' in self._bloom and jti in self._jtis:
+            return True
+
+        family = jwt_payload.get('fam')
+        if family is not None and self.is_family_revoked(family):
+            return True
+
+        user_id = str(jwt_payload.get('sub'))
+        if f'{KIND_USER}:{user_id}' in self._bloom:
+            entry = self._users.get(user_id)
+            # iat 只精确到秒，吊销所在这一秒内签发的令牌也一并视为吊销
+            if entry is not None and jwt_payload.get('iat', 0) <= entry[0]:
+                return True
+        return False
+
+    def is_family_revoked(self, family: str) -> bool:
+        """判断令牌族是否已被整体吊销"""
+        return f'{KIND_FAMILY}:{family}' in self._bloom and family in self._families
+
+    def add(self, kind: str, value: str, revoked_at: datetime, expires_at: datetime) -> None:
+        """本进程已提交的吊销记录立即生效，不等待下一次同步"""
+        with self._lock:
+            self._remember(kind, value, _to_timestamp(revoked_at), _to_timestamp(expires_at))
+
+
+def get_revocation_list() -> RevocationList:
+    return current_app.extensions['token_revocations']
+
+
+def _add_after_commit(kind: str, values: list, revoked_at: datetime, expires_at: datetime) -> None:
+    """记录本事务写入的吊销，提交后再写入本进程内存；回滚时丢弃"""
+    pending = db.session.info.setdefault('pending_revocations', [])
+    revocations = get_revocation_list()
+    pending.extend((revocations, kind, value, revoked_at, expires_at) for value in values)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed(session):
+    for revocations, *entry in session.info.pop('pending_revocations', ()):
+        revocations.add(*entry)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('pending_revocations', None)
+
+
+def _max_token_lifetime() -> timedelta:
+    """access token 与 refresh token 中较长的有效期"""
+    lifetimes = [
+        current_app.config.get(key) for key in ('JWT_ACCESS_TOKEN_EXPIRES', 'JWT_REFRESH_TOKEN_EXPIRES')
+    ]
+    lifetimes = [value for value in lifetimes if isinstance(value, timedelta)]
+    return max(lifetimes) if lifetimes else timedelta(days=1)
+
+
+def revoke_token(jwt_payload: dict) -> None:
+    """
+    吊销单个令牌（登出、refresh token 轮换）
+
+    在当前事务中写入记录，由调用方提交；提交后在本进程立即生效。
+    """
+    now = _utcnow()
+    exp = jwt_payload.get('exp')
+    expires_at = (datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+                  if exp else now + _max_token_lifetime())
+    record = TokenRevocation(kind=KIND_JTI, value=jwt_payload['jti'],
+                             revoked_at=now, expires_at=expires_at)
+    db.session.add(record)
+    _add_after_commit(KIND_JTI, [record.value], now, expires_at)
+
+
+def revoke_family(family: str) -> None:
+    """
+    吊销整个 refresh token 族：同一次登录经轮换签发的全部令牌
+
+    族中最新的令牌不晚于现在签发，记录保留到最长令牌有效期之后即可。
+    在当前事务中写入记录，由调用方提交；提交后在本进程立即生效。
+    """
+    now = _utcnow()
+    expires_at = now + _max_token_lifetime()
+    db.session.add(TokenRevocation(kind=KIND_FAMILY, value=family,
+                                   revoked_at=now, expires_at=expires_at))
+    _add_after_commit(KIND_FAMILY, [family], now, expires_at)
+
+
+def revoke_user_tokens(user_id) -> None:
+    """
+    吊销用户在此之前签发的全部令牌（禁用账户、变更角色）
+
+    在当前事务中写入记录，由调用方提交。
+    """
+    revoke_users_tokens([user_id])
+
+
+def revoke_users_tokens(user_ids) -> int:
+    """
+    批量吊销多个用户此前签发的全部令牌（批量禁用、批量变更角色）
+
+    以一条多行 INSERT 在当前事务中写入，由调用方提交；提交后在本进程立即生效。
+
+    Returns:
+        吊销的用户数
+    """
+    values = [str(user_id) for user_id in user_ids]
+    if not values:
+        return 0
+    now = _utcnow()
+    expires_at = now + _max_token_lifetime()
+    db.session.execute(insert(TokenRevocation), [
+        {'kind': KIND_USER, 'value': value, 'revoked_at': now, 'expires_at': expires_at}
+        for value in values
+    ])
+    _add_after_commit(KIND_USER, values, now, expires_at)
+    return len(values)
+
+
+def purge_expired() -> int:
+    """删除已过期的吊销记录，返回删除条数"""
+    deleted = TokenRevocation.query.filter(
+        TokenRevocation.expires_at <= _utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def init_app(app) -> None:
+    """创建进程内吊销列表并注册 flask_jwt_extended 的黑名单与吊销回调"""
+    from app import jwt
+
+    app.config.setdefault('REVOCATION_SYNC_SECONDS', 5)
+    app.config.setdefault('REVOCATION_BLOOM_CAPACITY', 10000)
+    app.config.setdefault('REVOCATION_SYNC_OVERLAP_SECONDS', 60)
+    app.config.setdefault('REVOCATION_FULL_SYNC_SECONDS', 300)
+    app.extensions['token_revocations'] = RevocationList(
+        sync_interval=app.config['REVOCATION_SYNC_SECONDS'],
+        capacity=app.config['REVOCATION_BLOOM_CAPACITY'],
+        overlap=app.config['REVOCATION_SYNC_OVERLAP_SECONDS'],
+        full_sync_interval=app.config['REVOCATION_FULL_SYNC_SECONDS']
+    )
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return get_revocation_list().is_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def on_revoked_token(jwt_header, jwt_payload):
+        # 已吊销的 refresh token 被再次使用（重放）：吊销它所在的整个令牌族
+        family = jwt_payload.get('fam')
+        if jwt_payload.get('type') == 'refresh' and family is not None \
+                and not get_revocation_list().is_family_revoked(family):
+            revoke_family(family)
+            db.session.commit()
+            current_app.logger.warning('用户 %s 重放已吊销的 refresh token，吊销令牌族 %s',
+                                       jwt_payload.get('sub'), family)
+        return default_revoked_token_callback(jwt_header, jwt_payload)
@@ -0,0 +1,243 @@
+"""
+请求合并（single-flight）
+
+同一时刻到达的相同请求只执行一次：第一个请求负责计算，其余请求等待并共享其结果。
+进程内通过线程事件协调；配置 SINGLEFLIGHT_LOCK_DIR 后，多个工作进程之间再通过
+文件锁协调：等待者以非阻塞方式轮询文件锁（最多等待 wait_timeout 秒）并登记等待文件，
+领头进程只在有人等待时写出结果文件，等待者拿到锁后直接读取。
+结果文件在 result_ttl 秒后删除，长时间未使用的锁文件随之清理。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt
+
+from app.services.db_routing import current_replica
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不支持跨进程文件锁，仅做进程内合并
+    fcntl = None
+
+
+class _Call:
+    """一次进行中的计算"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    相同 key 的并发调用合并器
+
+    Args:
+        lock_dir: 跨进程锁与结果文件目录，None 表示仅进程内合并
+        wait_timeout: 等待领头计算的最长秒数，超时后自行计算
+        result_ttl: 跨进程结果文件保留的秒数
+    """
+
+    # 跨进程等待时轮询文件锁的间隔（秒）
+    poll_interval = 0.05
+
+    def __init__(self, lock_dir: str = None, wait_timeout: float = 30, result_ttl: float = 10):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self._pruned_at = time.time()
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 共享领头结果的次数（hits）与自行计算的次数（misses）
+        self.hits = 0
+        self.misses = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn):
+        """
+        执行 fn 或等待进行中的同 key 调用并共享其结果
+
+        Args:
+            key: 合并键
+            fn: 无参计算函数，返回值需可 pickle（跨进程时）
+
+        Returns:
+            fn 的返回值
+        """
+        arrived_at = time.time()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            if not call.event.wait(self.wait_timeout):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, arrived_at)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _run(self, key: str, fn, arrived_at: float):
+        """跨进程合并：持有文件锁计算，或读取在本请求到达之后完成的结果"""
+        if not self.lock_dir:
+            return fn()
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f'{digest}.lock')
+        result_path = os.path.join(self.lock_dir, f'{digest}.result')
+        wait_path = os.path.join(self.lock_dir, f'{digest}.wait')
+
+        try:
+            with open(lock_path, 'a') as lock_file:
+                if not self._acquire(lock_file, wait_path, arrived_at + self.wait_timeout):
+                    # 领头进程超时未完成，自行计算
+                    return fn()
+                try:
+                    locked_at = time.time()
+                    os.utime(lock_path)
+                    # 其他进程在本请求等待期间完成了同一计算，直接复用
+                    try:
+                        if os.path.getmtime(result_path) >= arrived_at:
+                            with open(result_path, 'rb') as f:
+                                return pickle.load(f)
+                    except (OSError, EOFError, pickle.UnpicklingError):
+                        pass
+
+                    result = fn()
+                    # 只有在本进程持锁期间有其他进程开始等待时才写出结果
+                    try:
+                        waited = os.path.getmtime(wait_path) >= locked_at
+                    except OSError:
+                        waited = False
+                    if waited:
+                        fd, tmp_path = tempfile.mkstemp(dir=self.lock_dir)
+                        with os.fdopen(fd, 'wb') as f:
+                            pickle.dump(result, f)
+                        os.replace(tmp_path, result_path)
+                    return result
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            self._prune()
+
+    def _acquire(self, lock_file, wait_path: str, deadline: float) -> bool:
+        """非阻塞轮询文件锁直到 deadline；首次等待时登记等待文件。拿到锁返回 True"""
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            if not waiting:
+                with open(wait_path, 'a'):
+                    pass
+                os.utime(wait_path)
+                waiting = True
+            if time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def _prune(self) -> None:
+        """
+        删除过期的结果文件与等待文件，以及 result_ttl 内未使用且无人持有的锁文件
+
+        每个进程最多每 result_ttl 秒扫描一次目录。删除锁文件与打开它的进程存在竞争，
+        最坏情况下同一请求被计算两次，不影响结果。
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at < self.result_ttl:
+                return
+            self._pruned_at = now
+
+        try:
+            names = os.listdir(self.lock_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if now - os.path.getmtime(path) < self.result_ttl:
+                    continue
+                if name.endswith('.lock'):
+                    with open(path, 'a') as lock_file:
+                        try:
+                            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                        os.unlink(path)
+                else:
+                    # 结果文件、等待文件与写入中断遗留的临时文件
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+def init_app(app) -> None:
+    """初始化请求合并器"""
+    app.config.setdefault('SINGLEFLIGHT_ENABLED', True)
+    app.config.setdefault('SINGLEFLIGHT_LOCK_DIR', None)
+    app.config.setdefault('SINGLEFLIGHT_WAIT_SECONDS', 30)
+    app.config.setdefault('SINGLEFLIGHT_RESULT_TTL', 10)
+    app.extensions['singleflight'] = SingleFlight(
+        lock_dir=app.config['SINGLEFLIGHT_LOCK_DIR'],
+        wait_timeout=app.config['SINGLEFLIGHT_WAIT_SECONDS'],
+        result_ttl=app.config['SINGLEFLIGHT_RESULT_TTL']
+    )
+
+
+def _request_key() -> str:
+    """由端点、排序后的查询参数、调用者角色和读取的库（主库/只读库）组成合并键"""
+    try:
+        role = get_jwt().get('role')
+    except RuntimeError:
+        role = None
+    source = 'replica' if current_replica() else 'primary'
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    return f'{request.method} {request.path}?{args} role={role} db={source}'
+
+
+def coalesce(view):
+    """
+    视图装饰器：合并并发的相同只读请求
+
+    只适用于结果与调用者身份无关（仅与角色有关）的 GET 接口，
+    需放在 @jwt_required() 之下以便按角色区分。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        app = current_app._get_current_object()
+        if not app.config.get('SINGLEFLIGHT_ENABLED'):
+            return view(*args, **kwargs)
+
+        def compute():
+            response = app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        body, status, headers = app.extensions['singleflight'].do(_request_key(), compute)
+        return app.response_class(body, status=status, headers=headers)
+    return wrapper
@@ -0,0 +1,189 @@
+"""
+SQL 分析（逐请求记录每条 SQL 与耗时，发现 N+1 查询）
+
+两种启用方式：
+- SQL_PROFILER_ENABLED = True 时分析所有请求（开发环境默认开启）；
+- 管理员请求携带 X-SQL-Profile: 1 头时只分析该次请求，用于排查生产环境的慢接口。
+
+同一请求中相同形状（参数与字面量替换为占位符后相同）的语句执行
+SQL_PROFILER_REPEAT_THRESHOLD 次及以上，视为 N+1 候选。摘要写入 X-SQL-Profile 响应头，
+明细写入日志（有 N+1 候选时为 WARNING，否则为 DEBUG）。流式响应在发送过程中才执行查询，
+只在发送完成后写日志。
+
+测试中用 capture_queries() 统计代码块内执行的 SQL，conftest 中的 query_budget
+夹具在超出预算时列出全部语句并使测试失败。
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from sqlalchemy import event
+
+PROFILE_HEADER = 'X-SQL-Profile'
+
+_local = threading.local()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# IN 列表展开后的参数个数随数据变化，统一为一个占位符
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement: str) -> str:
+    """语句形状：字面量替换为 ?，IN 列表合并为 (?)，空白合并为一个空格"""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryLog:
+    """一段代码（一个请求或一个 with 块）内执行的 SQL"""
+
+    def __init__(self):
+        self.queries = []
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries.append((statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold: int) -> list:
+        """执行次数不少于 threshold 的语句形状，返回 [(形状, 次数, 总耗时)]，按次数降序"""
+        counts = Counter()
+        seconds = Counter()
+        for statement, elapsed in self.queries:
+            shape = statement_shape(statement)
+            counts[shape] += 1
+            seconds[shape] += elapsed
+        return [(shape, count, seconds[shape]) for shape, count in counts.most_common() if count >= threshold]
+
+    def summary(self, threshold: int) -> str:
+        """响应头中的摘要，如 queries=12; time_ms=3.41; repeated=1"""
+        return (f'queries={self.count}; time_ms={self.total_seconds * 1000:.2f}; '
+                f'repeated={len(self.repeated(threshold))}')
+
+    def report(self, threshold: int) -> str:
+        """多行明细：N+1 候选在前，随后按执行顺序列出每条语句"""
+        lines = [self.summary(threshold)]
+        for shape, count, seconds in self.repeated(threshold):
+            lines.append(f'  N+1 候选 x{count} ({seconds * 1000:.2f} ms): {shape}')
+        for i, (statement, seconds) in enumerate(self.queries, 1):
+            lines.append(f'  {i:>3}. {seconds * 1000:8.2f} ms  {_WHITESPACE.sub(" ", statement).strip()}')
+        return '\n'.join(lines)
+
+
+def _active_logs() -> list:
+    logs = list(getattr(_local, 'logs', ()))
+    if has_request_context():
+        request_log = g.get('sql_profile')
+        if request_log is not None:
+            logs.append(request_log)
+    return logs
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profiler_start', None)
+    if start is None:
+        return
+    logs = _active_logs()
+    if not logs:
+        return
+    seconds = time.perf_counter() - start
+    for log in logs:
+        log.record(statement, seconds)
+
+
+def instrument_engine(engine) -> None:
+    """记录引擎上执行的 SQL（没有进行中的分析时回调立即返回）"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def capture_queries():
+    """
+    统计 with 块内当前线程执行的 SQL
+
+    用法：
+        with capture_queries() as log:
+            client.get('/api/borrows')
+        assert log.count <= 3
+    """
+    log = QueryLog()
+    stack = getattr(_local, 'logs', None)
+    if stack is None:
+        stack = _local.logs = []
+    stack.append(log)
+    try:
+        yield log
+    finally:
+        stack.remove(log)
+
+
+def _profile_requested() -> bool:
+    """请求头要求分析且当前用户为管理员"""
+    if request.headers.get(PROFILE_HEADER) != '1':
+        return False
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False
+    return get_jwt().get('role') == 'admin'
+
+
+def _start_profile() -> None:
+    if current_app.config.get('SQL_PROFILER_ENABLED') or _profile_requested():
+        g.sql_profile = QueryLog()
+
+
+def _log_profile(app, method: str, path: str, log: QueryLog) -> None:
+    threshold = app.config['SQL_PROFILER_REPEAT_THRESHOLD']
+    if log.repeated(threshold):
+        app.logger.warning('SQL 分析 %s %s 存在重复查询（可能是 N+1）\n%s', method, path, log.report(threshold))
+    else:
+        app.logger.debug('SQL 分析 %s %s\n%s', method, path, log.report(threshold))
+
+
+def _finish_profile(response):
+    log = g.get('sql_profile')
+    if log is None:
+        return response
+
+    app = current_app._get_current_object()
+    method, path = request.method, request.full_path.rstrip('?')
+    if response.is_streamed and response.content_length is None:
+        # 响应头已在查询之前确定，只在发送完成后写日志
+        response.call_on_close(lambda: _log_profile(app, method, path, log))
+    else:
+        response.headers[PROFILE_HEADER] = log.summary(app.config['SQL_PROFILER_REPEAT_THRESHOLD'])
+        _log_profile(app, method, path, log)
+    return response
+
+
+def init_app(app) -> None:
+    """在 db_routing.init_app(app) 之后调用：为所有引擎注册 SQL 事件与请求钩子"""
+    app.config.setdefault('SQL_PROFILER_ENABLED', False)
+    app.config.setdefault('SQL_PROFILER_REPEAT_THRESHOLD', 3)
+
+    from app.services.pool_metrics import all_engines
+    for engine in all_engines(app).values():
+        instrument_engine(engine)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
@@ -0,0 +1,96 @@
+"""
+JWT 解码缓存
+
+同一个 access token 在短时间内会被反复提交（页面加载时的一批并发请求），
+每次都重新校验签名、解析声明是重复劳动。这里包装 flask_jwt_extended 公开的
+decode_token，在 jwt_required 的解码入口前加一个按应用隔离的小型 LRU：
+命中时只检查过期时间，吊销检查仍然每次执行。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_jwt_extended import decode_token, view_decorators
+
+from app.services import tracing
+
+
+class DecodeCache:
+    """
+    已校验令牌声明的 LRU 缓存
+
+    Args:
+        max_size: 最多缓存的令牌数量
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str, leeway: float = 0):
+        """返回未过期的缓存声明，不存在或已过期时返回 None"""
+        with self._lock:
+            claims = self._items.get(token)
+            if claims is None:
+                self.misses += 1
+                return None
+            exp = claims.get('exp')
+            if exp is not None and exp + leeway <= time.time():
+                del self._items[token]
+                self.misses += 1
+                return None
+            self._items.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        with self._lock:
+            self._items[token] = claims
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+logger = logging.getLogger(__name__)
+
+
+def cached_decode_token(encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+    """
+    带缓存的 decode_token，参数与 flask_jwt_extended.decode_token 相同
+
+    带 CSRF 校验或允许过期的解码结果与调用参数相关，不走缓存。
+    """
+    cache = current_app.extensions.get('jwt_decode_cache')
+    if cache is None or cache.max_size <= 0 or csrf_value is not None or allow_expired:
+        return decode_token(encoded_token, csrf_value, allow_expired)
+
+    leeway = current_app.config.get('JWT_DECODE_LEEWAY', 0)
+    with tracing.span('jwt.decode') as span:
+        claims = cache.get(encoded_token, leeway)
+        span.set_attribute('cache.hit', claims is not None)
+        if claims is None:
+            claims = decode_token(encoded_token)
+            cache.put(encoded_token, claims)
+    return dict(claims)
+
+
+def init_app(app) -> None:
+    """创建解码缓存，并让 jwt_required 通过 cached_decode_token 解码"""
+    app.config.setdefault('JWT_DECODE_CACHE_SIZE', 1024)
+    app.extensions['jwt_decode_cache'] = DecodeCache(app.config['JWT_DECODE_CACHE_SIZE'])
+
+    current = getattr(view_decorators, 'decode_token', None)
+    if current is decode_token:
+        view_decorators.decode_token = cached_decode_token
+    elif current is not cached_decode_token:
+        # flask_jwt_extended 改变了内部调用方式，不再替换，退回到每次解码
+        logger.warning('flask_jwt_extended.view_decorators.decode_token 不是预期的函数，未启用解码缓存')
@@ -0,0 +1,409 @@
+"""
+请求链路追踪
+
+按采样率选取请求，记录请求内各阶段的 span：路由处理函数、JWT 解码、用户状态查询、
+每条 SQL、事务提交、bcrypt 计算和 JSON 序列化，用于定位慢请求的耗时落在哪一步。
+
+追踪上下文按 W3C Trace Context 传播：请求携带 traceparent 头时沿用其追踪 ID 与父 span。
+是否记录默认仍按 TRACING_SAMPLE_RATE 在本地决定（任何客户端都能伪造采样标志，强制记录每个请求）；
+只有上游是可信的网关或服务时才配置 TRACING_TRUST_UPSTREAM 沿用其采样标志。
+响应头 X-Trace-Id 返回追踪 ID，便于按 ID 查看。
+
+记录完成的追踪保存在进程内的环形缓冲区（管理员接口 /api/metrics/traces 查看），
+配置 TRACING_FILE 时同时按行追加到文件。两者都使用 OTLP/JSON 格式
+（ExportTraceServiceRequest），之后可直接交给 OpenTelemetry Collector 的 otlpjsonfile 接收器，
+或改为发送到 Collector 的 /v1/traces。
+
+未采样的请求只生成追踪 ID，span() 立即返回，开销可以忽略。
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from app.services.db_routing import RoutingSession
+
+TRACEPARENT = 'traceparent'
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+# OTLP 枚举值
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(value: str):
+    """解析 traceparent 头，返回 (trace_id, parent_span_id, sampled)，格式无效时返回 None"""
+    match = _TRACEPARENT.match((value or '').strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        # OTLP/JSON 中 64 位整数以字符串表示
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    """一个计时区间"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'kind',
+                 'start_ns', 'end_ns', 'attributes', 'status', 'message')
+
+    def __init__(self, name: str, trace_id: str, parent_id, kind: int, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.message = ''
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.message = message
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': _attribute_value(value)}
+                           for key, value in self.attributes.items() if value is not None],
+            'status': {'code': self.status, 'message': self.message} if self.message else {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """未采样时 span() 返回的占位对象"""
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """单个请求的追踪，stack 为当前打开的 span（栈顶为新 span 的父 span）"""
+
+    def __init__(self, trace_id: str, parent_id, sampled: bool):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans = []
+        self.stack = []
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, attributes: dict = None) -> Span:
+        parent_id = self.stack[-1].span_id if self.stack else self.parent_id
+        span = Span(name, self.trace_id, parent_id, kind, attributes or {})
+        self.spans.append(span)
+        self.stack.append(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if self.stack and self.stack[-1] is span:
+            self.stack.pop()
+        elif span in self.stack:
+            self.stack.remove(span)
+
+    def finish(self) -> None:
+        """结束仍未关闭的 span（请求异常中断时）"""
+        for span in reversed(self.stack):
+            span.end_ns = time.time_ns()
+            if span.status == STATUS_UNSET:
+                span.set_error('未正常结束')
+        self.stack.clear()
+
+
+def current_trace():
+    """当前请求的追踪，不在请求中时返回 None"""
+    if not has_request_context():
+        return None
+    return g.get('trace')
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    记录一个 span，当前请求未采样时不做任何事
+
+    用法：
+        with tracing.span('borrow.check_overdue', **{'user.id': user_id}) as s:
+            ...
+            s.set_attribute('overdue.count', count)
+    """
+    trace = current_trace()
+    if trace is None or not trace.sampled:
+        yield NOOP_SPAN
+        return
+    current = trace.start_span(name, kind, attributes)
+    try:
+        yield current
+    except Exception as e:
+        current.set_error(f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        trace.end_span(current)
+
+
+def to_otlp(spans: list, service_name: str) -> dict:
+    """OTLP/JSON 的 ExportTraceServiceRequest"""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+class TraceBuffer:
+    """最近完成的追踪（环形缓冲区），可选同时追加到文件"""
+
+    def __init__(self, max_traces: int = 200, path: str = None, service_name: str = 'library-backend'):
+        self._lock = threading.Lock()
+        self._traces = deque(maxlen=max_traces)
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, trace: Trace) -> None:
+        root = trace.spans[0]
+        summary = {
+            'trace_id': trace.trace_id,
+            'name': root.name,
+            'start_time': datetime.fromtimestamp(root.start_ns / 1e9, timezone.utc),
+            'duration_ms': round(root.duration_ms, 3),
+            'status_code': root.attributes.get('http.status_code'),
+            'span_count': len(trace.spans),
+        }
+        with self._lock:
+            self._traces.append((summary, trace.spans))
+        if self.path:
+            line = json.dumps(to_otlp(trace.spans, self.service_name), ensure_ascii=False, separators=(',', ':'))
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def recent(self, limit: int = 50, min_ms: float = 0) -> list:
+        """最近的追踪摘要，按时间倒序"""
+        with self._lock:
+            traces = list(self._traces)
+        summaries = [summary for summary, _ in reversed(traces) if summary['duration_ms'] >= min_ms]
+        return summaries[:limit]
+
+    def get(self, trace_id: str):
+        """按追踪 ID 返回 OTLP/JSON，不存在时返回 None"""
+        with self._lock:
+            traces = list(self._traces)
+        spans = [span for summary, trace_spans in traces if summary['trace_id'] == trace_id
+                 for span in trace_spans]
+        return to_otlp(spans, self.service_name) if spans else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+def _start_trace() -> None:
+    app = current_app
+    parent = parse_traceparent(request.headers.get(TRACEPARENT))
+    if parent and app.config['TRACING_TRUST_UPSTREAM']:
+        sampled = parent[2]
+    else:
+        sampled = random.random() < app.config['TRACING_SAMPLE_RATE']
+    if parent:
+        trace = Trace(parent[0], parent[1], sampled)
+    else:
+        trace = Trace(_new_id(16), None, sampled)
+    g.trace = trace
+    if trace.sampled:
+        route = request.url_rule.rule if request.url_rule else None
+        trace.start_span(f'{request.method} {route or request.path}', KIND_SERVER, {
+            'http.method': request.method,
+            'http.route': route,
+            'http.target': request.full_path.rstrip('?'),
+        })
+
+
+def _export(app, trace: Trace) -> None:
+    trace.end_span(trace.spans[0])
+    trace.finish()
+    app.extensions['trace_buffer'].export(trace)
+
+
+def _finish_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+
+    response.headers[TRACE_ID_HEADER] = trace.trace_id
+    if not trace.sampled or not trace.spans:
+        return response
+
+    root = trace.spans[0]
+    root.set_attribute('http.status_code', response.status_code)
+    if response.status_code >= 500:
+        root.set_error(f'HTTP {response.status_code}')
+    app = current_app._get_current_object()
+    if response.is_streamed and response.content_length is None:
+        # 流式响应在发送过程中执行查询，发送完成后再结束根 span
+        response.call_on_close(lambda: _export(app, trace))
+    else:
+        _export(app, trace)
+    return response
+
+
+def _traced_view(endpoint: str, view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with span(endpoint, **{'code.function': endpoint}):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def trace_views(app) -> None:
+    """在注册蓝图之后调用：为每个路由处理函数加上 span"""
+    if not app.config.get('TRACING_ENABLED'):
+        return
+    for endpoint, view in list(app.view_functions.items()):
+        if endpoint != 'static':
+            app.view_functions[endpoint] = _traced_view(endpoint, view)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    if context is None or trace is None or not trace.sampled:
+        return
+    max_length = current_app.config['TRACING_STATEMENT_LENGTH']
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'SQL'
+    context._trace_span = trace.start_span(operation, KIND_CLIENT, {
+        'db.system': conn.dialect.name,
+        'db.statement': statement[:max_length],
+        'db.executemany': executemany or None,
+    })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = getattr(context, '_trace_span', None)
+    trace = current_trace()
+    if current is not None and trace is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            current.set_attribute('db.rowcount', cursor.rowcount)
+        trace.end_span(current)
+
+
+def _handle_error(exception_context) -> None:
+    context = exception_context.execution_context
+    current = getattr(context, '_trace_span', None)
+    trace = current_trace()
+    if current is not None and trace is not None and current.end_ns is None:
+        current.set_error(f'{type(exception_context.original_exception).__name__}: '
+                          f'{exception_context.original_exception}')
+        trace.end_span(current)
+
+
+def instrument_engine(engine) -> None:
+    """为引擎上的每条 SQL 记录 span（异步引擎传入其 sync_engine）"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _start_commit(session) -> None:
+    trace = current_trace()
+    if trace is not None and trace.sampled:
+        g.trace_commit = trace.start_span('db.commit')
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _end_commit(session) -> None:
+    current = g.pop('trace_commit', None) if has_request_context() else None
+    if current is not None:
+        current_trace().end_span(current)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _rollback_commit(session) -> None:
+    current = g.pop('trace_commit', None) if has_request_context() else None
+    if current is not None:
+        current.set_error('提交失败，已回滚')
+        current_trace().end_span(current)
+
+
+def init_app(app) -> None:
+    """
+    在 db_routing.init_app(app) 之后调用：创建追踪缓冲区，为所有引擎注册 SQL 事件并注册请求钩子
+
+    与请求指标一样需在其他 after_request 钩子（压缩）之前注册，使根 span 包含这些钩子的耗时。
+    """
+    app.config.setdefault('TRACING_ENABLED', True)
+    app.config.setdefault('TRACING_SAMPLE_RATE', 0.01)
+    app.config.setdefault('TRACING_TRUST_UPSTREAM', False)
+    app.config.setdefault('TRACING_BUFFER_SIZE', 200)
+    app.config.setdefault('TRACING_FILE', None)
+    app.config.setdefault('TRACING_SERVICE_NAME', 'library-backend')
+    app.config.setdefault('TRACING_STATEMENT_LENGTH', 2000)
+    app.extensions['trace_buffer'] = TraceBuffer(
+        max_traces=app.config['TRACING_BUFFER_SIZE'],
+        path=app.config['TRACING_FILE'],
+        service_name=app.config['TRACING_SERVICE_NAME']
+    )
+    if not app.config['TRACING_ENABLED']:
+        return
+
+    from app.services.pool_metrics import all_engines
+    for engine in all_engines(app).values():
+        instrument_engine(engine)
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
@@ -0,0 +1,150 @@
+"""
+用户状态缓存
+
+已认证接口只需要读取用户的角色与启用状态，却每次都按主键查询 users 表。
+这里按用户ID缓存这些字段（TTL + LRU），所有路由模块通过 get_user_state 读取。
+
+通过 ORM 修改、新增或删除用户时，在事务提交后自动失效对应条目；
+批量导入等绕过 ORM 的写入需调用 invalidate_all。其他工作进程的修改
+最迟在 USER_CACHE_TTL 秒后生效（禁用账户的令牌由吊销列表立即拦截）。
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.services import tracing
+from app.models.user import User
+
+UserState = namedtuple('UserState', ['id', 'username', 'email', 'role', 'is_active'])
+
+# 缓存“用户不存在”的占位值
+_MISSING = object()
+
+
+class UserStateCache:
+    """
+    用户状态 TTL/LRU 缓存
+
+    Args:
+        ttl: 条目有效秒数
+        max_size: 最多缓存的用户数
+    """
+
+    def __init__(self, ttl: float = 30, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, loader):
+        """
+        读取用户状态，未命中或过期时调用 loader(user_id) 加载
+
+        Returns:
+            UserState，用户不存在时返回 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[1] > now:
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return None if item[0] is _MISSING else item[0]
+            self.misses += 1
+
+        state = loader(user_id)
+        with self._lock:
+            self._items[user_id] = (_MISSING if state is None else state, now + self.ttl)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return state
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+def _load_user_state(user_id: int):
+    row = db.session.query(
+        User.id, User.username, User.email, User.role, User.is_active
+    ).filter(User.id == user_id).first()
+    return UserState(*row) if row else None
+
+
+def _cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('user_cache')
+
+
+def get_user_state(user_id):
+    """
+    获取用户状态
+
+    Args:
+        user_id: 用户ID（JWT identity 为字符串，这里统一转换为整数）
+
+    Returns:
+        UserState，用户不存在或ID无效时返回 None
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cache = _cache()
+    with tracing.span('user.lookup', **{'user.id': user_id}):
+        if cache is None or cache.ttl <= 0:
+            return _load_user_state(user_id)
+        return cache.get(user_id, _load_user_state)
+
+
+def invalidate_user(user_id) -> None:
+    """使单个用户的缓存失效"""
+    cache = _cache()
+    if cache is not None:
+        cache.invalidate(int(user_id))
+
+
+def invalidate_all() -> None:
+    """清空用户状态缓存"""
+    cache = _cache()
+    if cache is not None:
+        cache.clear()
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _mark_user_dirty(mapper, connection, target):
+    """记录本事务中变更的用户，提交后再失效，避免其他线程在提交前重新缓存旧值"""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('user_cache_dirty', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('user_cache_dirty', ()):
+        invalidate_user(user_id)
+
+
+def init_app(app) -> None:
+    """创建用户状态缓存"""
+    app.config.setdefault('USER_CACHE_TTL', 30)
+    app.config.setdefault('USER_CACHE_SIZE', 10000)
+    app.extensions['user_cache'] = UserStateCache(
+        ttl=app.config['USER_CACHE_TTL'],
+        max_size=app.config['USER_CACHE_SIZE']
+    )
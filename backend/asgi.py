@@ -0,0 +1,19 @@
+"""
+异步读路径 ASGI 入口
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+图书查询与借阅记录列表由协程处理，其余接口转交 Flask（见 app/asgi.py）。
+需要安装 requirements-async.txt 中的依赖。
+"""
+import os
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from app import create_app
+from app.asgi import create_asgi_app
+from config import config
+
+flask_app = create_app(config[os.environ.get('FLASK_ENV') or 'production'])
+app = create_asgi_app(flask_app)
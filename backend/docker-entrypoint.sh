@@ -32,4 +32,7 @@ echo "初始化数据库..."
 python scripts/init_db.py all || echo "数据库已初始化"
 
 echo "启动应用..."
-exec python run.py
+if [ "${FLASK_ENV}" = "development" ]; then
+    exec python run.py
+fi
+exec gunicorn -c gunicorn.conf.py wsgi:app
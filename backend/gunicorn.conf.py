@@ -0,0 +1,83 @@
+"""
+gunicorn 配置
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+工作模式（GUNICORN_WORKER_CLASS）:
+- gthread（默认）: 每个进程若干线程，适合当前以数据库查询和 bcrypt 为主的负载
+- gevent: 协程，适合大量慢连接；需要额外安装 gevent
+
+主进程预加载应用后再 fork 工作进程，各进程共享只读的代码与对象页面（写时复制）。
+预加载期间关闭垃圾回收，fork 前 gc.freeze() 后重新开启：冻结的对象不再被回收器扫描、
+写入对象头，共享页面不会被复制，主进程与工作进程之后产生的对象照常回收。
+
+平滑重启: kill -HUP <主进程PID> 按新配置逐个替换工作进程；预加载模式下 HUP 不会
+重新导入代码，升级代码需 kill -USR2 启动新主进程后再向旧主进程发送 TERM，或直接重启容器。
+"""
+import gc
+import multiprocessing
+import os
+
+# 预加载应用期间不做垃圾回收，避免在共享页面上留下空洞
+gc.disable()
+
+cpu_count = multiprocessing.cpu_count()
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # 预加载时应用在主进程导入，必须在此之前打补丁，否则已创建的锁和套接字不受 gevent 调度
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+if worker_class == 'gthread':
+    # 线程模型下 GIL 限制单进程吞吐，进程数与核数一致，并发由线程提供
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count))
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count * 2 + 1))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# 定期替换工作进程，限制内存碎片与泄漏的累积；抖动避免所有进程同时重启
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# 设为空字符串关闭访问日志
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """应用已预加载、工作进程尚未 fork：冻结现有对象，之后的回收不再扫描它们"""
+    gc.freeze()
+    # 主进程常驻运行（重启工作进程、归档指标），恢复回收；fork 出的工作进程随之开启
+    gc.enable()
+
+
+def post_fork(server, worker):
+    """工作进程中丢弃从主进程继承的连接"""
+    from wsgi import after_fork
+    after_fork()
+
+
+def worker_exit(server, worker):
+    """工作进程退出前写出最后一次指标快照"""
+    from wsgi import app
+    from app.services import request_metrics
+    request_metrics.flush(app, force=True)
+
+
+def child_exit(server, worker):
+    """工作进程退出后（主进程中）把其指标快照并入归档，重启后计数不丢失"""
+    from wsgi import app
+    from app.services import request_metrics
+    if app.config.get('METRICS_DIR'):
+        request_metrics.archive_worker(app.config['METRICS_DIR'], worker.pid)
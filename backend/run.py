@@ -2,6 +2,7 @@
 应用入口文件
 """
 import os
+import click
 
 # 加载 .env 文件
 from dotenv import load_dotenv
@@ -22,6 +23,56 @@ def init_db():
     print('数据库初始化完成！')
 
 
+@app.cli.command('compute-cohorts')
+@click.option('--full', is_flag=True, help='忽略上次计算进度，全量重算')
+def compute_cohorts(full):
+    """增量计算读者留存矩阵（建议每日定时执行）"""
+    from app.services.cohort import compute_cohorts as run
+    written = run(full=full)
+    print(f'留存矩阵计算完成，更新 {written} 个单元格')
+
+
+@app.cli.command('rebuild-sketches')
+def rebuild_sketches():
+    """根据借阅记录全量重建去重读者草图"""
+    from app.services.reader_sketches import rebuild_sketches as run
+    count = run()
+    print(f'去重读者草图重建完成，共 {count} 个草图')
+
+
+@app.cli.command('rebuild-reader-summaries')
+def rebuild_reader_summaries():
+    """根据借阅记录全量重建读者借阅汇总"""
+    from app.services.reader_summary import rebuild_summaries
+    count = rebuild_summaries()
+    print(f'读者借阅汇总重建完成，共 {count} 位读者')
+
+
+@app.cli.command('import-readers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', type=int, default=None, help='并行哈希进程数，默认使用全部 CPU 核心')
+def import_readers(path, workers):
+    """从 CSV/XLSX 文件批量导入读者（不受接口的行数上限限制）"""
+    from app.services.enrollment import ImportFileError, read_rows, import_readers as run
+    try:
+        with open(path, 'rb') as f:
+            rows = read_rows(path, f)
+    except ImportFileError as e:
+        raise click.ClickException(str(e))
+    report = run(rows, hash_workers=workers if workers is not None else os.cpu_count())
+    for error in report['errors']:
+        print(f"第 {error['row']} 行 {error['username']}: {error['message']}")
+    print(f"导入完成：成功 {report['created']} 行，失败 {report['failed']} 行")
+
+
+@app.cli.command('purge-revocations')
+def purge_revocations():
+    """清理已过期的 JWT 吊销记录"""
+    from app.services.revocation import purge_expired
+    deleted = purge_expired()
+    print(f'已清理 {deleted} 条过期吊销记录')
+
+
 @app.cli.command('drop-db')
 def drop_db():
     """删除所有表"""
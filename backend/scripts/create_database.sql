@@ -10,11 +10,15 @@ CREATE TABLE IF NOT EXISTS users (
     username VARCHAR(50) NOT NULL UNIQUE,
     password_hash VARCHAR(255) NOT NULL,
     email VARCHAR(100) NOT NULL UNIQUE,
+    student_id VARCHAR(32) NULL UNIQUE,
     role ENUM('admin', 'reader') DEFAULT 'reader' NOT NULL,
     is_active BOOLEAN DEFAULT TRUE NOT NULL,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
     INDEX idx_username (username),
-    INDEX idx_email (email)
+    INDEX idx_email (email),
+    INDEX idx_users_role_active_created (role, is_active, created_at),
+    INDEX idx_users_active_created (is_active, created_at),
+    INDEX idx_users_created (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 图书表
@@ -39,6 +43,9 @@ CREATE TABLE IF NOT EXISTS borrows (
     user_id INT NOT NULL,
     book_id INT NOT NULL,
     borrow_date DATE NOT NULL,
+    borrow_year SMALLINT NOT NULL,
+    borrow_quarter SMALLINT NOT NULL,
+    borrow_month SMALLINT NOT NULL,
     due_date DATE NOT NULL,
     return_date DATE,
     status ENUM('borrowed', 'returned', 'overdue') DEFAULT 'borrowed' NOT NULL,
@@ -47,5 +54,54 @@ CREATE TABLE IF NOT EXISTS borrows (
     FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
     INDEX idx_book_id (book_id),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_borrow_year_quarter_month (borrow_year, borrow_quarter, borrow_month),
+    INDEX idx_borrow_year_book (borrow_year, book_id),
+    INDEX idx_borrow_year_user (borrow_year, user_id),
+    INDEX idx_borrow_year_status (borrow_year, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 读者留存矩阵表（每日增量计算）
+CREATE TABLE IF NOT EXISTS cohort_retention (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cohort_month DATE NOT NULL,
+    month_offset SMALLINT NOT NULL,
+    cohort_size INT DEFAULT 0 NOT NULL,
+    active_users INT DEFAULT 0 NOT NULL,
+    computed_at DATETIME NOT NULL,
+    UNIQUE KEY uq_cohort_month_offset (cohort_month, month_offset)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 借阅读者 HyperLogLog 草图表
+CREATE TABLE IF NOT EXISTS reader_sketches (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    scope VARCHAR(10) NOT NULL,
+    `key` VARCHAR(32) NOT NULL,
+    data BLOB NOT NULL,
+    updated_at DATETIME,
+    UNIQUE KEY uq_reader_sketch_scope_key (scope, `key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 读者借阅汇总表
+CREATE TABLE IF NOT EXISTS reader_summaries (
+    user_id INT PRIMARY KEY,
+    total_count INT DEFAULT 0 NOT NULL,
+    borrowed_count INT DEFAULT 0 NOT NULL,
+    returned_count INT DEFAULT 0 NOT NULL,
+    overdue_count INT DEFAULT 0 NOT NULL,
+    yearly_counts JSON NOT NULL,
+    top_authors JSON NOT NULL,
+    open_loans JSON NOT NULL,
+    updated_at DATETIME,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- JWT 吊销记录表
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(10) NOT NULL,
+    value VARCHAR(64) NOT NULL,
+    revoked_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL,
+    INDEX ix_token_revocations_expires_at (expires_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,518 @@
+"""
+基准测试数据生成脚本
+
+按生产规模生成图书、读者与借阅记录，用于压测与慢查询分析：
+- 图书：ISBN-13（978-7 前缀，校验位有效），热门图书副本更多
+- 读者：学号、邮箱；全部使用同一个预先计算的 bcrypt 哈希（密码 password123）
+- 借阅：按学期规律分布（3 月、9 月开学高峰，寒暑假低谷，周末减少），图书热度服从 Zipf 分布，
+  读者活跃度长尾；一部分逾期归还，在借记录中一部分已逾期；每本书的在借数不超过库存
+
+按编号区间切分为分片，由多个进程并行生成，每个进程使用自己的连接以批量 INSERT 写入
+（MySQL 驱动把 executemany 改写为多行 INSERT）。图书与读者的主键由脚本指定，借阅记录直接引用
+而无需回查。
+
+用法：
+    python scripts/init_db.py init
+    python scripts/generate_data.py --books 2000000 --users 300000 --borrows 20000000
+    # 生成后重建派生数据
+    flask --app run.py rebuild-sketches
+    flask --app run.py rebuild-reader-summaries
+    flask --app run.py compute-cohorts --full
+"""
+import argparse
+import bisect
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+# 添加项目根目录到路径
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+# 加载 .env 文件
+from dotenv import load_dotenv
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+from sqlalchemy import create_engine, func
+
+from app import create_app, db
+from app.models import Book, Borrow, User
+from app.services.passwords import get_password_hasher
+from scripts.init_db import get_config
+
+PASSWORD = 'password123'
+# 每个分片的行数，分片是进程间分配任务的单位
+SHARD_ROWS = 100000
+# 借阅历史之前已入学的年数（高年级读者）
+ENROLLED_YEARS = 4
+# 编号置换使用的乘数（质数），让热门图书与活跃读者分散在整个编号区间
+SCATTER = 2654435761
+# 按期归还的图书平均借阅天数（与 borrow_rows 中的分布一致）
+MEAN_KEPT_DAYS = 12
+
+# 借阅量的月份系数：开学月份最高，寒暑假最低
+MONTH_WEIGHTS = {1: 0.5, 2: 0.4, 3: 1.4, 4: 1.1, 5: 1.0, 6: 1.1,
+                 7: 0.3, 8: 0.3, 9: 1.6, 10: 1.2, 11: 1.1, 12: 1.0}
+# 周一到周日的系数
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.9, 0.6, 0.5)
+# 注册量的月份系数：新生集中在 9 月入学，3 月有少量春季入学
+ENROLL_MONTH_WEIGHTS = {9: 12.0, 3: 3.0}
+
+TITLE_PREFIXES = ('', '', '深入理解', '现代', '实用', '高等', '图解', '大学', '经典', '简明', '应用', '基础')
+TITLE_SUBJECTS = ('数据结构', '操作系统', '计算机网络', '线性代数', '概率论', '微观经济学', '有机化学',
+                  '量子力学', '中国近代史', '西方哲学', '统计学习', '机器学习', '数据库系统', '编译原理',
+                  '信号与系统', '材料力学', '分子生物学', '宏观经济学', '心理学', '社会学', '法理学',
+                  '会计学', '市场营销', '古代汉语', '英美文学', '艺术史', '电路分析', '数值分析')
+TITLE_SUFFIXES = ('', '', '教程', '导论', '原理', '实践', '精要', '习题集', '研究', '概论')
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红建文辉国兵宁晨'
+PUBLISHERS = ('人民邮电出版社', '机械工业出版社', '清华大学出版社', '电子工业出版社', '高等教育出版社',
+              '北京大学出版社', '科学出版社', '中华书局', '商务印书馆', '人民文学出版社',
+              '上海译文出版社', '中信出版社', '浙江大学出版社', '复旦大学出版社', '化学工业出版社')
+ZONES = 'ABCDEFGH'
+
+
+def isbn13(number: int) -> str:
+    """根据序号生成带连字符的 ISBN-13（978-7 中国大陆前缀），number 需小于 10^8"""
+    body = f'9787{number:08d}'
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body))
+    return f'978-7-{body[4:8]}-{body[8:]}-{(10 - total % 10) % 10}'
+
+
+class Calendar:
+    """
+    按每日权重抽样日期
+
+    Args:
+        start: 起始日期
+        end: 结束日期（含）
+        weight: 日期 -> 权重
+    """
+
+    def __init__(self, start: date, end: date, weight):
+        self.dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        self.cumulative = list(accumulate(weight(day) for day in self.dates))
+
+    def sample(self, rng: random.Random) -> int:
+        """按权重抽取一天，返回其序号"""
+        index = bisect.bisect_right(self.cumulative, rng.random() * self.cumulative[-1])
+        return min(index, len(self.dates) - 1)
+
+    def allocate(self, total: int) -> list:
+        """把 total 个事件按权重分配到各天，返回每天结束时的累计数量"""
+        return [round(total * value / self.cumulative[-1]) for value in self.cumulative]
+
+
+def borrow_weight(day: date) -> float:
+    weight = MONTH_WEIGHTS[day.month] * WEEKDAY_WEIGHTS[day.weekday()]
+    if day.month in (3, 9) and day.day <= 14:
+        # 开学前两周集中借书
+        weight *= 1.5
+    return weight
+
+
+def enroll_weight(day: date) -> float:
+    return ENROLL_MONTH_WEIGHTS.get(day.month, 0.3)
+
+
+class Plan:
+    """
+    生成参数，由主进程构造后随分片任务传给各工作进程
+
+    同一参数与随机种子生成的数据完全相同；每个分片使用由种子和分片起点派生的独立随机数。
+
+    Args:
+        books: 图书数量
+        users: 读者数量
+        borrows: 借阅记录数量（含在借）
+        today: 借阅历史的结束日期
+        years: 借阅历史的年数
+        seed: 随机种子
+        zipf: 图书热度的 Zipf 指数，越大越集中
+        overdue_rate: 已归还记录中逾期归还的比例
+        open_overdue_rate: 在借记录中已逾期的比例
+    """
+
+    def __init__(self, books: int, users: int, borrows: int, today: date, years: int = 3, seed: int = 42,
+                 zipf: float = 1.0, overdue_rate: float = 0.08, open_overdue_rate: float = 0.1):
+        self.books = books
+        self.users = users
+        self.borrows = borrows
+        self.today = today
+        self.seed = seed
+        self.zipf = zipf
+        self.overdue_rate = overdue_rate
+        self.open_overdue_rate = open_overdue_rate
+        self.history_start = today - timedelta(days=365 * years)
+        self.user_start = self.history_start - timedelta(days=365 * ENROLLED_YEARS)
+        # 写入前由主进程根据已有数据设置
+        self.book_base = 1
+        self.user_base = 1
+        self.password_hash = ''
+        self._rank_inverse = pow(SCATTER, -1, books) if books else 0
+
+    def rng(self, kind: str, start: int) -> random.Random:
+        return random.Random(f'{self.seed}:{kind}:{start}')
+
+    def _zipf_cdf(self, rank: float) -> float:
+        """热度排名小于 rank 的借阅占比（连续近似）"""
+        s = self.zipf
+        if s == 1:
+            return math.log(rank + 1) / math.log(self.books + 1)
+        return ((rank + 1) ** (1 - s) - 1) / ((self.books + 1) ** (1 - s) - 1)
+
+    def popular_index(self, rng: random.Random) -> int:
+        """按 Zipf 分布抽取热度排名（_zipf_cdf 的逆函数），再置换为图书序号"""
+        n, s = self.books, self.zipf
+        if s == 1:
+            rank = int((n + 1) ** rng.random()) - 1
+        else:
+            rank = int((((n + 1) ** (1 - s) - 1) * rng.random() + 1) ** (1 / (1 - s))) - 1
+        return min(rank, n - 1) * SCATTER % n
+
+    def popularity_rank(self, index: int) -> int:
+        """popular_index 的逆置换：图书序号对应的热度排名（0 最热门）"""
+        return index * self._rank_inverse % self.books
+
+    def daily_loans(self, rank: int) -> float:
+        """热度排名为 rank 的图书平均每天被借的次数"""
+        days = (self.today - self.history_start).days or 1
+        return self.borrows * (self._zipf_cdf(rank + 1) - self._zipf_cdf(rank)) / days
+
+
+class Readers:
+    """
+    读者的注册日期与借阅抽样
+
+    读者序号按注册时间递增，某天借书的读者只从当天及之前注册的前若干个序号中抽取，
+    再按每位读者固定的活跃度拒绝抽样，使少数读者借阅远多于其他人。
+    """
+
+    def __init__(self, plan: Plan):
+        self.base = plan.user_base
+        self.days = Calendar(plan.user_start, plan.today, enroll_weight)
+        self.enrolled = self.days.allocate(plan.users)
+
+    def created(self, index: int) -> date:
+        """序号为 index 的读者的注册日期"""
+        return self.days.dates[min(bisect.bisect_right(self.enrolled, index), len(self.days.dates) - 1)]
+
+    def pick(self, rng: random.Random, day: date):
+        """抽取一位在 day 之前已注册的读者，返回其 ID；当时还没有读者时返回 None"""
+        registered = self.enrolled[(day - self.days.dates[0]).days]
+        if registered == 0:
+            return None
+        while True:
+            index = int(rng.random() * registered)
+            if rng.random() < 0.1 + 0.9 * ((index * SCATTER) % 1000 / 999) ** 3:
+                return self.base + index
+
+
+def borrow_row(rng: random.Random, user_id: int, book_id: int, borrowed: date, returned, status: str) -> dict:
+    """借阅记录行；批量写入不经过 ORM 事件，分桶列在这里填充"""
+    return {
+        'user_id': user_id,
+        'book_id': book_id,
+        'borrow_date': borrowed,
+        'borrow_year': borrowed.year,
+        'borrow_quarter': (borrowed.month - 1) // 3 + 1,
+        'borrow_month': borrowed.month,
+        'due_date': Borrow.calculate_due_date(borrowed),
+        'return_date': returned,
+        'status': status,
+        'created_at': datetime(borrowed.year, borrowed.month, borrowed.day, 8 + int(rng.random() * 13),
+                               int(rng.random() * 60), int(rng.random() * 60)),
+    }
+
+
+def book_rows(plan: Plan, start: int, count: int, loans: list):
+    """
+    生成图书，并把在借的副本追加到 loans
+
+    在借记录按副本生成，保证每本书的在借数不超过总库存：根据 Little 定律，
+    在借册数 ≈ 日均借阅次数 × 平均借阅天数，热门图书的大部分副本处于借出状态。
+    """
+    rng = plan.rng('books', start)
+    readers = Readers(plan)
+    catalog_days = (plan.history_start - plan.user_start).days
+    history_days = (plan.today - plan.history_start).days
+    for index in range(start, start + count):
+        book_id = plan.book_base + index
+        rank = plan.popularity_rank(index)
+        # 热门图书副本更多：最热门约 9 本，长尾 1~2 本
+        stock = 1 + round(8 * (1 + rank) ** -0.2)
+        on_loan_share = min(0.9, plan.daily_loans(rank) * MEAN_KEPT_DAYS / stock)
+        available = stock
+        for _ in range(stock):
+            if rng.random() >= on_loan_share:
+                continue
+            if rng.random() < plan.open_overdue_rate:
+                days_ago = Borrow.DEFAULT_BORROW_DAYS + 1 + int(rng.expovariate(1 / 45))
+            else:
+                days_ago = int(rng.random() * (Borrow.DEFAULT_BORROW_DAYS + 1))
+            borrowed = plan.today - timedelta(days=min(days_ago, history_days))
+            user_id = readers.pick(rng, borrowed)
+            if user_id is not None:
+                loans.append(borrow_row(rng, user_id, book_id, borrowed, None, 'borrowed'))
+                available -= 1
+
+        title = rng.choice(TITLE_PREFIXES) + rng.choice(TITLE_SUBJECTS) + rng.choice(TITLE_SUFFIXES)
+        edition = 1 + int(rng.random() ** 4 * 6)
+        if edition > 1:
+            title += f'（第{edition}版）'
+        author = rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES)
+        if rng.random() < 0.6:
+            author += rng.choice(GIVEN_NAMES)
+        if rng.random() < 0.15:
+            author += ' 等'
+        created = plan.user_start + timedelta(days=int(rng.random() * catalog_days))
+        yield {
+            'id': book_id,
+            'isbn': isbn13(book_id),
+            'title': title,
+            'author': author,
+            'publisher': rng.choice(PUBLISHERS),
+            'location': f'{rng.choice(ZONES)}区-{1 + int(rng.random() * 40):02d}-{1 + int(rng.random() * 6):02d}',
+            'total_stock': stock,
+            'available_stock': available,
+            'created_at': datetime(created.year, created.month, created.day, 9 + int(rng.random() * 9)),
+        }
+
+
+def user_rows(plan: Plan, start: int, count: int):
+    rng = plan.rng('users', start)
+    readers = Readers(plan)
+    for index in range(start, start + count):
+        user_id = plan.user_base + index
+        created = readers.created(index)
+        # 少数读者（教职工）没有学号
+        student_id = f'{created.year}{user_id:08d}' if rng.random() < 0.92 else None
+        yield {
+            'id': user_id,
+            'username': f'reader{user_id:07d}',
+            'password_hash': plan.password_hash,
+            'email': f'reader{user_id:07d}@stu.example.edu',
+            'student_id': student_id,
+            'role': 'reader',
+            'is_active': rng.random() < 0.97,
+            'created_at': datetime(created.year, created.month, created.day, 8 + int(rng.random() * 12),
+                                   int(rng.random() * 60), int(rng.random() * 60)),
+        }
+
+
+def borrow_rows(plan: Plan, start: int, count: int):
+    """生成已归还的历史借阅记录（在借记录由 book_rows 生成）"""
+    rng = plan.rng('borrows', start)
+    readers = Readers(plan)
+    days = Calendar(plan.history_start, plan.today, borrow_weight)
+    last = len(days.dates) - 1
+    for _ in range(count):
+        user_id = None
+        while user_id is None:
+            day = days.sample(rng)
+            user_id = readers.pick(rng, days.dates[day])
+        book_id = plan.book_base + plan.popular_index(rng)
+
+        if rng.random() < plan.overdue_rate:
+            kept = Borrow.DEFAULT_BORROW_DAYS + 1 + int(rng.expovariate(0.1))
+        else:
+            # 平均约 12 天（MEAN_KEPT_DAYS）
+            kept = int(31 * rng.random() ** 1.5)
+        if kept > last - day:
+            # 近期借出的书在今天之前已归还
+            kept = int(rng.random() * (last - day + 1))
+        status = 'overdue' if kept > Borrow.DEFAULT_BORROW_DAYS else 'returned'
+        yield borrow_row(rng, user_id, book_id, days.dates[day], days.dates[day + kept], status)
+
+
+# 工作进程的数据库连接，由 _init_worker 创建
+_connection = None
+
+
+def _init_worker(database_uri: str) -> None:
+    global _connection
+    if database_uri.startswith('sqlite'):
+        # SQLite 同一时间只有一个写事务，其他进程生成下一批数据时等待写锁
+        engine = create_engine(database_uri, connect_args={'timeout': 120})
+    else:
+        engine = create_engine(database_uri, pool_size=1, max_overflow=0)
+    _connection = engine.connect()
+    if engine.dialect.name == 'mysql':
+        # 主键与外键由脚本保证，批量写入期间跳过检查
+        _connection.exec_driver_sql('SET SESSION unique_checks = 0, foreign_key_checks = 0')
+    elif engine.dialect.name == 'sqlite':
+        _connection.exec_driver_sql('PRAGMA synchronous = OFF')
+    _connection.commit()
+
+
+def _write(table, rows, batch_size: int) -> int:
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            with _connection.begin():
+                _connection.execute(table.insert(), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        with _connection.begin():
+            _connection.execute(table.insert(), batch)
+        written += len(batch)
+    return written
+
+
+def _run_shard(task: tuple) -> tuple:
+    """生成并写入一个分片，返回 (类型, 行数, 在借记录数)"""
+    kind, plan, start, count, batch_size = task
+    if kind == 'books':
+        loans = []
+        written = _write(Book.__table__, book_rows(plan, start, count, loans), batch_size)
+        return kind, written, _write(Borrow.__table__, loans, batch_size)
+    if kind == 'users':
+        return kind, _write(User.__table__, user_rows(plan, start, count), batch_size), 0
+    return kind, _write(Borrow.__table__, borrow_rows(plan, start, count), batch_size), 0
+
+
+def _shards(kind: str, plan: Plan, total: int, batch_size: int) -> list:
+    return [(kind, plan, start, min(SHARD_ROWS, total - start), batch_size)
+            for start in range(0, total, SHARD_ROWS)]
+
+
+def _run(tasks: list, database_uri: str, workers: int, log) -> int:
+    """执行分片任务，返回在借记录总数"""
+    labels = {'books': '图书', 'users': '读者', 'borrows': '借阅记录'}
+    totals = Counter()
+    for kind, _, _, count, _ in tasks:
+        totals[kind] += count
+    done = Counter()
+    opened = 0
+    started = time.perf_counter()
+
+    def collect(results):
+        nonlocal opened
+        for kind, written, loans in results:
+            done[kind] += written
+            opened += loans
+            rate = (sum(done.values()) + opened) / (time.perf_counter() - started)
+            log(f'{labels[kind]} {done[kind]:,}/{totals[kind]:,}（{rate:,.0f} 行/秒）')
+
+    if workers <= 1:
+        _init_worker(database_uri)
+        try:
+            collect(map(_run_shard, tasks))
+        finally:
+            _connection.close()
+    else:
+        with multiprocessing.Pool(workers, _init_worker, (database_uri,)) as pool:
+            collect(pool.imap_unordered(_run_shard, tasks))
+    return opened
+
+
+def generate(app, plan: Plan, workers: int = None, batch_size: int = 5000, log=print) -> dict:
+    """
+    生成并写入数据
+
+    先并行写入读者和图书（连同在借记录），再把剩余数量作为已归还的历史记录写入。
+    新数据的主键接在已有数据之后，可以在已有数据的库中多次执行。
+
+    Args:
+        app: Flask 应用（提供数据库地址与 bcrypt 配置）
+        plan: 生成参数
+        workers: 并行进程数，None 表示使用全部 CPU 核心
+        batch_size: 每次 INSERT 写入的行数
+        log: 进度输出函数
+
+    Returns:
+        各类数据的写入数量与耗时
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    started = time.perf_counter()
+
+    with app.app_context():
+        db.create_all()
+        plan.book_base = (db.session.query(func.max(Book.id)).scalar() or 0) + 1
+        plan.user_base = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+        if plan.book_base + plan.books > 10 ** 8:
+            raise ValueError('图书编号超出 ISBN 序号范围（10^8）')
+        # 所有读者共用一个哈希，只计算一次
+        plan.password_hash = get_password_hasher().hash(PASSWORD)
+        db.session.remove()
+        # 工作进程使用自己的连接，不继承主进程的连接池
+        db.engine.dispose()
+
+    tasks = _shards('users', plan, plan.users, batch_size) + _shards('books', plan, plan.books, batch_size)
+    opened = _run(tasks, database_uri, workers, log)
+    returned = max(plan.borrows - opened, 0)
+    _run(_shards('borrows', plan, returned, batch_size), database_uri, workers, log)
+
+    return {
+        'books': plan.books,
+        'users': plan.users,
+        'borrows': returned + opened,
+        'open_borrows': opened,
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+
+
+def _rate(value: str) -> float:
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise argparse.ArgumentTypeError('比例需在 0~1 之间')
+    return rate
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='生成基准测试数据')
+    parser.add_argument('--books', type=int, default=1000000, help='图书数量')
+    parser.add_argument('--users', type=int, default=200000, help='读者数量')
+    parser.add_argument('--borrows', type=int, default=10000000, help='借阅记录数量')
+    parser.add_argument('--years', type=int, default=3, help='借阅历史的年数')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='借阅历史的结束日期（YYYY-MM-DD），默认今天')
+    parser.add_argument('--zipf', type=float, default=1.0, help='图书热度的 Zipf 指数')
+    parser.add_argument('--overdue-rate', type=_rate, default=0.08, help='已归还记录中逾期归还的比例')
+    parser.add_argument('--open-overdue-rate', type=_rate, default=0.1, help='在借记录中已逾期的比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数，默认 CPU 核心数')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每次 INSERT 写入的行数')
+    args = parser.parse_args(argv)
+
+    if args.borrows and (args.books < 1 or args.users < 1):
+        parser.error('生成借阅记录需要至少一本图书和一位读者')
+    if args.years < 1 or args.zipf <= 0:
+        parser.error('--years 需至少为 1，--zipf 需大于 0')
+
+    app = create_app(get_config())
+    if ':memory:' in app.config['SQLALCHEMY_DATABASE_URI']:
+        parser.error('内存数据库无法在多个进程间共享')
+
+    plan = Plan(args.books, args.users, args.borrows, args.today, years=args.years, seed=args.seed,
+                zipf=args.zipf, overdue_rate=args.overdue_rate,
+                open_overdue_rate=args.open_overdue_rate)
+    try:
+        result = generate(app, plan, workers=args.workers, batch_size=args.batch_size,
+                          log=lambda message: print(message, file=sys.stderr))
+    except ValueError as e:
+        print(f'生成失败: {e}', file=sys.stderr)
+        return 2
+
+    print(f"完成：图书 {result['books']:,}、读者 {result['users']:,}、借阅记录 {result['borrows']:,}"
+          f"（在借 {result['open_borrows']:,}），用时 {result['seconds']} 秒")
+    print(f'读者密码均为 {PASSWORD}。接下来重建派生数据：')
+    print('  flask --app run.py rebuild-sketches')
+    print('  flask --app run.py rebuild-reader-summaries')
+    print('  flask --app run.py compute-cohorts --full')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
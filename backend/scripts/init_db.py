@@ -15,7 +15,6 @@ load_dotenv(os.path.join(backend_dir, '.env'))
 from app import create_app, db
 from app.models import User, Book, Borrow
 from config import config
-import bcrypt
 
 
 def get_config():
@@ -43,15 +42,15 @@ def create_admin_user():
             print('管理员用户已存在')
             return
         
-        # 创建管理员用户
-        password_hash = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt())
+        # 创建管理员用户（按配置的 bcrypt 成本哈希）
         admin = User(
             username='admin',
-            password_hash=password_hash.decode('utf-8'),
+            password_hash='',
             email='admin@library.com',
             role='admin',
             is_active=True
         )
+        admin.set_password('admin123')
         db.session.add(admin)
         db.session.commit()
         print('管理员用户创建成功！')
@@ -0,0 +1,544 @@
+"""
+压测脚本
+
+对本机启动的服务模拟借阅业务负载，按接口统计吞吐量与 p50/p95/p99 延迟，输出 JSON 便于在提交之间对比。
+只依赖标准库：每个虚拟用户持有一个 HTTP/1.1 长连接，由 asyncio 调度。
+
+场景（--mix 按权重分配虚拟用户，如 checkout=4,browse=4,returns=1,dashboard=1）：
+- checkout：开学借书高峰，读者搜索、查看详情后借书（热门图书按 Zipf 分布集中），借满几本后归还最早的一本
+- browse：匿名浏览目录，翻页、关键词搜索、查看详情
+- returns：还书箱处理，管理员列出借阅中的记录并逐条归还
+- dashboard：管理员查看借阅、读者、去重读者与留存统计
+
+用法：
+    # 服务端关闭限流（压测账户的注册与登录会触发限流规则）
+    RATELIMIT_ENABLED=false gunicorn -c gunicorn.conf.py wsgi:app
+    python scripts/loadtest.py --users 50 --duration 60 --output before.json
+    python scripts/loadtest.py --users 50 --duration 60 --output after.json --baseline before.json
+
+读者账户（lt_reader_<i>）不存在时自动注册；管理员账户默认使用 init_db.py 创建的 admin/admin123。
+"""
+import argparse
+import asyncio
+import bisect
+import gzip
+import itertools
+import json
+import random
+import subprocess
+import sys
+import time
+import unicodedata
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+DEFAULT_MIX = 'checkout=4,browse=4,returns=1,dashboard=1'
+READER_PASSWORD = 'loadtest123'
+
+
+class HTTPError(Exception):
+    """连接失败、超时或响应无法解析"""
+
+
+class HTTPClient:
+    """单个 HTTP/1.1 长连接（只支持 http://）"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body=None, headers: dict = None) -> tuple:
+        """发送请求，返回 (状态码, 响应体字节)；失败时关闭连接并抛出 HTTPError"""
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            self.close()
+            raise HTTPError(f'{type(e).__name__}: {e}') from e
+
+    async def _request(self, method: str, path: str, body, headers: dict) -> tuple:
+        if self._writer is None:
+            await self._connect()
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 'Accept: application/json', 'Accept-Encoding: gzip']
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        if payload or method in ('POST', 'PUT'):
+            lines.append(f'Content-Length: {len(payload)}')
+        lines.extend(f'{key}: {value}' for key, value in headers.items())
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await self._writer.drain()
+
+        head = await self._reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status = int(status_line.split(' ', 2)[1])
+        response_headers = {}
+        for line in header_lines:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                response_headers[key.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304):
+            data = b''
+        elif 'content-length' in response_headers:
+            data = await self._reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = await self._read_chunked()
+        else:
+            # 既无长度也不分块时以关闭连接表示结束
+            data = await self._reader.read()
+            response_headers['connection'] = 'close'
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        if response_headers.get('content-encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return status, data
+
+    async def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if size == 0:
+                # 跳过可能存在的尾部字段
+                while await self._reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """最近秩法百分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Stats:
+    """按接口名汇总的延迟与状态码"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, status, ok: bool) -> None:
+        self.statuses.setdefault(name, {})
+        key = str(status)
+        self.statuses[name][key] = self.statuses[name].get(key, 0) + 1
+        if ok:
+            self.latencies.setdefault(name, []).append(seconds)
+        else:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    @staticmethod
+    def _summary(latencies: list, requests: int, errors: int, statuses: dict, elapsed: float) -> dict:
+        values = sorted(latencies)
+        return {
+            'requests': requests,
+            'errors': errors,
+            'statuses': statuses,
+            'rps': round(requests / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'mean': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+                'p50': round(percentile(values, 50) * 1000, 2),
+                'p95': round(percentile(values, 95) * 1000, 2),
+                'p99': round(percentile(values, 99) * 1000, 2),
+                'max': round(values[-1] * 1000, 2) if values else 0.0,
+            },
+        }
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(self.statuses):
+            statuses = self.statuses[name]
+            endpoints[name] = self._summary(self.latencies.get(name, []), sum(statuses.values()),
+                                            self.errors.get(name, 0), statuses, elapsed)
+        total_statuses = {}
+        for statuses in self.statuses.values():
+            for key, count in statuses.items():
+                total_statuses[key] = total_statuses.get(key, 0) + count
+        total = self._summary(list(itertools.chain.from_iterable(self.latencies.values())),
+                              sum(total_statuses.values()), sum(self.errors.values()), total_statuses, elapsed)
+        return {'total': total, 'endpoints': endpoints}
+
+
+def parse_mix(value: str) -> dict:
+    """解析 checkout=4,browse=4 形式的场景权重"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'未知场景: {name}（可选 {", ".join(SCENARIOS)}）')
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'权重无效: {item}')
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError('至少需要一个权重大于 0 的场景')
+    return mix
+
+
+def assign_scenarios(mix: dict, users: int) -> list:
+    """按权重把虚拟用户分配到各场景（最大余数法，每个权重大于 0 的场景至少一个）"""
+    names = [name for name, weight in mix.items() if weight > 0]
+    total = sum(mix[name] for name in names)
+    quotas = {name: users * mix[name] / total for name in names}
+    counts = {name: max(1, int(quotas[name])) for name in names}
+    for name in sorted(names, key=lambda n: quotas[n] - int(quotas[n]), reverse=True):
+        if sum(counts.values()) >= users:
+            break
+        counts[name] += 1
+    return [name for name in names for _ in range(counts[name])]
+
+
+class Catalog:
+    """压测前读取的图书 ID 与搜索词，热门程度按 Zipf 分布"""
+
+    def __init__(self, book_ids: list, keywords: list, zipf_s: float = 1.0):
+        self.book_ids = book_ids
+        self.keywords = keywords or ['a']
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** zipf_s) for rank in range(1, len(book_ids) + 1)))
+
+    def popular_book(self, rng: random.Random) -> int:
+        point = rng.random() * self.cum_weights[-1]
+        return self.book_ids[bisect.bisect_left(self.cum_weights, point)]
+
+    def keyword(self, rng: random.Random) -> str:
+        return rng.choice(self.keywords)
+
+
+async def _post_retrying(client: HTTPClient, path: str, body: dict, attempts: int = 10) -> tuple:
+    """密码哈希队列已满（503）时稍后重试，用于压测前的注册与登录"""
+    for attempt in range(attempts):
+        status, data = await client.request('POST', path, body)
+        if status != 503:
+            break
+        await asyncio.sleep(0.2 * (attempt + 1))
+    return status, data
+
+
+class VirtualUser:
+    """一个虚拟用户：一条连接、可选的登录身份，循环执行所属场景的任务"""
+
+    def __init__(self, client: HTTPClient, stats: Stats, catalog: Catalog, rng: random.Random,
+                 think: float, credentials: tuple = None):
+        self.client = client
+        self.stats = stats
+        self.catalog = catalog
+        self.rng = rng
+        self.think = think
+        self.credentials = credentials
+        self.token = None
+        self.loans = []
+
+    async def login(self) -> None:
+        username, password = self.credentials
+        status, data = await _post_retrying(self.client, '/api/auth/login',
+                                            {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'{username} 登录失败: HTTP {status} {data[:200]!r}')
+        self.token = json.loads(data)['access_token']
+
+    async def call(self, name: str, method: str, path: str, body=None, expected=(200,)):
+        """发送请求并计入统计，expected 之外的状态码计为错误；返回 (状态码, 解析后的 JSON 或 None)"""
+        for attempt in range(2):
+            headers = {'Authorization': f'Bearer {self.token}'} if self.token else None
+            start = time.perf_counter()
+            try:
+                status, data = await self.client.request(method, path, body, headers)
+            except HTTPError as e:
+                self.stats.record(name, time.perf_counter() - start, type(e.__cause__).__name__, False)
+                return None, None
+            # access token 过期后重新登录再试一次，过期的那次不计入
+            if status == 401 and self.credentials and attempt == 0:
+                await self.login()
+                continue
+            self.stats.record(name, time.perf_counter() - start, status, status in expected)
+            try:
+                return status, json.loads(data) if data else None
+            except ValueError:
+                return status, None
+        return status, None
+
+    async def pause(self) -> None:
+        if self.think > 0:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+
+
+async def checkout(user: VirtualUser) -> None:
+    """开学借书高峰：搜索、查看详情、借书，借满 3 本后归还最早的一本"""
+    keyword = quote(user.catalog.keyword(user.rng))
+    await user.call('GET /api/books (search)', 'GET', f'/api/books?keyword={keyword}')
+    await user.pause()
+    book_id = user.catalog.popular_book(user.rng)
+    await user.call('GET /api/books/<id>', 'GET', f'/api/books/{book_id}')
+    await user.pause()
+    # 热门图书被借空（409）是正常的业务结果
+    status, data = await user.call('POST /api/borrows', 'POST', '/api/borrows', {'book_id': book_id},
+                                   expected=(201, 409))
+    if status == 201:
+        user.loans.append(data['borrow']['id'])
+    if len(user.loans) >= 3:
+        borrow_id = user.loans.pop(0)
+        await user.call('PUT /api/borrows/<id>/return', 'PUT', f'/api/borrows/{borrow_id}/return',
+                        expected=(200, 409))
+    await user.call('GET /api/borrows', 'GET', '/api/borrows')
+    await user.pause()
+
+
+async def browse(user: VirtualUser) -> None:
+    """匿名浏览目录：翻页、搜索、查看详情"""
+    pages = max(1, len(user.catalog.book_ids) // 20)
+    await user.call('GET /api/books', 'GET', f'/api/books?page={user.rng.randint(1, min(pages, 50))}&per_page=20')
+    await user.pause()
+    keyword = quote(user.catalog.keyword(user.rng))
+    await user.call('GET /api/books (search)', 'GET', f'/api/books?keyword={keyword}')
+    await user.pause()
+    for _ in range(2):
+        book_id = user.catalog.popular_book(user.rng)
+        await user.call('GET /api/books/<id>', 'GET', f'/api/books/{book_id}')
+        await user.pause()
+
+
+async def returns(user: VirtualUser) -> None:
+    """还书箱处理：管理员列出借阅中的记录并逐条归还"""
+    status, data = await user.call('GET /api/borrows (admin)', 'GET', '/api/borrows?status=borrowed&per_page=10')
+    borrows = (data or {}).get('borrows', []) if status == 200 else []
+    if not borrows:
+        await asyncio.sleep(max(user.think, 0.5))
+        return
+    for borrow in user.rng.sample(borrows, min(3, len(borrows))):
+        # 多个还书员可能处理到同一条记录，已归还（409）不算错误
+        await user.call('PUT /api/borrows/<id>/return', 'PUT', f'/api/borrows/{borrow["id"]}/return',
+                        expected=(200, 409))
+        await user.pause()
+
+
+async def dashboard(user: VirtualUser) -> None:
+    """管理员统计看板"""
+    await user.call('GET /api/statistics/borrows', 'GET', '/api/statistics/borrows?period=month')
+    await user.call('GET /api/statistics/users', 'GET', '/api/statistics/users')
+    await user.call('GET /api/statistics/users/distinct', 'GET', '/api/statistics/users/distinct')
+    await user.call('GET /api/statistics/cohorts', 'GET', '/api/statistics/cohorts')
+    await user.pause()
+
+
+SCENARIOS = {
+    'checkout': checkout,
+    'browse': browse,
+    'returns': returns,
+    'dashboard': dashboard,
+}
+
+
+async def _ensure_reader(client: HTTPClient, index: int) -> tuple:
+    username = f'lt_reader_{index}'
+    status, _ = await _post_retrying(client, '/api/auth/login', {'username': username, 'password': READER_PASSWORD})
+    if status == 401:
+        status, data = await _post_retrying(client, '/api/auth/register', {
+            'username': username, 'password': READER_PASSWORD, 'email': f'{username}@loadtest.example.com'
+        })
+        if status not in (201, 409):
+            raise RuntimeError(f'注册 {username} 失败: HTTP {status} {data[:200]!r}（服务端是否关闭了限流？）')
+    return username, READER_PASSWORD
+
+
+async def load_catalog(client: HTTPClient, max_books: int) -> Catalog:
+    """读取图书 ID（按列表默认顺序，越靠前越热门）并从作者与书名中取搜索词"""
+    book_ids, keywords = [], set()
+    page = 1
+    while len(book_ids) < max_books:
+        status, data = await client.request('GET', f'/api/books?page={page}&per_page=100')
+        if status != 200:
+            raise RuntimeError(f'读取图书列表失败: HTTP {status}（服务端是否关闭了限流？）')
+        result = json.loads(data)
+        for book in result['books']:
+            book_ids.append(book['id'])
+            keywords.add(book['author'])
+            keywords.add(book['title'][:2])
+        if not result['pagination']['has_next']:
+            break
+        page += 1
+    if not book_ids:
+        raise RuntimeError('服务端没有图书数据，请先导入数据（如 scripts/init_db.py sample）')
+    return Catalog(book_ids[:max_books], sorted(keywords))
+
+
+async def _run_user(user: VirtualUser, scenario, start_delay: float, deadline: float) -> None:
+    await asyncio.sleep(start_delay)
+    try:
+        while time.monotonic() < deadline:
+            await scenario(user)
+    finally:
+        user.client.close()
+
+
+async def run(args) -> dict:
+    host, port = args.host_port
+    setup_client = HTTPClient(host, port, args.timeout)
+    catalog = await load_catalog(setup_client, args.max_books)
+
+    scenarios = assign_scenarios(args.mix, args.users)
+    readers = sum(1 for name in scenarios if name == 'checkout')
+    reader_credentials = []
+    # 注册与登录涉及 bcrypt，分批进行以免压垮服务端
+    for batch_start in range(0, readers, 8):
+        clients = [HTTPClient(host, port, args.timeout) for _ in range(min(8, readers - batch_start))]
+        reader_credentials += await asyncio.gather(*(
+            _ensure_reader(client, batch_start + i) for i, client in enumerate(clients)
+        ))
+        for client in clients:
+            client.close()
+    setup_client.close()
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    users = []
+    credential_iter = iter(reader_credentials)
+    for name in scenarios:
+        if name == 'checkout':
+            credentials = next(credential_iter)
+        elif name in ('returns', 'dashboard'):
+            credentials = (args.admin_user, args.admin_password)
+        else:
+            credentials = None
+        user = VirtualUser(HTTPClient(host, port, args.timeout), stats, catalog,
+                           random.Random(rng.random()), args.think, credentials)
+        users.append((user, SCENARIOS[name]))
+    # 登录不计入统计，分批进行
+    for batch_start in range(0, len(users), 8):
+        await asyncio.gather(*(user.login() for user, _ in users[batch_start:batch_start + 8] if user.credentials))
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    started_at = datetime.now(timezone.utc)
+    await asyncio.gather(*(
+        _run_user(user, scenario, args.ramp * i / len(users), deadline)
+        for i, (user, scenario) in enumerate(users)
+    ))
+    elapsed = time.monotonic() - started
+
+    report = stats.report(elapsed)
+    report['meta'] = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'url': args.url,
+        'users': len(users),
+        'scenarios': {name: scenarios.count(name) for name in dict.fromkeys(scenarios)},
+        'duration_seconds': round(elapsed, 2),
+        'ramp_seconds': args.ramp,
+        'think_seconds': args.think,
+        'books': len(catalog.book_ids),
+        'seed': args.seed,
+        'git_commit': _git_commit(),
+    }
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _ljust(text: str, width: int) -> str:
+    """按终端显示宽度（中文占两列）左对齐"""
+    return text + ' ' * max(0, width - sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text))
+
+
+def format_table(report: dict, baseline: dict = None) -> str:
+    """按接口输出的文本表格；给出 baseline 时附带吞吐量与 p95 的变化"""
+    header = f'{_ljust("接口", 36)}{"requests":>9}{"errors":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+    if baseline:
+        header += f'{"Δreq/s":>9}{"Δp95":>9}'
+    lines = [header]
+    rows = list(report['endpoints'].items()) + [('合计', report['total'])]
+    for name, row in rows:
+        latency = row['latency_ms']
+        line = (f'{_ljust(name, 36)}{row["requests"]:>9}{row["errors"]:>7}{row["rps"]:>9.1f}'
+                f'{latency["p50"]:>9.1f}{latency["p95"]:>9.1f}{latency["p99"]:>9.1f}')
+        if baseline:
+            old = baseline['total'] if name == '合计' else baseline['endpoints'].get(name)
+            line += ''.join(f'{_change(old_value, new_value):>9}' for old_value, new_value in (
+                (old and old['rps'], row['rps']),
+                (old and old['latency_ms']['p95'], latency['p95']),
+            ))
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def _change(old, new) -> str:
+    if not old:
+        return '-'
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='借阅业务压测')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='服务地址（默认 http://127.0.0.1:5000）')
+    parser.add_argument('--users', type=int, default=20, help='虚拟用户数（默认20）')
+    parser.add_argument('--duration', type=float, default=30, help='持续秒数（默认30）')
+    parser.add_argument('--ramp', type=float, default=0, help='虚拟用户在该秒数内逐个启动（默认0）')
+    parser.add_argument('--think', type=float, default=0,
+                        help='两次操作之间的平均思考时间（秒，默认0，即尽可能快地发请求）')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'场景权重（默认 {DEFAULT_MIX}）')
+    parser.add_argument('--max-books', type=int, default=2000, help='参与压测的图书数（默认2000）')
+    parser.add_argument('--admin-user', default='admin', help='管理员用户名（还书与统计场景）')
+    parser.add_argument('--admin-password', default='admin123', help='管理员密码')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时秒数（默认30）')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子（默认1）')
+    parser.add_argument('--output', help='JSON 结果写入该文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='与之前的 JSON 结果对比')
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    if url.scheme != 'http' or not url.hostname:
+        parser.error('--url 只支持 http://主机:端口')
+    args.host_port = (url.hostname, url.port or 80)
+    if args.users < 1:
+        parser.error('--users 至少为 1')
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        report = asyncio.run(run(args))
+    except (RuntimeError, HTTPError, OSError) as e:
+        print(f'压测失败: {e}', file=sys.stderr)
+        return 2
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_table(report, baseline), file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if report['total']['requests'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+-- 为已有的 borrows 表添加统计分桶列及索引
+-- 适用于在 borrow_year/borrow_quarter/borrow_month 列引入之前创建的数据库
+
+USE library_db;
+
+ALTER TABLE borrows
+    ADD COLUMN borrow_year SMALLINT NULL AFTER borrow_date,
+    ADD COLUMN borrow_quarter SMALLINT NULL AFTER borrow_year,
+    ADD COLUMN borrow_month SMALLINT NULL AFTER borrow_quarter;
+
+-- 根据借阅日期回填
+UPDATE borrows
+SET borrow_year = YEAR(borrow_date),
+    borrow_quarter = QUARTER(borrow_date),
+    borrow_month = MONTH(borrow_date);
+
+ALTER TABLE borrows
+    MODIFY COLUMN borrow_year SMALLINT NOT NULL,
+    MODIFY COLUMN borrow_quarter SMALLINT NOT NULL,
+    MODIFY COLUMN borrow_month SMALLINT NOT NULL,
+    ADD INDEX idx_borrow_year_quarter_month (borrow_year, borrow_quarter, borrow_month),
+    ADD INDEX idx_borrow_year_book (borrow_year, book_id),
+    ADD INDEX idx_borrow_year_user (borrow_year, user_id),
+    ADD INDEX idx_borrow_year_status (borrow_year, status);
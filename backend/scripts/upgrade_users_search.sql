@@ -0,0 +1,14 @@
+-- 为已有的 users 表添加学号列及用户列表索引
+-- 适用于在 student_id 列与用户搜索、游标分页引入之前创建的数据库
+
+USE library_db;
+
+-- 回填缺失的注册时间（游标分页要求 created_at 非空）
+UPDATE users SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+
+ALTER TABLE users
+    ADD COLUMN student_id VARCHAR(32) NULL UNIQUE AFTER email,
+    MODIFY COLUMN created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    ADD INDEX idx_users_role_active_created (role, is_active, created_at),
+    ADD INDEX idx_users_active_created (is_active, created_at),
+    ADD INDEX idx_users_created (created_at);
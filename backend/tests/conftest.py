@@ -2,7 +2,9 @@
 pytest 配置文件
 """
 import pytest
+from contextlib import contextmanager
 from app import create_app, db
+from app.services.sql_profiler import capture_queries
 from config import TestingConfig
 
 
@@ -29,3 +31,24 @@ def db_session(app):
     """创建数据库会话"""
     with app.app_context():
         yield db.session
+
+
+@pytest.fixture(scope='function')
+def query_budget(app):
+    """
+    断言代码块内执行的 SQL 不超过预算，且没有重复执行的同形语句（N+1）
+
+    用法：
+        with query_budget(4):
+            client.get('/api/borrows', headers=headers)
+    """
+    @contextmanager
+    def budget(max_queries: int, allow_repeated: bool = False):
+        with capture_queries() as log:
+            yield log
+        threshold = app.config['SQL_PROFILER_REPEAT_THRESHOLD']
+        assert log.count <= max_queries, \
+            f'SQL 条数 {log.count} 超出预算 {max_queries}\n{log.report(threshold)}'
+        assert allow_repeated or not log.repeated(threshold), \
+            f'存在重复执行的同形语句（可能是 N+1）\n{log.report(threshold)}'
+    return budget
@@ -0,0 +1,143 @@
+"""
+异步读路径测试
+
+异步引擎无法共享 :memory: 数据库，这里使用临时 SQLite 文件；
+同一请求分别经 Flask 测试客户端和 ASGI 应用发出，响应应完全一致。
+"""
+import asyncio
+import json
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('asgiref')
+
+from app import create_app, db
+from app.asgi import create_asgi_app
+from app.models import Book
+from app.services import async_db
+from config import TestingConfig
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/library.db'
+        SINGLEFLIGHT_ENABLED = False
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        for i in range(15):
+            db.session.add(Book(isbn=f'97871111{i:05d}', title=f'异步测试{i}', author=f'作者{i % 3}',
+                                publisher='出版社', total_stock=2, available_stock=i % 2))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def asgi_request(app, method, path, query='', headers=None, body=b''):
+    """向 ASGI 应用发送一个请求，返回 (状态码, 响应头, JSON)"""
+    asgi = create_asgi_app(app)
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'root_path': '', 'scheme': 'http',
+        'query_string': query.encode(), 'client': ('127.0.0.1', 5000),
+        'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        'http_version': '1.1', 'server': ('localhost', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        try:
+            await asgi(scope, receive, send)
+        finally:
+            await async_db.dispose_engines(app)
+
+    asyncio.run(run())
+    start = messages[0]
+    payload = b''.join(m.get('body', b'') for m in messages[1:])
+    headers = {k.decode(): v.decode() for k, v in start['headers']}
+    return start['status'], headers, json.loads(payload)
+
+
+def _login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username, 'password': 'password123', 'email': f'{username}@example.com'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': username, 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestAsyncReadPath:
+    """异步读路径与同步接口一致性测试"""
+
+    @pytest.mark.parametrize('path,query', [
+        ('/api/books', ''),
+        ('/api/books', 'page=2&per_page=4'),
+        ('/api/books', 'keyword=作者1&per_page=20'),
+        ('/api/books', 'page=0&per_page=-1'),
+        ('/api/books/3', ''),
+        ('/api/books/999', ''),
+    ])
+    def test_books_match_sync(self, file_app, path, query):
+        """测试图书列表与详情的响应与同步接口一致"""
+        expected = file_app.test_client().get(f'{path}?{query}')
+        status, headers, data = asgi_request(file_app, 'GET', path, query)
+        assert status == expected.status_code
+        assert data == expected.get_json()
+        assert headers['access-control-allow-origin'] == '*'
+
+    def test_borrows_require_login(self, file_app):
+        """测试借阅记录列表需要登录，登录后与同步接口一致"""
+        status, _, _ = asgi_request(file_app, 'GET', '/api/borrows')
+        assert status == 401
+
+        client = file_app.test_client()
+        headers = _login(client, 'asyncreader')
+        assert client.post('/api/borrows', json={'book_id': 2}, headers=headers).status_code == 201
+
+        expected = client.get('/api/borrows', headers=headers).get_json()
+        status, _, data = asgi_request(file_app, 'GET', '/api/borrows', headers=headers)
+        assert status == 200
+        assert data == expected
+        assert data['borrows'][0]['book']['id'] == 2
+
+    def test_rate_limit_applies(self, file_app):
+        """测试限流规则同样作用于异步读路径"""
+        file_app.config['RATELIMIT_ENABLED'] = True
+        file_app.config['RATELIMIT_RULES'] = {'books.get_books': ['ip:2/minute']}
+        statuses = [asgi_request(file_app, 'GET', '/api/books')[0] for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+    def test_other_requests_go_to_flask(self, file_app):
+        """测试其他请求转交 Flask 处理"""
+        body = json.dumps({
+            'username': 'asyncuser', 'password': 'password123', 'email': 'asyncuser@example.com'
+        }).encode()
+        status, _, data = asgi_request(file_app, 'POST', '/api/auth/register',
+                                       headers={'Content-Type': 'application/json',
+                                                'Content-Length': str(len(body))}, body=body)
+        assert status == 201
+        assert data['user']['username'] == 'asyncuser'
+
+
+class TestAsyncUrl:
+    """异步连接串转换测试"""
+
+    def test_driver_mapping(self):
+        """测试同步驱动替换为异步驱动"""
+        assert async_db.async_url('mysql+pymysql://u:p@db:3306/library').drivername == 'mysql+aiomysql'
+        assert async_db.async_url('sqlite:////tmp/x.db').drivername == 'sqlite+aiosqlite'
+
+    def test_unsupported_backend(self):
+        """测试不支持的数据库类型"""
+        with pytest.raises(ValueError):
+            async_db.async_url('postgresql://u:p@db/library')
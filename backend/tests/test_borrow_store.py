@@ -0,0 +1,253 @@
+"""
+借阅事件列式存储测试
+"""
+import os
+import time
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from app import create_app, db
+from app.models import User, Book, Borrow, BorrowStatus
+from app.services.borrow_store import BorrowEventStore, borrow_events
+from config import TestingConfig
+
+
+def _create_admin_token(client, app, db_session):
+    """创建管理员并登录"""
+    client.post('/api/auth/register', json={
+        'username': 'storeadmin',
+        'password': 'admin123',
+        'email': 'storeadmin@example.com'
+    })
+    admin = User.query.filter_by(username='storeadmin').first()
+    admin.role = 'admin'
+    db_session.commit()
+
+    resp = client.post('/api/auth/login', json={
+        'username': 'storeadmin',
+        'password': 'admin123'
+    })
+    return resp.get_json()['access_token']
+
+
+def _seed_borrows(db_session):
+    """创建测试借阅数据"""
+    user = User(username='storereader', email='storereader@example.com',
+                role='reader', is_active=True, password_hash='x')
+    book_a = Book(isbn='9787111111115', title='A', author='甲', publisher='人民邮电出版社',
+                  location='A区', total_stock=5, available_stock=5)
+    book_b = Book(isbn='9787111222220', title='B', author='乙', publisher='机械工业出版社',
+                  location='B区', total_stock=5, available_stock=5)
+    db_session.add_all([user, book_a, book_b])
+    db_session.commit()
+
+    borrows = [
+        (book_a, date(2024, 1, 1), None, BorrowStatus.BORROWED.value),
+        (book_a, date(2024, 1, 3), date(2024, 1, 10), BorrowStatus.RETURNED.value),
+        (book_b, date(2024, 2, 5), date(2024, 4, 1), BorrowStatus.OVERDUE.value),
+    ]
+    for book, borrow_date, return_date, status in borrows:
+        db_session.add(Borrow(
+            user_id=user.id, book_id=book.id, borrow_date=borrow_date,
+            due_date=Borrow.calculate_due_date(borrow_date),
+            return_date=return_date, status=status
+        ))
+    db_session.commit()
+    return user, book_a, book_b
+
+
+class TestBorrowEventStore:
+    """列式存储聚合测试"""
+
+    def test_load_and_group_by_month(self, app, db_session):
+        """测试加载后按月分桶"""
+        _seed_borrows(db_session)
+        store = BorrowEventStore(capacity=1)
+        store.load(db_session)
+
+        assert store.size == 3
+        rows = store.aggregate(bucket='month')
+        assert rows == [
+            {'period': '2024-01', 'count': 2},
+            {'period': '2024-02', 'count': 1},
+        ]
+
+    def test_week_bucket_starts_on_monday(self, app, db_session):
+        """测试按周分桶以星期一为周起始"""
+        _seed_borrows(db_session)
+        store = BorrowEventStore()
+        store.load(db_session)
+
+        rows = store.aggregate(bucket='week', end=date(2024, 2, 1))
+        # 2024-01-01 为星期一，01-03 同属一周
+        assert rows == [{'period': '2024-01-01', 'count': 2}]
+
+    def test_group_by_location_and_publisher(self, app, db_session):
+        """测试按图书维度分组"""
+        _seed_borrows(db_session)
+        store = BorrowEventStore()
+        store.load(db_session)
+
+        by_location = {r['key']: r['count'] for r in store.aggregate(group_by='location')}
+        assert by_location == {'A区': 2, 'B区': 1}
+
+        by_publisher = {r['key']: r['count'] for r in store.aggregate(group_by='publisher')}
+        assert by_publisher == {'人民邮电出版社': 2, '机械工业出版社': 1}
+
+    def test_append_and_mark_returned(self, app, db_session):
+        """测试增量追加与归还更新"""
+        user, book_a, _ = _seed_borrows(db_session)
+        store = BorrowEventStore()
+        store.load(db_session)
+
+        borrow = Borrow(user_id=user.id, book_id=book_a.id, borrow_date=date(2024, 3, 1),
+                        due_date=date(2024, 3, 31), status=BorrowStatus.BORROWED.value)
+        db_session.add(borrow)
+        db_session.commit()
+        store.append(borrow, book_a)
+
+        assert store.aggregate(status='borrowed') == [{'count': 2}]
+
+        borrow.return_date = date(2024, 3, 10)
+        borrow.status = BorrowStatus.RETURNED.value
+        db_session.commit()
+        store.mark_returned(borrow)
+
+        by_status = {r['key']: r['count'] for r in store.aggregate(group_by='status')}
+        assert by_status == {'borrowed': 1, 'returned': 2, 'overdue': 1}
+
+    def test_changes_during_reload_are_kept(self, app, db_session):
+        """测试全量加载扫描期间不持有数据锁，期间的增量变更在替换前重放"""
+        _seed_borrows(db_session)
+        store = BorrowEventStore()
+        store.load(db_session)
+        borrowed_id = Borrow.query.filter_by(status=BorrowStatus.BORROWED.value).first().id
+
+        def concurrent_return(conn, cursor, statement, *args):
+            # 模拟另一个请求在扫描期间还书（数据锁被持有时这里会死锁）
+            if 'FROM borrows' in statement and 'ORDER BY' in statement:
+                store.mark_returned(SimpleNamespace(
+                    id=borrowed_id, return_date=date(2024, 1, 20), status=BorrowStatus.RETURNED.value
+                ))
+
+        db.event.listen(db.engine, 'before_cursor_execute', concurrent_return)
+        try:
+            assert store.load(db_session)
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', concurrent_return)
+
+        by_status = {r['key']: r['count'] for r in store.aggregate(group_by='status')}
+        assert by_status == {'returned': 2, 'overdue': 1}
+
+    def test_one_reload_at_a_time(self, app, db_session):
+        """测试已有加载进行中时，不等待的加载直接返回"""
+        _seed_borrows(db_session)
+        store = BorrowEventStore()
+        store.load(db_session)
+        loaded_at = store.loaded_at
+
+        with store._load_lock:
+            assert store.load(db_session, wait=False) is False
+        assert store.loaded_at == loaded_at
+        assert store.load(db_session, wait=False) is True
+        assert store.loaded_at > loaded_at
+
+
+class TestEventStatisticsAPI:
+    """借阅事件统计接口测试"""
+
+    def test_events_endpoint(self, client, app, db_session):
+        """测试事件统计接口按月和位置分组"""
+        token = _create_admin_token(client, app, db_session)
+        _seed_borrows(db_session)
+
+        resp = client.get('/api/statistics/events?bucket=month&group_by=location',
+                          headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['total'] == 3
+        assert {'period': '2024-01', 'key': 'A区', 'count': 2} in data['rows']
+
+    def test_borrow_path_appends_to_loaded_store(self, client, app, db_session):
+        """测试借书接口增量写入已加载的存储"""
+        token = _create_admin_token(client, app, db_session)
+        headers = {'Authorization': f'Bearer {token}'}
+        _, book_a, _ = _seed_borrows(db_session)
+
+        store = borrow_events.get_store()
+        assert store.size == 3
+
+        resp = client.post('/api/borrows', json={'book_id': book_a.id}, headers=headers)
+        assert resp.status_code == 201
+        assert store.size == 4
+
+        resp = client.get(f'/api/statistics/events?start={date.today().isoformat()}',
+                          headers=headers)
+        assert resp.get_json()['total'] == 1
+
+    def test_invalid_bucket(self, client, app, db_session):
+        """测试无效分桶参数"""
+        token = _create_admin_token(client, app, db_session)
+        resp = client.get('/api/statistics/events?bucket=hour',
+                          headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 400
+
+
+@pytest.fixture
+def background_app(tmp_path):
+    """后台加载线程需要与请求共享数据库，使用临时 SQLite 文件"""
+    class BackgroundConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/library.db'
+        BORROW_STORE_BACKGROUND = True
+        BORROW_STORE_REFRESH_SECONDS = 0.2
+
+    app = create_app(BackgroundConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        borrow_events.stop(app)
+        db.session.remove()
+        db.drop_all()
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+class TestBackgroundLoading:
+    """后台加载与定时刷新测试"""
+
+    def test_requests_never_load(self, background_app):
+        """测试加载完成前统计接口返回 503，请求线程不执行加载"""
+        client = background_app.test_client()
+        token = _create_admin_token(client, background_app, db.session)
+        _seed_borrows(db.session)
+        # 视为本进程已启动后台线程（但尚未加载完成）
+        background_app.extensions['borrow_store_loader']['pid'] = os.getpid()
+
+        resp = client.get('/api/statistics/events', headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 503
+        assert resp.get_json()['error']['code'] == 'STORE_LOADING'
+        assert resp.headers['Retry-After'] == '5'
+        assert not background_app.extensions['borrow_store'].is_loaded
+
+    def test_background_load_and_refresh(self, background_app):
+        """测试后台线程启动时加载，之后定时刷新纳入其他进程写入的记录"""
+        client = background_app.test_client()
+        token = _create_admin_token(client, background_app, db.session)
+        user, book_a, _ = _seed_borrows(db.session)
+        store = background_app.extensions['borrow_store']
+
+        borrow_events.start(background_app)
+        assert _wait_for(lambda: store.size == 3)
+        resp = client.get('/api/statistics/events', headers={'Authorization': f'Bearer {token}'})
+        assert resp.get_json()['total'] == 3
+
+        # 直接写库，模拟其他工作进程的借书
+        db.session.add(Borrow(user_id=user.id, book_id=book_a.id, borrow_date=date(2024, 5, 1),
+                              due_date=date(2024, 5, 31), status=BorrowStatus.BORROWED.value))
+        db.session.commit()
+        assert _wait_for(lambda: store.size == 4)
@@ -0,0 +1,134 @@
+"""
+读者留存队列测试
+"""
+import pytest
+from datetime import date, datetime
+from app.models import User, Book, Borrow, BorrowStatus, CohortRetention
+from app.services.cohort import compute_cohorts, get_retention_matrix, add_months
+
+
+def _create_reader(db_session, name, created_at):
+    user = User(username=name, email=f'{name}@example.com', role='reader',
+                is_active=True, password_hash='x', created_at=created_at)
+    db_session.add(user)
+    return user
+
+
+def _borrow(db_session, user, book, borrow_date):
+    db_session.add(Borrow(
+        user_id=user.id, book_id=book.id, borrow_date=borrow_date,
+        due_date=Borrow.calculate_due_date(borrow_date),
+        status=BorrowStatus.BORROWED.value
+    ))
+
+
+def _seed(db_session):
+    """两个一月注册的读者和一个二月注册的读者"""
+    book = Book(isbn='9787111111115', title='A', author='甲',
+                total_stock=10, available_stock=10)
+    alice = _create_reader(db_session, 'alice', datetime(2024, 1, 5))
+    bob = _create_reader(db_session, 'bob', datetime(2024, 1, 20))
+    carol = _create_reader(db_session, 'carol', datetime(2024, 2, 2))
+    db_session.add(book)
+    db_session.commit()
+
+    _borrow(db_session, alice, book, date(2024, 1, 6))
+    _borrow(db_session, alice, book, date(2024, 1, 8))
+    _borrow(db_session, bob, book, date(2024, 1, 21))
+    _borrow(db_session, alice, book, date(2024, 3, 1))
+    _borrow(db_session, carol, book, date(2024, 3, 15))
+    db_session.commit()
+    return alice, bob, carol, book
+
+
+class TestCohortEngine:
+    """留存矩阵计算测试"""
+
+    def test_add_months(self):
+        """测试月份加减跨年"""
+        assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+        assert add_months(date(2024, 11, 1), 14) == date(2026, 1, 1)
+
+    def test_compute_retention_matrix(self, app, db_session):
+        """测试首次计算的留存矩阵"""
+        _seed(db_session)
+        compute_cohorts(today=date(2024, 3, 31))
+
+        matrix = {c['cohort']: c for c in get_retention_matrix(date(2024, 1, 1), date(2024, 12, 1))}
+        january = {r['offset']: r['active_users'] for r in matrix['2024-01']['retention']}
+        february = {r['offset']: r['active_users'] for r in matrix['2024-02']['retention']}
+
+        assert matrix['2024-01']['size'] == 2
+        assert january == {0: 2, 1: 0, 2: 1}
+        assert matrix['2024-02']['size'] == 1
+        assert february == {0: 0, 1: 1}
+
+    def test_incremental_recompute_picks_up_new_activity(self, app, db_session):
+        """测试增量计算只重算上次计算所在月份之后的单元格"""
+        alice, bob, _, book = _seed(db_session)
+        compute_cohorts(today=date(2024, 3, 31))
+
+        # 将上次计算时间回拨到三月，模拟次日运行
+        for cell in CohortRetention.query.all():
+            cell.computed_at = datetime(2024, 3, 31)
+        db_session.commit()
+
+        _borrow(db_session, bob, book, date(2024, 4, 2))
+        db_session.commit()
+        compute_cohorts(today=date(2024, 4, 30))
+
+        cell = CohortRetention.query.filter_by(
+            cohort_month=date(2024, 1, 1), month_offset=3
+        ).first()
+        assert cell.active_users == 1
+        # 二月之前的单元格未被重算
+        january = CohortRetention.query.filter_by(
+            cohort_month=date(2024, 1, 1), month_offset=0
+        ).first()
+        assert january.computed_at == datetime(2024, 3, 31)
+
+
+class TestCohortAPI:
+    """留存矩阵接口测试"""
+
+    def test_cohorts_endpoint_reads_precomputed_matrix(self, client, app, db_session):
+        """测试接口返回预计算结果"""
+        client.post('/api/auth/register', json={
+            'username': 'cohortadmin',
+            'password': 'admin123',
+            'email': 'cohortadmin@example.com'
+        })
+        admin = User.query.filter_by(username='cohortadmin').first()
+        admin.role = 'admin'
+        db_session.commit()
+        token = client.post('/api/auth/login', json={
+            'username': 'cohortadmin',
+            'password': 'admin123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        _seed(db_session)
+        resp = client.get('/api/statistics/cohorts?from=2024-01&to=2024-02', headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json()['cohorts'] == []
+
+        compute_cohorts(today=date(2024, 3, 31))
+        resp = client.get('/api/statistics/cohorts?from=2024-01&to=2024-02', headers=headers)
+        data = resp.get_json()
+        assert [c['cohort'] for c in data['cohorts']] == ['2024-01', '2024-02']
+        assert data['cohorts'][0]['retention'][0]['rate'] == 100.0
+
+    def test_cohorts_requires_admin(self, client, db_session):
+        """测试读者无权查看留存矩阵"""
+        client.post('/api/auth/register', json={
+            'username': 'cohortreader',
+            'password': 'reader123',
+            'email': 'cohortreader@example.com'
+        })
+        token = client.post('/api/auth/login', json={
+            'username': 'cohortreader',
+            'password': 'reader123'
+        }).get_json()['access_token']
+        resp = client.get('/api/statistics/cohorts',
+                          headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 403
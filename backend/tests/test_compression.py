@@ -0,0 +1,130 @@
+"""
+响应压缩测试
+"""
+import gzip
+import zlib
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app import db
+from app.models import Book, User
+from app.routes import statistics
+from app.services import compression
+
+
+def _add_books(count):
+    for i in range(count):
+        db.session.add(Book(isbn=f'97872222{i:05d}', title=f'压缩测试图书{i}', author=f'作者{i % 5}',
+                            publisher='出版社', total_stock=3, available_stock=3))
+    db.session.commit()
+
+
+def _admin_headers(client):
+    client.post('/api/auth/register', json={
+        'username': 'gzipadmin', 'password': 'password123', 'email': 'gzipadmin@example.com'
+    })
+    User.query.filter_by(username='gzipadmin').update({'role': 'admin'})
+    db.session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': 'gzipadmin', 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestResponseCompression:
+    """after_request 压缩测试"""
+
+    def test_large_json_gzip(self, client, db_session):
+        """测试较大的 JSON 响应按 gzip 压缩，解压后与未压缩响应一致"""
+        _add_books(30)
+        plain = client.get('/api/books?per_page=30')
+        resp = client.get('/api/books?per_page=30', headers={'Accept-Encoding': 'gzip'})
+
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in resp.headers['Vary']
+        assert int(resp.headers['Content-Length']) == len(resp.data) < len(plain.data)
+        assert gzip.decompress(resp.data) == plain.data
+        assert 'Content-Encoding' not in plain.headers
+
+    def test_brotli_preferred(self, client, db_session):
+        """测试客户端同时接受 br 与 gzip 时使用 brotli"""
+        brotli = pytest.importorskip('brotli')
+        _add_books(30)
+        plain = client.get('/api/books?per_page=30')
+        resp = client.get('/api/books?per_page=30', headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+        assert resp.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(resp.data) == plain.data
+
+    def test_small_response_not_compressed(self, client, db_session):
+        """测试小于阈值的响应不压缩"""
+        _add_books(1)
+        resp = client.get('/api/books/1', headers={'Accept-Encoding': 'gzip'})
+        assert resp.status_code == 200
+        assert 'Content-Encoding' not in resp.headers
+        assert 'Accept-Encoding' in resp.headers['Vary']
+
+    def test_blueprint_threshold(self, app, client, db_session):
+        """测试按蓝图设置的阈值"""
+        _add_books(30)
+        app.config['COMPRESSION_THRESHOLDS'] = {'books': 1 << 20}
+        resp = client.get('/api/books?per_page=30', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in resp.headers
+
+    def test_login_not_compressed(self, client, db_session):
+        """测试登录响应（含令牌）不压缩"""
+        client.post('/api/auth/register', json={
+            'username': 'gzipreader', 'password': 'password123', 'email': 'gzipreader@example.com'
+        })
+        resp = client.post('/api/auth/login', json={'username': 'gzipreader', 'password': 'password123'},
+                           headers={'Accept-Encoding': 'gzip'})
+        assert resp.status_code == 200
+        assert 'Content-Encoding' not in resp.headers
+
+    def test_streamed_export_gzip(self, client, db_session, monkeypatch):
+        """测试流式导出逐块压缩，解压后与未压缩的 CSV 一致"""
+        monkeypatch.setattr(statistics, 'EXPORT_BATCH_SIZE', 2)
+        headers = _admin_headers(client)
+        for i in range(6):
+            client.post('/api/auth/register', json={
+                'username': f'gzipuser{i}', 'password': 'password123', 'email': f'gzipuser{i}@example.com'
+            })
+
+        plain = client.get('/api/statistics/export/users', headers=headers)
+        resp = client.get('/api/statistics/export/users', headers={**headers, 'Accept-Encoding': 'gzip'})
+
+        assert resp.is_streamed
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in resp.headers
+        chunks = list(resp.response)
+        assert len(chunks) > 2
+        assert gzip.decompress(b''.join(chunks)) == plain.get_data()
+        assert plain.get_data(as_text=True).count('@example.com') == 7
+
+
+class TestChooseEncoding:
+    """Accept-Encoding 协商测试"""
+
+    @pytest.mark.parametrize('header,expected', [
+        ('', None),
+        ('identity', None),
+        ('gzip', 'gzip'),
+        ('gzip;q=0', None),
+        ('*', 'br'),
+        ('br;q=0.5, gzip', 'gzip'),
+        ('br, gzip', 'br'),
+    ])
+    def test_negotiation(self, header, expected):
+        """测试按质量值选择编码"""
+        accept = parse_accept_header(header, Accept)
+        if compression.brotli is None and expected == 'br':
+            expected = 'gzip'
+        assert compression.choose_encoding(accept) == expected
+
+    def test_gzip_stream_flushes_each_chunk(self):
+        """测试流式 gzip 每块刷新后即可解压出已发送的内容"""
+        compressor = compression._GzipCompressor(6)
+        decompressor = zlib.decompressobj(31)
+        first = compressor.compress(b'a,b\n' * 100) + compressor.flush()
+        assert decompressor.decompress(first) == b'a,b\n' * 100
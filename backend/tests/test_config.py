@@ -26,3 +26,22 @@ def test_database_connection(app):
         db.create_all()
         # 验证表已创建
         assert db.engine is not None
+
+
+def test_gunicorn_config(monkeypatch):
+    """测试 gunicorn 配置按环境变量选择工作模式"""
+    import gc
+    import os
+    import runpy
+    path = os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py')
+    monkeypatch.setenv('GUNICORN_WORKERS', '3')
+    monkeypatch.setenv('GUNICORN_THREADS', '4')
+    try:
+        settings = runpy.run_path(path)
+    finally:
+        # 配置文件在加载时关闭垃圾回收（由工作进程 post_fork 恢复）
+        gc.enable()
+    assert settings['preload_app'] is True
+    assert settings['worker_class'] == 'gthread'
+    assert settings['workers'] == 3
+    assert settings['threads'] == 4
@@ -0,0 +1,166 @@
+"""
+读写分离测试
+
+主库与只读库使用两个 SQLite 文件，只读库不做复制，
+从读到的数据即可判断请求走的是哪个库。
+"""
+import time
+import pytest
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Book, User
+from app.services import db_routing
+from config import TestingConfig
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    """
+    主库与一个只读库分别使用独立 SQLite 文件的应用
+
+    不保持应用上下文，每个请求使用独立的会话，与线上一致。
+    """
+    class RoutedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/primary.db'
+        SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{tmp_path}/replica.db']
+        REPLICA_STICKY_SECONDS = 60
+        SINGLEFLIGHT_ENABLED = False
+
+    app = create_app(RoutedConfig)
+    with app.app_context():
+        db.create_all()
+    db.metadata.create_all(app.extensions['db_replicas']['replica_0'])
+    yield app
+    with app.app_context():
+        db.drop_all()
+    for engine in app.extensions['db_replicas'].values():
+        engine.dispose()
+
+
+def _add_book(app, replica=False, **overrides):
+    values = {'id': 1, 'isbn': '9787111111111', 'title': '主库书名', 'author': '作者',
+              'publisher': '出版社', 'total_stock': 3, 'available_stock': 3}
+    values.update(overrides)
+    with app.app_context():
+        engine = app.extensions['db_replicas']['replica_0'] if replica else db.engine
+        with engine.begin() as conn:
+            conn.execute(insert(Book), [values])
+
+
+def _login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username, 'password': 'password123', 'email': f'{username}@example.com'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': username, 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestReadReplicaRouting:
+    """只读接口路由测试"""
+
+    def test_read_endpoints_use_replica(self, routed_app):
+        """测试图书查询读只读库，写入仍在主库"""
+        client = routed_app.test_client()
+        _add_book(routed_app)
+        _add_book(routed_app, replica=True, title='只读库书名')
+
+        assert client.get('/api/books/1').get_json()['book']['title'] == '只读库书名'
+        assert client.get('/api/books').get_json()['books'][0]['title'] == '只读库书名'
+        with routed_app.app_context():
+            assert db.session.get(Book, 1).title == '主库书名'
+
+    def test_statistics_use_replica(self, routed_app):
+        """测试统计接口读只读库"""
+        client = routed_app.test_client()
+        headers = _login(client, 'routeadmin')
+        with routed_app.app_context():
+            User.query.filter_by(username='routeadmin').update({'role': 'admin'})
+            db.session.commit()
+        headers = _login(client, 'routeadmin')
+
+        resp = client.get('/api/statistics/users', headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json()['user_stats']['total_users'] == 0
+
+    def test_streamed_export_uses_replica(self, routed_app):
+        """测试流式导出在发送响应期间仍读只读库"""
+        client = routed_app.test_client()
+        _login(client, 'routeadmin')
+        with routed_app.app_context():
+            User.query.filter_by(username='routeadmin').update({'role': 'admin'})
+            db.session.commit()
+        headers = _login(client, 'routeadmin')
+
+        resp = client.get('/api/statistics/export/users', headers=headers)
+        assert resp.status_code == 200
+        assert resp.is_streamed
+        # 只读库没有用户，只有表头
+        assert resp.get_data(as_text=True).strip().count('\n') == 0
+
+    def test_borrower_reads_own_writes(self, routed_app):
+        """测试借书后该客户端在粘滞期内读主库，其他客户端仍读只读库"""
+        client = routed_app.test_client()
+        _add_book(routed_app)
+        # 只读库的库存与主库不同，用来区分读到的是哪个库
+        _add_book(routed_app, replica=True, available_stock=1)
+        headers = _login(client, 'routereader')
+
+        assert client.get('/api/books/1', headers=headers).get_json()['book']['available_stock'] == 1
+        resp = client.post('/api/borrows', json={'book_id': 1}, headers=headers)
+        assert resp.status_code == 201
+
+        assert client.get('/api/books/1', headers=headers).get_json()['book']['available_stock'] == 2
+        assert client.get('/api/books/1').get_json()['book']['available_stock'] == 2
+        assert routed_app.test_client().get('/api/books/1').get_json()['book']['available_stock'] == 1
+
+        # 粘滞期结束后回到只读库
+        routed_app.config['REPLICA_STICKY_SECONDS'] = 0
+        resp = client.put(f"/api/borrows/{resp.get_json()['borrow']['id']}/return", headers=headers)
+        assert resp.status_code == 200
+        assert client.get('/api/books/1', headers=headers).get_json()['book']['available_stock'] == 1
+
+    def test_sticky_cookie_across_workers(self, routed_app):
+        """测试粘滞 Cookie 由其他工作进程（另一个应用实例）处理时同样读主库，篡改的 Cookie 无效"""
+        client = routed_app.test_client()
+        _add_book(routed_app)
+        _add_book(routed_app, replica=True, available_stock=1)
+        headers = _login(client, 'routereader')
+        assert client.post('/api/borrows', json={'book_id': 1}, headers=headers).status_code == 201
+        cookie = client.get_cookie(db_routing.PRIMARY_COOKIE)
+        assert cookie is not None and cookie.http_only
+
+        other = create_app(type('OtherWorker', (), dict(routed_app.config)))
+        try:
+            other_client = other.test_client()
+            other_client.set_cookie(db_routing.PRIMARY_COOKIE, cookie.value)
+            assert other_client.get('/api/books/1').get_json()['book']['available_stock'] == 2
+
+            forged = db_routing.URLSafeSerializer('wrong-key', salt=db_routing.PRIMARY_COOKIE).dumps(time.time() + 60)
+            other_client.set_cookie(db_routing.PRIMARY_COOKIE, forged)
+            assert other_client.get('/api/books/1').get_json()['book']['available_stock'] == 1
+        finally:
+            for engine in other.extensions['db_replicas'].values():
+                engine.dispose()
+
+    def test_invalid_token_on_public_endpoint(self, routed_app):
+        """测试公开接口携带无效令牌时按匿名请求读只读库"""
+        client = routed_app.test_client()
+        _add_book(routed_app, replica=True, title='只读库书名')
+        resp = client.get('/api/books/1', headers={'Authorization': 'Bearer invalid'})
+        assert resp.status_code == 200
+        assert resp.get_json()['book']['title'] == '只读库书名'
+
+
+class TestWithoutReplicas:
+    """未配置只读库"""
+
+    def test_no_replica_binds(self, app):
+        """测试未配置只读库时全部读主库"""
+        assert app.extensions['db_replicas'] == {}
+        assert list(db.engines) == [None]
+
+    def test_session_stays_on_primary_in_replica_view(self, client, db_session):
+        """测试只读接口在未配置只读库时正常工作"""
+        assert client.get('/api/books').status_code == 200
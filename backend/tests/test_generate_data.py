@@ -0,0 +1,107 @@
+"""
+基准测试数据生成脚本测试
+
+工作进程使用自己的连接写入，需要使用临时 SQLite 文件而不是 :memory: 数据库。
+"""
+import random
+from datetime import date
+import pytest
+from sqlalchemy import func
+
+from app import create_app, db
+from app.models import Book, Borrow, User
+from config import TestingConfig
+from scripts import generate_data
+
+TODAY = date(2026, 6, 30)
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/library.db'
+
+    app = create_app(FileConfig)
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def generated(file_app):
+    """2 个进程生成 300 本图书、120 位读者与 6000 条借阅记录"""
+    plan = generate_data.Plan(300, 120, 6000, TODAY, years=2)
+    result = generate_data.generate(file_app, plan, workers=2, batch_size=500, log=lambda message: None)
+    with file_app.app_context():
+        yield result
+
+
+class TestHelpers:
+    """ISBN 与热度置换测试"""
+
+    def test_isbn_valid_and_unique(self):
+        """测试生成的 ISBN-13 校验位有效且互不相同"""
+        isbns = [generate_data.isbn13(n) for n in (1, 2, 99999999, *range(1000, 1100))]
+        assert all(Book.validate_isbn(isbn) for isbn in isbns)
+        assert len(set(isbns)) == len(isbns)
+        assert generate_data.isbn13(1) == '978-7-0000-0001-8'
+
+    def test_popularity_permutation(self):
+        """测试热度排名与图书序号一一对应，热门图书集中"""
+        plan = generate_data.Plan(1000, 1, 1, TODAY)
+        assert sorted(plan.popularity_rank(index) for index in range(1000)) == list(range(1000))
+        rng = random.Random(1)
+        picks = [plan.popularity_rank(plan.popular_index(rng)) for _ in range(5000)]
+        assert picks.count(0) > picks.count(500) * 20
+
+
+class TestGenerate:
+    """生成与写入测试"""
+
+    def test_counts(self, generated):
+        """测试写入数量，所有读者共用一个可用的密码哈希"""
+        assert Book.query.count() == 300 and User.query.count() == 120
+        assert Borrow.query.count() == generated['borrows'] == 6000
+        assert Borrow.query.filter_by(status='borrowed').count() == generated['open_borrows'] > 0
+
+        assert db.session.query(func.count(func.distinct(User.password_hash))).scalar() == 1
+        assert User.query.first().check_password(generate_data.PASSWORD)
+        assert all(Book.validate_isbn(isbn) for (isbn,) in db.session.query(Book.isbn))
+
+    def test_stock_matches_open_loans(self, generated):
+        """测试可借库存等于总库存减去在借数"""
+        open_loans = dict(db.session.query(Borrow.book_id, func.count())
+                          .filter(Borrow.status == 'borrowed').group_by(Borrow.book_id))
+        for book in Book.query:
+            assert book.available_stock == book.total_stock - open_loans.get(book.id, 0) >= 0
+
+    def test_borrow_records(self, generated):
+        """测试分桶列、状态与日期一致，读者在借书前已注册"""
+        created = dict(db.session.query(User.id, User.created_at))
+        for borrow in Borrow.query:
+            assert (borrow.borrow_year, borrow.borrow_month) == (borrow.borrow_date.year, borrow.borrow_date.month)
+            assert borrow.borrow_quarter == (borrow.borrow_date.month - 1) // 3 + 1
+            assert created[borrow.user_id].date() <= borrow.borrow_date <= TODAY
+            if borrow.status == 'borrowed':
+                assert borrow.return_date is None
+            elif borrow.status == 'overdue':
+                assert borrow.due_date < borrow.return_date <= TODAY
+            else:
+                assert borrow.borrow_date <= borrow.return_date <= borrow.due_date
+
+    def test_seasonality_and_skew(self, generated):
+        """测试开学月份借阅多于暑假，热门图书借阅集中"""
+        by_month = dict(db.session.query(Borrow.borrow_month, func.count()).group_by(Borrow.borrow_month))
+        assert by_month[9] > by_month[8] * 3
+
+        counts = sorted((count for _, count in db.session.query(Borrow.book_id, func.count())
+                         .group_by(Borrow.book_id)), reverse=True)
+        assert counts[0] > 20 * counts[len(counts) // 2]
+
+    def test_append(self, file_app, generated):
+        """测试再次执行时主键接在已有数据之后"""
+        plan = generate_data.Plan(50, 10, 100, TODAY, seed=7)
+        generate_data.generate(file_app, plan, workers=1, log=lambda message: None)
+        assert Book.query.count() == 350 and User.query.count() == 130
+        assert plan.book_base == 301 and plan.user_base == 121
+        assert Borrow.query.filter(Borrow.book_id > 300).count() > 0
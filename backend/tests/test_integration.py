@@ -377,6 +377,7 @@ class TestStatisticsIntegration:
         resp = client.get('/api/statistics/export/borrows', headers=headers)
         assert resp.status_code == 200
         assert resp.content_type == 'text/csv; charset=utf-8'
+        assert resp.get_data(as_text=True).startswith('借阅ID')
 
     def test_export_users(self, client, app, db_session):
         """测试导出用户数据"""
@@ -387,6 +388,7 @@ class TestStatisticsIntegration:
         resp = client.get('/api/statistics/export/users', headers=headers)
         assert resp.status_code == 200
         assert resp.content_type == 'text/csv; charset=utf-8'
+        assert resp.get_data(as_text=True).startswith('用户ID')
 
 
 class TestPermissionIntegration:
@@ -0,0 +1,100 @@
+"""
+JSON 提供者测试
+"""
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.services import json_provider
+
+PAYLOAD = {
+    'title': '数据库系统概论',
+    'borrow_date': date(2024, 3, 1),
+    'created_at': datetime(2024, 3, 1, 8, 30, 15, 120000),
+    'returned_at': datetime(2024, 3, 5, 9, 0),
+    'fine': Decimal('1.50'),
+    'counts': {2: 5, 1: 3},
+    'b': None,
+    'a': [1, 2.5, True],
+}
+
+EXPECTED = ('{"a":[1,2.5,true],"b":null,"borrow_date":"2024-03-01",'
+            '"counts":{"1":3,"2":5},"created_at":"2024-03-01T08:30:15.120000",'
+            '"fine":"1.50","returned_at":"2024-03-05T09:00:00","title":"数据库系统概论"}')
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def provider_backend(request, monkeypatch):
+    """分别使用 orjson 与标准库 json"""
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    return request.param
+
+
+class TestJSONProvider:
+    """JSON 提供者测试"""
+
+    def test_registered(self, app):
+        """测试应用使用自定义 JSON 提供者"""
+        assert isinstance(app.json, json_provider.JSONProvider)
+
+    def test_response_format(self, app, provider_backend):
+        """测试两种实现输出相同：键排序、紧凑、日期为 ISO 8601、非 ASCII 不转义"""
+        with app.test_request_context():
+            response = app.json.response(PAYLOAD)
+        assert response.mimetype == 'application/json'
+        assert response.get_data(as_text=True) == EXPECTED + '\n'
+
+    def test_dumps_and_loads(self, app, provider_backend):
+        """测试 dumps/loads 往返，以及传入 json.dumps 参数时的处理"""
+        assert app.json.dumps(PAYLOAD) == EXPECTED
+        assert app.json.loads(EXPECTED.encode('utf-8'))['title'] == '数据库系统概论'
+        assert app.json.dumps({'b': 1, 'a': 2}, indent=2) == json.dumps({'a': 2, 'b': 1}, indent=2)
+
+    def test_debug_indent(self, app, provider_backend):
+        """测试调试模式下缩进输出"""
+        app.debug = True
+        with app.test_request_context():
+            body = app.json.response({'b': 1, 'a': 2}).get_data(as_text=True)
+        assert body == '{\n  "a": 2,\n  "b": 1\n}\n'
+
+    def test_unsupported_type(self, app, provider_backend):
+        """测试无法序列化的类型抛出 TypeError"""
+        with pytest.raises(TypeError):
+            app.json.dumps({'value': object()})
+
+
+class TestModelSerialization:
+    """模型 to_dict 中的日期由 JSON 提供者格式化"""
+
+    def test_borrow_dates(self, client, db_session):
+        """测试借阅记录的日期输出为 ISO 8601"""
+        client.post('/api/auth/register', json={
+            'username': 'jsonreader', 'password': 'password123', 'email': 'jsonreader@example.com'
+        })
+        token = client.post('/api/auth/login', json={
+            'username': 'jsonreader', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        from app.models import Book
+        db_session.add(Book(isbn='9787333000001', title='日期测试', author='作者', publisher='出版社',
+                            total_stock=1, available_stock=1))
+        db_session.commit()
+
+        borrow = client.post('/api/borrows', json={'book_id': 1}, headers=headers).get_json()['borrow']
+        assert borrow['borrow_date'] == date.today().isoformat()
+        assert borrow['return_date'] is None
+        datetime.fromisoformat(borrow['created_at'])
+
+        listed = client.get('/api/borrows', headers=headers).get_json()['borrows'][0]
+        assert listed['due_date'] == borrow['due_date']
+        assert listed['is_overdue'] is False
+
+    def test_invalid_request_body(self, client, db_session):
+        """测试请求体不是合法 JSON 时返回 400"""
+        resp = client.post('/api/auth/login', data='{invalid', content_type='application/json')
+        assert resp.status_code == 400
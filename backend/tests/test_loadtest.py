@@ -0,0 +1,126 @@
+"""
+压测脚本测试
+
+压测逻辑在本进程内的 Werkzeug 多线程服务器上短时间运行一次，确认各场景的请求都能成功；
+多线程访问需要使用临时 SQLite 文件而不是 :memory: 数据库。
+"""
+import json
+import random
+import threading
+import pytest
+from werkzeug.serving import make_server
+
+from app import create_app, db
+from app.models import Book, User
+from config import TestingConfig
+from scripts import loadtest
+
+
+@pytest.fixture
+def server(tmp_path):
+    """在后台线程中启动服务，返回其地址"""
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/library.db'
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+        for i in range(30):
+            db.session.add(Book(isbn=f'97877777{i:05d}', title=f'压测图书{i}', author=f'作者{i % 4}',
+                                publisher='出版社', total_stock=2, available_stock=2))
+        admin = User(username='admin', password_hash='', email='admin@library.com', role='admin')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+
+    http_server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{http_server.server_port}'
+    http_server.shutdown()
+    with app.app_context():
+        db.drop_all()
+
+
+class TestHelpers:
+    """统计与参数解析测试"""
+
+    def test_percentile(self):
+        """测试最近秩法百分位数"""
+        values = list(range(1, 101))
+        assert loadtest.percentile(values, 50) == 50
+        assert loadtest.percentile(values, 99) == 99
+        assert loadtest.percentile([7], 95) == 7
+        assert loadtest.percentile([], 50) == 0.0
+
+    def test_parse_mix(self):
+        """测试场景权重解析与错误提示"""
+        assert loadtest.parse_mix('checkout=3,browse') == {'checkout': 3.0, 'browse': 1.0}
+        with pytest.raises(Exception, match='未知场景'):
+            loadtest.parse_mix('checkout=1,flood=2')
+        with pytest.raises(Exception, match='权重大于 0'):
+            loadtest.parse_mix('checkout=0')
+
+    def test_assign_scenarios(self):
+        """测试按权重分配虚拟用户，权重大于 0 的场景至少分到一个"""
+        scenarios = loadtest.assign_scenarios({'checkout': 4, 'browse': 4, 'returns': 1, 'dashboard': 1}, 10)
+        assert [scenarios.count(name) for name in ('checkout', 'browse', 'returns', 'dashboard')] == [4, 4, 1, 1]
+        scenarios = loadtest.assign_scenarios({'checkout': 100, 'returns': 1}, 3)
+        assert scenarios.count('returns') == 1 and len(scenarios) == 3
+
+    def test_stats_report(self):
+        """测试非预期状态码计为错误且不计入延迟"""
+        stats = loadtest.Stats()
+        for ms in (10, 20, 30, 40):
+            stats.record('GET /x', ms / 1000, 200, True)
+        stats.record('GET /x', 5.0, 500, False)
+        report = stats.report(elapsed=2.0)
+        row = report['endpoints']['GET /x']
+        assert row['requests'] == 5 and row['errors'] == 1
+        assert row['statuses'] == {'200': 4, '500': 1}
+        assert row['rps'] == 2.5
+        assert row['latency_ms']['p50'] == 20.0 and row['latency_ms']['max'] == 40.0
+        assert report['total']['requests'] == 5
+
+    def test_catalog_skew(self):
+        """测试热门图书按 Zipf 分布集中在列表前部"""
+        catalog = loadtest.Catalog(list(range(1, 101)), ['作者'])
+        rng = random.Random(1)
+        picks = [catalog.popular_book(rng) for _ in range(2000)]
+        assert picks.count(1) > picks.count(50) * 10
+
+
+class TestRun:
+    """端到端运行测试"""
+
+    def test_all_scenarios(self, server, tmp_path):
+        """测试各场景短时间运行无错误，输出 JSON 报告"""
+        output = tmp_path / 'result.json'
+        code = loadtest.main(['--url', server, '--users', '4', '--duration', '1.5',
+                              '--mix', 'checkout=1,browse=1,returns=1,dashboard=1', '--output', str(output)])
+        assert code == 0
+
+        report = json.loads(output.read_text(encoding='utf-8'))
+        assert report['meta']['scenarios'] == {'checkout': 1, 'browse': 1, 'returns': 1, 'dashboard': 1}
+        assert report['total']['errors'] == 0
+        for name in ('POST /api/borrows', 'GET /api/books/<id>', 'GET /api/statistics/borrows',
+                     'GET /api/borrows (admin)'):
+            assert report['endpoints'][name]['requests'] > 0
+        assert report['total']['latency_ms']['p99'] >= report['total']['latency_ms']['p50'] > 0
+
+    def test_compare_with_baseline(self, server, tmp_path, capsys):
+        """测试与之前的结果对比"""
+        baseline = tmp_path / 'baseline.json'
+        assert loadtest.main(['--url', server, '--users', '1', '--duration', '0.5',
+                              '--mix', 'browse=1', '--output', str(baseline)]) == 0
+        capsys.readouterr()
+        assert loadtest.main(['--url', server, '--users', '1', '--duration', '0.5',
+                              '--mix', 'browse=1', '--baseline', str(baseline)]) == 0
+        captured = capsys.readouterr()
+        assert 'Δp95' in captured.err
+        assert json.loads(captured.out)['endpoints']['GET /api/books']['requests'] > 0
+
+    def test_unreachable_server(self, capsys):
+        """测试服务未启动时给出提示并返回非零"""
+        assert loadtest.main(['--url', 'http://127.0.0.1:9', '--duration', '0.1']) == 2
+        assert '压测失败' in capsys.readouterr().err
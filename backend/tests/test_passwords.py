@@ -0,0 +1,104 @@
+"""
+密码哈希进程池测试
+"""
+import pytest
+from app import db
+from app.models.user import User
+from app.services.passwords import PasswordHasher, PasswordPoolBusy, hash_cost
+
+
+class TestPasswordHasher:
+    """哈希器测试"""
+
+    def test_process_pool_hash_and_verify(self):
+        """测试在进程池中哈希与校验"""
+        hasher = PasswordHasher(rounds=4, workers=1)
+        try:
+            password_hash = hasher.hash('password123')
+            assert User.is_valid_bcrypt_hash(password_hash)
+            assert hash_cost(password_hash) == 4
+            assert hasher.verify('password123', password_hash)
+            assert not hasher.verify('wrong', password_hash)
+        finally:
+            hasher.shutdown()
+
+    def test_overflow_raises_busy(self):
+        """测试排队已满时立即拒绝"""
+        hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, retry_after=3)
+        hasher._slots.acquire()
+        try:
+            with pytest.raises(PasswordPoolBusy) as exc_info:
+                hasher.hash('password123')
+            assert exc_info.value.retry_after == 3
+        finally:
+            hasher._slots.release()
+            hasher.shutdown()
+
+    def test_needs_rehash(self):
+        """测试成本变化时需要重新哈希"""
+        old_hash = PasswordHasher(rounds=5).hash('password123')
+        assert PasswordHasher(rounds=4).needs_rehash(old_hash)
+        assert not PasswordHasher(rounds=5).needs_rehash(old_hash)
+
+
+class TestPasswordEndpoints:
+    """登录与注册接口测试"""
+
+    def test_login_rehashes_to_current_cost(self, client, app, db_session):
+        """测试登录成功后透明升级到当前哈希成本"""
+        user = User(username='rehash', email='rehash@example.com', role='reader',
+                    is_active=True, password_hash=PasswordHasher(rounds=5).hash('password123'))
+        db_session.add(user)
+        db_session.commit()
+
+        resp = client.post('/api/auth/login', json={
+            'username': 'rehash',
+            'password': 'password123'
+        })
+        assert resp.status_code == 200
+
+        db_session.refresh(user)
+        assert hash_cost(user.password_hash) == app.config['BCRYPT_ROUNDS']
+        assert user.check_password('password123')
+
+    def test_login_succeeds_when_rehash_pool_busy(self, client, app, db_session, monkeypatch):
+        """测试密码校验通过后哈希进程池繁忙时跳过升级，登录仍然成功"""
+        old_hash = PasswordHasher(rounds=5).hash('password123')
+        user = User(username='rehashbusy', email='rehashbusy@example.com', role='reader',
+                    is_active=True, password_hash=old_hash)
+        db_session.add(user)
+        db_session.commit()
+
+        def busy(password):
+            raise PasswordPoolBusy(2)
+
+        monkeypatch.setattr(app.extensions['password_hasher'], 'hash', busy)
+        resp = client.post('/api/auth/login', json={
+            'username': 'rehashbusy',
+            'password': 'password123'
+        })
+        assert resp.status_code == 200
+        assert 'access_token' in resp.get_json()
+
+        db_session.refresh(user)
+        assert user.password_hash == old_hash
+
+    def test_register_returns_503_when_pool_full(self, client, app, db_session):
+        """测试哈希队列已满时返回 503 与 Retry-After"""
+        hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, retry_after=2)
+        app.extensions['password_hasher'] = hasher
+        hasher._slots.acquire()
+        try:
+            resp = client.post('/api/auth/register', json={
+                'username': 'busyuser',
+                'password': 'password123',
+                'email': 'busy@example.com'
+            })
+        finally:
+            hasher._slots.release()
+            hasher.shutdown()
+
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == '2'
+        assert resp.get_json()['error']['code'] == 'SERVER_BUSY'
+        assert User.query.filter_by(username='busyuser').first() is None
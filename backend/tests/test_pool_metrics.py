@@ -0,0 +1,107 @@
+"""
+数据库连接池配置与指标测试
+"""
+import pytest
+from sqlalchemy import create_engine, exc
+from app.models import User
+from app.services.pool_metrics import InstrumentedQueuePool, instrument_engine, pool_status
+from config import engine_options
+
+
+class TestEngineOptions:
+    """连接池配置测试"""
+
+    def test_sqlite_gets_no_pool_options(self):
+        """测试 SQLite 不设置连接池参数"""
+        assert engine_options('sqlite:///:memory:') == {}
+
+    def test_env_overrides(self, monkeypatch):
+        """测试环境变量覆盖默认值"""
+        monkeypatch.setenv('DB_POOL_SIZE', '7')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+        options = engine_options('mysql+pymysql://u:p@localhost/db', pool_size=20)
+        assert options['pool_size'] == 7
+        assert options['max_overflow'] == 20
+        assert options['pool_recycle'] == 1800
+        assert options['pool_pre_ping'] is False
+
+
+class TestPoolMetrics:
+    """连接池指标测试"""
+
+    def _engine(self, tmp_path, **kwargs):
+        engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                               **kwargs)
+        return engine, instrument_engine(engine)
+
+    def test_counts_checkouts_and_overflow(self, tmp_path):
+        """测试取还次数、在用连接峰值与新建的溢出连接数"""
+        engine, metrics = self._engine(tmp_path, pool_size=1, max_overflow=2)
+        first = engine.connect()
+        second = engine.connect()
+        assert metrics.in_use == 2
+        second.close()
+        # 再次取出时复用已建立的溢出连接，不重复计数
+        second = engine.connect()
+        assert metrics.connects == 2
+        second.close()
+        first.close()
+
+        snapshot = pool_status(engine)
+        assert snapshot['size'] == 1
+        assert snapshot['metrics']['checkouts'] == 3
+        assert snapshot['metrics']['checkins'] == 3
+        assert snapshot['metrics']['max_in_use'] == 2
+        assert snapshot['metrics']['overflows'] == 1
+        assert snapshot['metrics']['wait']['count'] == 3
+        assert snapshot['metrics']['wait']['buckets']['+Inf'] == 3
+
+    def test_counts_timeouts(self, tmp_path):
+        """测试连接池耗尽时记录超时与等待时间"""
+        engine, metrics = self._engine(tmp_path, pool_size=1, max_overflow=0, pool_timeout=0.1)
+        held = engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        held.close()
+        assert metrics.timeouts == 1
+        assert metrics.wait_max >= 0.1
+
+    def test_metrics_survive_dispose(self, tmp_path):
+        """测试 dispose 重建连接池后继续累计"""
+        engine, metrics = self._engine(tmp_path)
+        engine.connect().close()
+        engine.dispose()
+        engine.connect().close()
+        assert metrics.checkouts == 2
+        assert metrics.wait_count == 2
+
+
+class TestMetricsEndpoint:
+    """指标接口测试"""
+
+    def test_admin_can_read_pool_metrics(self, client, app, db_session):
+        """测试管理员读取连接池指标"""
+        client.post('/api/auth/register', json={
+            'username': 'metricsadmin',
+            'password': 'admin123',
+            'email': 'metricsadmin@example.com'
+        })
+        token = client.post('/api/auth/login', json={
+            'username': 'metricsadmin',
+            'password': 'admin123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/metrics/db', headers=headers).status_code == 403
+
+        admin = User.query.filter_by(username='metricsadmin').first()
+        admin.role = 'admin'
+        db_session.commit()
+        token = client.post('/api/auth/login', json={
+            'username': 'metricsadmin',
+            'password': 'admin123'
+        }).get_json()['access_token']
+
+        resp = client.get('/api/metrics/db', headers={'Authorization': f'Bearer {token}'})
+        assert resp.status_code == 200
+        default = resp.get_json()['engines']['default']
+        assert default['metrics']['checkouts'] > 0
@@ -0,0 +1,117 @@
+"""
+令牌桶限流测试
+"""
+import time
+import pytest
+from app.services.rate_limit import MemoryBackend, SQLiteBackend, parse_rule
+
+
+class TestTokenBucket:
+    """令牌桶存储测试"""
+
+    def test_parse_rule(self):
+        """测试规则解析"""
+        assert parse_rule('ip:30/minute') == ('ip', 30, 0.5)
+
+    @pytest.mark.parametrize('backend_factory', [
+        lambda tmp_path: MemoryBackend(),
+        lambda tmp_path: SQLiteBackend(str(tmp_path / 'buckets.db')),
+    ])
+    def test_burst_then_reject(self, tmp_path, backend_factory):
+        """测试桶内令牌耗尽后拒绝，并返回等待时间"""
+        backend = backend_factory(tmp_path)
+        results = [backend.consume('k', 3, 1.0) for _ in range(4)]
+        assert results[:3] == [0, 0, 0]
+        assert 0 < results[3] <= 1.0
+
+    @pytest.mark.parametrize('backend_factory', [
+        lambda tmp_path: MemoryBackend(),
+        lambda tmp_path: SQLiteBackend(str(tmp_path / 'buckets.db')),
+    ])
+    def test_consume_all_is_all_or_nothing(self, tmp_path, backend_factory):
+        """测试任一桶没有令牌时不扣减其他桶"""
+        backend = backend_factory(tmp_path)
+        assert backend.consume_all([('ip', 3, 0.001), ('name', 1, 0.001)]) == 0
+        for _ in range(3):
+            assert backend.consume_all([('ip', 3, 0.001), ('name', 1, 0.001)]) > 0
+        # ip 桶只被第一次请求扣减
+        assert backend.consume('ip', 3, 0.001) == 0
+        assert backend.consume('ip', 3, 0.001) == 0
+        assert backend.consume('ip', 3, 0.001) > 0
+
+    def test_sqlite_prunes_stale_buckets(self, tmp_path):
+        """测试 SQLite 存储删除超过最长周期未更新的桶"""
+        backend = SQLiteBackend(str(tmp_path / 'buckets.db'), max_age=60)
+        backend.consume('old', 5, 1.0)
+        backend.consume('new', 5, 1.0)
+        backend._connect().execute("UPDATE rate_limit_buckets SET updated = updated - 61 WHERE key = 'old'")
+        assert backend.prune() == 1
+        keys = [key for (key,) in backend._connect().execute('SELECT key FROM rate_limit_buckets')]
+        assert keys == ['new']
+
+    def test_refill_over_time(self):
+        """测试令牌随时间补充"""
+        backend = MemoryBackend()
+        assert backend.consume('k', 1, 20.0) == 0
+        assert backend.consume('k', 1, 20.0) > 0
+        time.sleep(0.06)
+        assert backend.consume('k', 1, 20.0) == 0
+
+    def test_sqlite_backend_shared_between_instances(self, tmp_path):
+        """测试两个 SQLite 存储实例（模拟两个工作进程）共享令牌桶"""
+        path = str(tmp_path / 'buckets.db')
+        first, second = SQLiteBackend(path), SQLiteBackend(path)
+        assert first.consume('k', 2, 0.01) == 0
+        assert second.consume('k', 2, 0.01) == 0
+        assert first.consume('k', 2, 0.01) > 0
+
+
+class TestRateLimitedEndpoints:
+    """接口限流测试"""
+
+    @pytest.fixture
+    def limited_app(self, app):
+        app.config['RATELIMIT_ENABLED'] = True
+        app.config['RATELIMIT_RULES'] = {
+            'auth.login': ['ip:100/minute', 'username:2/minute'],
+            'books.get_books': ['ip:3/minute'],
+        }
+        return app
+
+    def test_login_limited_by_username(self, client, limited_app, db_session):
+        """测试同一用户名的登录尝试超限后返回 429，不再校验密码"""
+        for _ in range(2):
+            resp = client.post('/api/auth/login', json={'username': 'victim', 'password': 'guess123'})
+            assert resp.status_code == 401
+
+        resp = client.post('/api/auth/login', json={'username': 'Victim', 'password': 'guess123'})
+        assert resp.status_code == 429
+        assert resp.get_json()['error']['code'] == 'RATE_LIMITED'
+        assert int(resp.headers['Retry-After']) >= 1
+
+        # 其他用户名不受影响
+        resp = client.post('/api/auth/login', json={'username': 'other', 'password': 'guess123'})
+        assert resp.status_code == 401
+
+    def test_rejected_username_does_not_drain_ip(self, client, limited_app, db_session):
+        """测试用户名被限流的请求不扣减同一 IP 的令牌"""
+        limited_app.config['RATELIMIT_RULES'] = {'auth.login': ['ip:3/minute', 'username:1/minute']}
+        statuses = [client.post('/api/auth/login', json={'username': 'victim', 'password': 'guess123'}).status_code
+                    for _ in range(4)]
+        assert statuses == [401, 429, 429, 429]
+        for username in ('other1', 'other2'):
+            resp = client.post('/api/auth/login', json={'username': username, 'password': 'guess123'})
+            assert resp.status_code == 401
+
+    def test_search_limited_by_ip(self, client, limited_app, db_session):
+        """测试图书搜索按 IP 限流"""
+        statuses = [client.get('/api/books?keyword=python').status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+        resp = client.get('/api/books', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        assert resp.status_code == 200
+
+    def test_disabled_by_default_in_testing(self, client, app, db_session):
+        """测试测试环境默认不限流"""
+        statuses = {client.get('/api/books').status_code for _ in range(5)}
+        assert statuses == {200}
@@ -0,0 +1,149 @@
+"""
+HyperLogLog 去重读者统计测试
+"""
+import pytest
+from datetime import date
+from app import db
+from app.models import User, Book, Borrow, BorrowStatus, ReaderSketch
+from app.services import reader_sketches
+from app.services.hll import HyperLogLog
+
+
+class TestHyperLogLog:
+    """HyperLogLog 草图测试"""
+
+    def test_small_cardinality_is_exact(self):
+        """测试小基数时线性计数基本精确"""
+        sketch = HyperLogLog()
+        for i in range(50):
+            sketch.add(i)
+            sketch.add(i)
+        assert sketch.count() == 50
+
+    def test_large_cardinality_within_error_bound(self):
+        """测试大基数误差在 4 倍标准误差内"""
+        sketch = HyperLogLog()
+        for i in range(50000):
+            sketch.add(i)
+        error = abs(sketch.count() - 50000) / 50000
+        assert error < 4 * sketch.relative_error
+
+    def test_merge_equals_union(self):
+        """测试合并结果等价于并集"""
+        a, b = HyperLogLog(), HyperLogLog()
+        for i in range(0, 3000):
+            a.add(i)
+        for i in range(2000, 5000):
+            b.add(i)
+        merged = HyperLogLog().merge(a).merge(b)
+        error = abs(merged.count() - 5000) / 5000
+        assert error < 4 * merged.relative_error
+
+    def test_serialization_roundtrip(self):
+        """测试压缩序列化"""
+        sketch = HyperLogLog()
+        for i in range(10):
+            sketch.add(i)
+        data = sketch.to_bytes()
+        assert len(data) < 200
+        assert HyperLogLog.from_bytes(data).count() == sketch.count()
+
+
+def _login_admin(client, db_session):
+    client.post('/api/auth/register', json={
+        'username': 'hlladmin',
+        'password': 'admin123',
+        'email': 'hlladmin@example.com'
+    })
+    admin = User.query.filter_by(username='hlladmin').first()
+    admin.role = 'admin'
+    db_session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': 'hlladmin',
+        'password': 'admin123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestDistinctReaderAPI:
+    """去重读者统计接口测试"""
+
+    def test_borrow_path_updates_sketches(self, client, app, db_session):
+        """测试借书接口维护月度与图书草图"""
+        headers = _login_admin(client, db_session)
+        book = Book(isbn='9787111111115', title='A', author='甲',
+                    total_stock=5, available_stock=5)
+        db_session.add(book)
+        db_session.commit()
+
+        client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+        client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+
+        today = date.today()
+        assert ReaderSketch.query.count() == 2
+
+        resp = client.get(f'/api/statistics/users/distinct?book_id={book.id}', headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json()['distinct_readers'] == 1
+
+        resp = client.get('/api/statistics/users/distinct?period=quarter', headers=headers)
+        quarter = (today.month - 1) // 3 + 1
+        stats = {s['period']: s['distinct_readers'] for s in resp.get_json()['period_stats']}
+        assert stats[quarter] == 1
+        assert sum(stats.values()) == 1
+
+    def test_rebuild_merges_months_into_year(self, client, app, db_session):
+        """测试重建草图后年度结果为各月合并去重"""
+        headers = _login_admin(client, db_session)
+        book = Book(isbn='9787111111115', title='A', author='甲',
+                    total_stock=5, available_stock=5)
+        readers = [User(username=f'r{i}', email=f'r{i}@example.com', role='reader',
+                        is_active=True, password_hash='x') for i in range(3)]
+        db_session.add_all([book] + readers)
+        db_session.commit()
+        for month, reader in [(1, readers[0]), (2, readers[0]), (2, readers[1]), (7, readers[2])]:
+            db_session.add(Borrow(user_id=reader.id, book_id=book.id,
+                                  borrow_date=date(2023, month, 1), due_date=date(2023, month, 28),
+                                  status=BorrowStatus.BORROWED.value))
+        db_session.commit()
+
+        reader_sketches.rebuild_sketches()
+
+        resp = client.get('/api/statistics/users/distinct?period=year&year=2023', headers=headers)
+        stats = {s['period']: s['distinct_readers'] for s in resp.get_json()['period_stats']}
+        assert stats[2023] == 3
+
+        months = reader_sketches.distinct_readers_by_period('month', 2023)
+        assert [m['distinct_readers'] for m in months][:3] == [1, 2, 0]
+
+    def test_one_row_per_sketch(self, client, app, db_session):
+        """测试每个草图只有一行；已计入的读者再借书不加锁也不写库"""
+        book = Book(isbn='9787111111115', title='A', author='甲',
+                    total_stock=5, available_stock=5)
+        readers = [User(username=f's{i}', email=f's{i}@example.com', role='reader',
+                        is_active=True, password_hash='x') for i in range(3)]
+        db_session.add_all([book] + readers)
+        db_session.commit()
+        today = date.today()
+        for reader in readers:
+            reader_sketches.record_borrow(reader.id, book.id, today)
+        db_session.commit()
+
+        month_rows = ReaderSketch.query.filter_by(scope=reader_sketches.SCOPE_MONTH).all()
+        assert [row.key for row in month_rows] == [reader_sketches.month_key(today.year, today.month)]
+        assert ReaderSketch.query.filter_by(scope=reader_sketches.SCOPE_BOOK).count() == 1
+        assert reader_sketches.distinct_readers_for_book(book.id, today.year) == 3
+        months = reader_sketches.distinct_readers_by_period('month', today.year)
+        assert months[today.month - 1]['distinct_readers'] == 3
+
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            reader_sketches.record_borrow(readers[0].id, book.id, today)
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', capture)
+        assert not any('FOR UPDATE' in s or s.startswith(('UPDATE', 'INSERT')) for s in statements)
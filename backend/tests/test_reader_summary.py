@@ -0,0 +1,163 @@
+"""
+读者借阅汇总测试
+"""
+import pytest
+from datetime import date, timedelta
+from app import db
+from app.models import User, Book, Borrow, BorrowStatus
+from app.services import reader_summary
+from app.services.reader_summary import add_author, top_authors
+
+
+def _register_and_login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'password': 'password123',
+        'email': f'{username}@example.com'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': username,
+        'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestSpaceSaving:
+    """常读作者计数测试"""
+
+    def test_exact_below_capacity(self):
+        """测试作者数不超过容量时计数准确"""
+        counters = []
+        for author in ['甲', '乙', '甲', '丙', '甲', '乙']:
+            counters = add_author(counters, author, capacity=5)
+        assert top_authors(counters, 3) == [
+            {'author': '甲', 'count': 3}, {'author': '乙', 'count': 2}, {'author': '丙', 'count': 1}
+        ]
+
+    def test_bounded_and_keeps_heavy_hitters(self):
+        """测试计数器数量有界且保留高频作者"""
+        stream = ['热门'] * 30 + ['常见'] * 15 + [f'冷门{i}' for i in range(100)]
+        counters = []
+        for author in stream:
+            counters = add_author(counters, author, capacity=20)
+        assert len(counters) == 20
+        top = [entry['author'] for entry in top_authors(counters, 2)]
+        assert top == ['热门', '常见']
+
+
+class TestSummaryAPI:
+    """读者概况接口测试"""
+
+    def test_borrow_and_return_update_summary(self, client, app, db_session):
+        """测试借书、还书增量维护汇总"""
+        headers = _register_and_login(client, 'summaryreader')
+        user = User.query.filter_by(username='summaryreader').first()
+        books = [Book(isbn=f'978711111111{i}', title=f'B{i}', author='鲁迅' if i < 2 else '老舍',
+                      total_stock=5, available_stock=5) for i in range(3)]
+        db_session.add_all(books)
+        db_session.commit()
+
+        borrow_ids = []
+        for book in books:
+            resp = client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+            borrow_ids.append(resp.get_json()['borrow']['id'])
+        client.put(f'/api/borrows/{borrow_ids[0]}/return', headers=headers)
+
+        resp = client.get(f'/api/users/{user.id}/summary', headers=headers)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['total_borrows'] == 3
+        assert data['currently_borrowed'] == 2
+        assert data['borrowed_this_year'] == 3
+        assert data['status_counts'] == {'borrowed': 2, 'returned': 1, 'overdue': 0}
+        assert data['top_authors'][0] == {'author': '鲁迅', 'count': 2}
+        assert data['current_overdue'] == 0
+        assert data['next_due_date'] == (date.today() + timedelta(days=30)).isoformat()
+
+    def test_matches_full_rebuild(self, client, app, db_session):
+        """测试增量结果与全量重建一致，且能识别当前逾期"""
+        headers = _register_and_login(client, 'rebuildreader')
+        user = User.query.filter_by(username='rebuildreader').first()
+        book = Book(isbn='9787111111115', title='A', author='甲', total_stock=9, available_stock=9)
+        db_session.add(book)
+        db_session.commit()
+        # 已有历史借阅（汇总行尚不存在）
+        db_session.add(Borrow(user_id=user.id, book_id=book.id, borrow_date=date(2022, 3, 1),
+                              due_date=date(2022, 3, 31), return_date=date(2022, 4, 5),
+                              status=BorrowStatus.OVERDUE.value))
+        db_session.add(Borrow(user_id=user.id, book_id=book.id, borrow_date=date(2023, 3, 1),
+                              due_date=date(2023, 3, 31), return_date=date(2023, 3, 20),
+                              status=BorrowStatus.RETURNED.value))
+        db_session.commit()
+
+        client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+        incremental = client.get(f'/api/users/{user.id}/summary', headers=headers).get_json()
+        assert incremental['total_borrows'] == 3
+        assert incremental['status_counts'] == {'borrowed': 1, 'returned': 1, 'overdue': 1}
+        assert {y['year']: y['count'] for y in incremental['yearly']}[2022] == 1
+        later = date.today() + timedelta(days=31)
+        assert reader_summary.get_summary(user.id, today=later)['current_overdue'] == 1
+
+        reader_summary.rebuild_summaries()
+        assert client.get(f'/api/users/{user.id}/summary', headers=headers).get_json() == incremental
+
+    def test_summary_is_single_row_read(self, client, app, db_session):
+        """测试概况接口只按主键读取汇总行（汇总行由借书创建）"""
+        headers = _register_and_login(client, 'onereadreader')
+        user = User.query.filter_by(username='onereadreader').first()
+        book = Book(isbn='9787111111115', title='A', author='甲', total_stock=9, available_stock=9)
+        db_session.add(book)
+        db_session.commit()
+        client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            client.get(f'/api/users/{user.id}/summary', headers=headers)
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        summary_reads = [s for s in statements if 'reader_summaries' in s]
+        assert len(summary_reads) == 1
+        assert not any('FROM borrows' in s for s in statements)
+
+    def test_missing_summary_computed_without_writes(self, client, app, db_session):
+        """测试尚无汇总行时按借阅记录计算，读接口不写库"""
+        headers = _register_and_login(client, 'nosummaryreader')
+        user = User.query.filter_by(username='nosummaryreader').first()
+        book = Book(isbn='9787111111115', title='A', author='甲', total_stock=9, available_stock=9)
+        db_session.add(book)
+        db_session.commit()
+        db_session.add(Borrow(user_id=user.id, book_id=book.id, borrow_date=date(2023, 3, 1),
+                              due_date=date(2023, 3, 31), return_date=date(2023, 3, 20),
+                              status=BorrowStatus.RETURNED.value))
+        db_session.commit()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            data = client.get(f'/api/users/{user.id}/summary', headers=headers).get_json()
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        assert data['total_borrows'] == 1
+        assert data['status_counts']['returned'] == 1
+        assert data['top_authors'] == [{'author': '甲', 'count': 1}]
+        assert not any(s.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')) for s in statements)
+
+        # 写路径创建汇总行，包含历史借阅
+        client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+        assert client.get(f'/api/users/{user.id}/summary', headers=headers).get_json()['total_borrows'] == 2
+
+    def test_permissions(self, client, app, db_session):
+        """测试只能查看本人概况"""
+        headers = _register_and_login(client, 'reader_a')
+        _register_and_login(client, 'reader_b')
+        other = User.query.filter_by(username='reader_b').first()
+        assert client.get(f'/api/users/{other.id}/summary', headers=headers).status_code == 403
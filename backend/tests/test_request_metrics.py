@@ -0,0 +1,218 @@
+"""
+请求指标测试
+"""
+import gzip
+import os
+import pytest
+
+from app import db
+from app.models import Book, User
+from app.services import request_metrics
+
+
+def _samples(app):
+    return request_metrics.all_samples(app)
+
+
+def _value(samples, name, **labels):
+    for (sample_name, sample_labels), value in samples.items():
+        if sample_name == name and dict(sample_labels) == labels:
+            return value
+    return None
+
+
+def _add_books(count):
+    for i in range(count):
+        db.session.add(Book(isbn=f'97874444{i:05d}', title=f'指标测试{i}', author='作者',
+                            publisher='出版社', total_stock=1, available_stock=1))
+    db.session.commit()
+
+
+def _login(client, username, admin=False):
+    client.post('/api/auth/register', json={
+        'username': username, 'password': 'password123', 'email': f'{username}@example.com'
+    })
+    if admin:
+        User.query.filter_by(username=username).update({'role': 'admin'})
+        db.session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': username, 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestRequestMetrics:
+    """请求钩子与 SQL 事件测试"""
+
+    def test_requests_by_route_and_status(self, app, client, db_session):
+        """测试按路由模板和状态码计数，未匹配的路径合并为一个路由"""
+        _add_books(1)
+        client.get('/api/books/1')
+        client.get('/api/books/1')
+        client.get('/api/books/999')
+        client.get('/no/such/path')
+
+        samples = _samples(app)
+        route = '/api/books/<int:book_id>'
+        assert _value(samples, 'library_http_requests_total', method='GET', route=route, status='200') == 2
+        assert _value(samples, 'library_http_requests_total', method='GET', route=route, status='404') == 1
+        assert _value(samples, 'library_http_requests_total', method='GET',
+                      route=request_metrics.UNMATCHED_ROUTE, status='404') == 1
+        assert _value(samples, 'library_http_request_duration_seconds_count', method='GET', route=route) == 3
+
+    def test_db_queries_per_request(self, app, client, db_session):
+        """测试每个请求的 SQL 条数与耗时"""
+        _add_books(3)
+        client.get('/api/books')
+
+        samples = _samples(app)
+        # 计数查询与分页查询
+        assert _value(samples, 'library_http_request_db_queries_sum', route='/api/books') == 2
+        assert _value(samples, 'library_http_request_db_queries_bucket', route='/api/books', le='1.0') == 0
+        assert _value(samples, 'library_http_request_db_queries_bucket', route='/api/books', le='2.0') == 1
+        assert _value(samples, 'library_http_request_db_seconds_sum', route='/api/books') > 0
+
+    def test_response_size_after_compression(self, app, client, db_session):
+        """测试记录的是压缩后的响应大小"""
+        _add_books(30)
+        resp = client.get('/api/books?per_page=30', headers={'Accept-Encoding': 'gzip'})
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert len(gzip.decompress(resp.data)) > len(resp.data)
+
+        samples = _samples(app)
+        assert _value(samples, 'library_http_response_size_bytes_sum', route='/api/books') == len(resp.data)
+
+    def test_streamed_response_recorded_on_close(self, app, client, db_session):
+        """测试流式导出在发送完成后记录，包括发送期间执行的查询"""
+        headers = _login(client, 'metricsadmin', admin=True)
+        route = '/api/statistics/export/users'
+        resp = client.get(route, headers=headers)
+        assert _value(_samples(app), 'library_http_requests_total', method='GET', route=route, status='200') is None
+
+        resp.get_data()
+        resp.close()
+        samples = _samples(app)
+        assert _value(samples, 'library_http_requests_total', method='GET', route=route, status='200') == 1
+        assert _value(samples, 'library_http_request_db_queries_sum', route=route) >= 1
+
+    def test_rate_limited_requests_counted(self, app, client, db_session):
+        """测试被限流拒绝的请求也计入"""
+        app.config['RATELIMIT_ENABLED'] = True
+        app.config['RATELIMIT_RULES'] = {'books.get_books': ['ip:1/minute']}
+        client.get('/api/books')
+        assert client.get('/api/books').status_code == 429
+        assert _value(_samples(app), 'library_http_requests_total',
+                      method='GET', route='/api/books', status='429') == 1
+
+    def test_cache_counters(self, app, client, db_session):
+        """测试令牌解码缓存与用户状态缓存的命中计数"""
+        headers = _login(client, 'metricsreader')
+        client.post('/api/borrows', json={'book_id': 999}, headers=headers)
+        client.post('/api/borrows', json={'book_id': 999}, headers=headers)
+
+        samples = _samples(app)
+        assert _value(samples, 'library_cache_misses_total', cache='jwt_decode') == 1
+        assert _value(samples, 'library_cache_hits_total', cache='jwt_decode') == 1
+        assert _value(samples, 'library_cache_hits_total', cache='user_state') >= 1
+
+
+class TestMetricsEndpoint:
+    """GET /metrics 测试"""
+
+    def test_text_format(self, client, db_session):
+        """测试输出 Prometheus 文本格式，每个指标族只有一组 HELP/TYPE"""
+        client.get('/api/books')
+        resp = client.get('/metrics')
+        assert resp.status_code == 200
+        assert resp.content_type.startswith('text/plain; version=0.0.4')
+
+        text = resp.get_data(as_text=True)
+        assert text.count('# TYPE library_http_request_duration_seconds histogram') == 1
+        assert 'library_http_requests_total{method="GET",route="/api/books",status="200"} 1' in text
+        assert 'library_http_request_duration_seconds_bucket{method="GET",route="/api/books",le="+Inf"} 1' in text
+        assert 'library_db_pool_checkouts_total{engine="default"}' in text
+
+    def test_token_required(self, app, client, db_session):
+        """测试配置令牌后需要携带令牌"""
+        app.config['METRICS_TOKEN'] = 'scrape-secret'
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+    def test_disabled(self, app, client, db_session):
+        """测试未启用时返回 404"""
+        app.config['REQUEST_METRICS_ENABLED'] = False
+        assert client.get('/metrics').status_code == 404
+
+
+class TestMultiProcess:
+    """多进程快照汇总测试"""
+
+    def test_merge_worker_snapshots(self, app, client, db_session, tmp_path):
+        """测试汇总其他进程与已退出进程的快照"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        key = ('library_http_requests_total', (('method', 'GET'), ('route', '/api/books'), ('status', '200')))
+        in_use = ('library_db_pool_connections_in_use', (('engine', 'default'),))
+        request_metrics._write(str(tmp_path / 'worker-1001.pickle'), {key: 3, in_use: 2})
+        request_metrics._write(str(tmp_path / 'worker-1002.pickle'), {key: 4, in_use: 1})
+
+        client.get('/api/books')
+        assert _samples(app)[key] == 8
+        # 汇总前先写出当前进程的快照
+        assert os.path.exists(tmp_path / f'worker-{os.getpid()}.pickle')
+
+        request_metrics.archive_worker(str(tmp_path), 1001)
+        assert not os.path.exists(tmp_path / 'worker-1001.pickle')
+        samples = _samples(app)
+        assert samples[key] == 8
+        # 已退出进程的在用连接数不再计入
+        assert samples[in_use] == 1 + request_metrics.collect(app)[in_use]
+
+    def test_idle_worker_flushed_later(self, app, client, db_session, tmp_path):
+        """测试间隔内的增量在没有后续请求时由定时器补写"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        app.config['METRICS_FLUSH_SECONDS'] = 0.2
+        client.get('/api/books')
+        client.get('/api/books')
+        path = tmp_path / f'worker-{os.getpid()}.pickle'
+        key = ('library_http_requests_total', (('method', 'GET'), ('route', '/api/books'), ('status', '200')))
+        assert request_metrics._read(str(path))[key] == 1
+
+        timer = app.extensions['request_metrics_flush']['timer']
+        timer.join(2)
+        assert request_metrics._read(str(path))[key] == 2
+
+    def test_flush_interval(self, app, client, db_session, tmp_path):
+        """测试快照按间隔写出"""
+        app.config['METRICS_DIR'] = str(tmp_path)
+        app.config['METRICS_FLUSH_SECONDS'] = 3600
+        client.get('/api/books')
+        client.get('/api/books')
+        path = tmp_path / f'worker-{os.getpid()}.pickle'
+        key = ('library_http_requests_total', (('method', 'GET'), ('route', '/api/books'), ('status', '200')))
+        assert request_metrics._read(str(path))[key] == 1
+
+        request_metrics.flush(app, force=True)
+        assert request_metrics._read(str(path))[key] == 2
+
+
+class TestRender:
+    """文本格式化测试"""
+
+    def test_histogram_buckets_cumulative(self):
+        """测试直方图桶按上界排序并累计"""
+        metrics = request_metrics.RequestMetrics()
+        for seconds in (0.003, 0.02, 0.02, 20):
+            metrics.observe('GET', '/x', 200, seconds)
+        text = request_metrics.render(metrics.samples())
+        lines = [line for line in text.splitlines()
+                 if line.startswith('library_http_request_duration_seconds_bucket')]
+        assert lines[0].endswith('le="0.005"} 1')
+        assert lines[2].endswith('le="0.025"} 3')
+        assert lines[-1].endswith('le="+Inf"} 4')
+
+    def test_label_escaping(self):
+        """测试标签值转义"""
+        metrics = request_metrics.RequestMetrics()
+        metrics.observe('GET', '/a"b\\c', 200, 0.01)
+        assert 'route="/a\\"b\\\\c"' in request_metrics.render(metrics.samples())
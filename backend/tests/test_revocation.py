@@ -0,0 +1,141 @@
+"""
+JWT 吊销测试
+"""
+import pytest
+from datetime import datetime, timedelta
+from app.models import User, TokenRevocation
+from app.services.revocation import (BloomFilter, RevocationList, get_revocation_list, purge_expired,
+                                    revoke_token)
+
+
+def _register_and_login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'password': 'password123',
+        'email': f'{username}@example.com'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': username,
+        'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestBloomFilter:
+    """Bloom 过滤器测试"""
+
+    def test_no_false_negatives(self):
+        """测试已加入的元素一定命中"""
+        bloom = BloomFilter(1000)
+        items = [f'jti:{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate(self):
+        """测试误判率接近目标值"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'jti:{i}')
+        false_positives = sum(f'other:{i}' in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+class TestRevocationAPI:
+    """吊销接口测试"""
+
+    def test_logout_revokes_token(self, client, app, db_session):
+        """测试登出后 token 不能再使用"""
+        headers = _register_and_login(client, 'logoutuser')
+        assert client.get('/api/borrows', headers=headers).status_code == 200
+
+        assert client.post('/api/auth/logout', headers=headers).status_code == 200
+        assert client.get('/api/borrows', headers=headers).status_code == 401
+        assert TokenRevocation.query.filter_by(kind='jti').count() == 1
+
+        # 重新登录获得的新 token 不受影响
+        headers = _register_and_login(client, 'logoutuser')
+        assert client.get('/api/borrows', headers=headers).status_code == 200
+
+    def test_disabling_user_revokes_existing_tokens(self, client, app, db_session):
+        """测试禁用用户后其已签发的 token 立即失效"""
+        admin_headers = _register_and_login(client, 'revadmin')
+        admin = User.query.filter_by(username='revadmin').first()
+        admin.role = 'admin'
+        db_session.commit()
+        admin_headers = _register_and_login(client, 'revadmin')
+
+        reader_headers = _register_and_login(client, 'revreader')
+        reader = User.query.filter_by(username='revreader').first()
+        assert client.get('/api/borrows', headers=reader_headers).status_code == 200
+
+        resp = client.put(f'/api/users/{reader.id}', json={'is_active': False}, headers=admin_headers)
+        assert resp.status_code == 200
+        assert client.get('/api/borrows', headers=reader_headers).status_code == 401
+
+    def test_other_workers_pick_up_revocations(self, client, app, db_session):
+        """测试其他工作进程同步后识别吊销记录"""
+        headers = _register_and_login(client, 'syncuser')
+        client.post('/api/auth/logout', headers=headers)
+        record = TokenRevocation.query.one()
+
+        worker = RevocationList(sync_interval=60)
+        payload = {'jti': record.value, 'sub': '1', 'iat': 0}
+        worker.sync(force=True)
+        assert worker.is_revoked(payload)
+        assert not worker.is_revoked({'jti': 'other', 'sub': '1', 'iat': 0})
+
+    def test_expired_revocations_are_dropped(self, app, db_session):
+        """测试过期的吊销记录从内存和表中清除"""
+        past = datetime.utcnow() - timedelta(minutes=1)
+        db_session.add(TokenRevocation(kind='jti', value='old', revoked_at=past - timedelta(days=1),
+                                       expires_at=past))
+        db_session.commit()
+
+        worker = RevocationList()
+        worker.sync(force=True)
+        assert not worker.is_revoked({'jti': 'old', 'sub': '1', 'iat': 0})
+        assert purge_expired() == 1
+        assert TokenRevocation.query.count() == 0
+
+
+class TestSync:
+    """增量同步与提交时机测试"""
+
+    def _revoke(self, db_session, value, revoked_at):
+        db_session.add(TokenRevocation(kind='jti', value=value, revoked_at=revoked_at,
+                                       expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db_session.commit()
+
+    def test_late_commit_with_older_revoked_at(self, app, db_session):
+        """测试较晚提交、revoked_at 较早的记录在重叠窗口或全量同步中被读到"""
+        now = datetime.utcnow()
+        self._revoke(db_session, 'first', now)
+        worker = RevocationList(sync_interval=0, overlap=60, full_sync_interval=3600)
+        worker.sync()
+
+        # 其他事务在 first 之前开始、之后提交
+        self._revoke(db_session, 'in-window', now - timedelta(seconds=30))
+        self._revoke(db_session, 'long-transaction', now - timedelta(minutes=10))
+        worker.sync()
+        assert worker.is_revoked({'jti': 'in-window', 'sub': '1', 'iat': 0})
+        assert not worker.is_revoked({'jti': 'long-transaction', 'sub': '1', 'iat': 0})
+
+        worker.full_sync_interval = 0
+        worker.sync()
+        assert worker.is_revoked({'jti': 'long-transaction', 'sub': '1', 'iat': 0})
+
+    def test_applied_only_after_commit(self, app, db_session):
+        """测试吊销在调用方提交后才写入本进程内存，回滚时丢弃"""
+        revocations = get_revocation_list()
+        payload = {'jti': 'pending', 'sub': '1', 'iat': 0,
+                   'exp': int((datetime.utcnow() + timedelta(hours=1)).timestamp())}
+
+        revoke_token(payload)
+        assert 'pending' not in revocations._jtis
+        db_session.rollback()
+        assert 'pending' not in revocations._jtis
+
+        revoke_token(payload)
+        db_session.commit()
+        assert 'pending' in revocations._jtis
@@ -0,0 +1,154 @@
+"""
+请求合并（single-flight）测试
+"""
+import threading
+import time
+import pytest
+from app.models import User
+from app.routes import statistics
+from app.services.singleflight import SingleFlight
+
+
+def _run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestSingleFlight:
+    """合并器测试"""
+
+    def test_concurrent_calls_share_one_computation(self):
+        """测试并发的相同调用只计算一次"""
+        flight = SingleFlight()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'result'
+
+        results = _run_concurrently(8, lambda i: flight.do('key', compute))
+        assert results == ['result'] * 8
+        assert len(calls) == 1
+
+    def test_sequential_calls_are_not_cached(self):
+        """测试计算完成后的调用重新计算（不是结果缓存）"""
+        flight = SingleFlight()
+        counter = iter(range(10))
+        assert flight.do('key', lambda: next(counter)) == 0
+        assert flight.do('key', lambda: next(counter)) == 1
+
+    def test_errors_propagate_to_waiters(self):
+        """测试领头计算的异常传递给等待者"""
+        flight = SingleFlight()
+
+        def compute():
+            time.sleep(0.1)
+            raise ValueError('boom')
+
+        def call(i):
+            try:
+                flight.do('key', compute)
+            except ValueError as e:
+                return str(e)
+
+        assert _run_concurrently(4, call) == ['boom'] * 4
+
+    def test_cross_process_lock_dir(self, tmp_path):
+        """测试共享锁目录的两个合并器（模拟两个工作进程）只计算一次"""
+        flights = [SingleFlight(lock_dir=str(tmp_path)), SingleFlight(lock_dir=str(tmp_path))]
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return {'value': 42}
+
+        results = _run_concurrently(
+            6, lambda i: flights[i % 2].do('key', compute)
+        )
+        assert results == [{'value': 42}] * 6
+        assert len(calls) == 1
+        assert any(path.suffix == '.result' for path in tmp_path.iterdir())
+
+    def test_no_result_file_without_waiters(self, tmp_path):
+        """测试没有其他进程等待时领头进程不写结果文件"""
+        flight = SingleFlight(lock_dir=str(tmp_path))
+        assert flight.do('key', lambda: 1) == 1
+        assert [path.suffix for path in tmp_path.iterdir()] == ['.lock']
+
+    def test_cross_process_wait_timeout(self, tmp_path):
+        """测试领头进程长时间持有文件锁时，等待者在 wait_timeout 后自行计算"""
+        holder = SingleFlight(lock_dir=str(tmp_path))
+        waiter = SingleFlight(lock_dir=str(tmp_path), wait_timeout=0.2)
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(1.5)
+            return 'slow'
+
+        thread = threading.Thread(target=holder.do, args=('key', slow))
+        thread.start()
+        started.wait()
+        begin = time.time()
+        assert waiter.do('key', lambda: 'own') == 'own'
+        assert time.time() - begin < 1
+        thread.join()
+
+    def test_expired_files_pruned(self, tmp_path):
+        """测试过期的结果文件、等待文件与无人持有的锁文件被清理"""
+        flight = SingleFlight(lock_dir=str(tmp_path), result_ttl=0)
+        (tmp_path / 'old.result').write_bytes(b'')
+        (tmp_path / 'old.wait').write_bytes(b'')
+        assert flight.do('key', lambda: 1) == 1
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestCoalescedEndpoints:
+    """统计接口请求合并测试"""
+
+    def test_concurrent_statistics_requests_coalesced(self, client, app, db_session, monkeypatch):
+        """测试并发的相同统计请求只执行一次聚合"""
+        client.post('/api/auth/register', json={
+            'username': 'sfadmin',
+            'password': 'admin123',
+            'email': 'sfadmin@example.com'
+        })
+        admin = User.query.filter_by(username='sfadmin').first()
+        admin.role = 'admin'
+        db_session.commit()
+        token = client.post('/api/auth/login', json={
+            'username': 'sfadmin',
+            'password': 'admin123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        calls = []
+        original = statistics.get_total_stats
+
+        def slow_total_stats(year):
+            calls.append(year)
+            time.sleep(0.3)
+            return original(year)
+
+        monkeypatch.setattr(statistics, 'get_total_stats', slow_total_stats)
+
+        def request(i):
+            resp = app.test_client().get('/api/statistics/borrows?year=2024', headers=headers)
+            return resp.status_code, resp.get_json()['total_stats']['total_borrows']
+
+        results = _run_concurrently(5, request)
+        assert results == [(200, 0)] * 5
+        assert len(calls) == 1
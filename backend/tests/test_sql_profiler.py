@@ -0,0 +1,160 @@
+"""
+SQL 分析与查询预算测试
+"""
+import logging
+import pytest
+
+from app import db
+from app.models import Book, User
+from app.routes import statistics
+from app.services import sql_profiler
+
+
+def _add_books(count):
+    for i in range(count):
+        db.session.add(Book(isbn=f'97875555{i:05d}', title=f'分析测试{i}', author='作者',
+                            publisher='出版社', total_stock=5, available_stock=5))
+    db.session.commit()
+
+
+def _login(client, username, admin=False):
+    client.post('/api/auth/register', json={
+        'username': username, 'password': 'password123', 'email': f'{username}@example.com'
+    })
+    if admin:
+        User.query.filter_by(username=username).update({'role': 'admin'})
+        db.session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': username, 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def borrows(client, db_session):
+    """4 位读者各借 4 本书，返回管理员与第一位读者的请求头"""
+    _add_books(4)
+    admin = _login(client, 'profileadmin', admin=True)
+    readers = [_login(client, f'profilereader{i}') for i in range(4)]
+    for headers in readers:
+        for book_id in range(1, 5):
+            client.post('/api/borrows', json={'book_id': book_id}, headers=headers)
+    return admin, readers[0]
+
+
+class TestStatementShape:
+    """语句形状归一化测试"""
+
+    def test_literals_and_in_lists(self):
+        """测试字面量与 IN 列表归一化后形状相同"""
+        assert sql_profiler.statement_shape(
+            "SELECT * FROM books WHERE id IN (?, ?, ?) AND title = 'a''b'"
+        ) == sql_profiler.statement_shape(
+            "SELECT *\n  FROM books WHERE id IN (?) AND title = 'c'"
+        )
+        assert sql_profiler.statement_shape('SELECT * FROM t LIMIT 10 OFFSET 20') == \
+            'SELECT * FROM t LIMIT ? OFFSET ?'
+
+    def test_repeated(self):
+        """测试按形状统计重复语句"""
+        log = sql_profiler.QueryLog()
+        for book_id in range(4):
+            log.record(f'SELECT * FROM books WHERE id = {book_id}', 0.001)
+        log.record('SELECT * FROM users WHERE id = ?', 0.001)
+        repeated = log.repeated(3)
+        assert len(repeated) == 1
+        assert repeated[0][:2] == ('SELECT * FROM books WHERE id = ?', 4)
+        assert log.summary(3).startswith('queries=5; time_ms=5.00; repeated=1')
+
+
+class TestRequestProfiling:
+    """逐请求分析测试"""
+
+    def test_disabled_by_default(self, client, db_session):
+        """测试未开启且未携带请求头时不分析"""
+        resp = client.get('/api/books')
+        assert sql_profiler.PROFILE_HEADER not in resp.headers
+
+    def test_enabled_by_config(self, app, client, db_session):
+        """测试配置开启后所有请求返回摘要"""
+        app.config['SQL_PROFILER_ENABLED'] = True
+        resp = client.get('/api/books')
+        assert resp.headers[sql_profiler.PROFILE_HEADER].startswith('queries=2; ')
+
+    def test_header_requires_admin(self, client, borrows):
+        """测试请求头只对管理员生效"""
+        admin, reader = borrows
+        profile = {sql_profiler.PROFILE_HEADER: '1'}
+        assert sql_profiler.PROFILE_HEADER not in client.get('/api/books', headers=profile).headers
+        assert sql_profiler.PROFILE_HEADER not in client.get('/api/borrows', headers={**reader, **profile}).headers
+
+        resp = client.get('/api/borrows', headers={**admin, **profile})
+        assert resp.headers[sql_profiler.PROFILE_HEADER].endswith('repeated=0')
+
+    def test_n_plus_one_logged(self, app, client, db_session, caplog):
+        """测试重复查询时在日志中列出 N+1 候选"""
+        _add_books(4)
+        app.config['SQL_PROFILER_ENABLED'] = True
+
+        @app.route('/test/n-plus-one')
+        def n_plus_one():
+            return {'titles': [db.session.get(Book, book_id).title for book_id in range(1, 5)]}
+
+        with caplog.at_level(logging.WARNING, logger=app.logger.name):
+            resp = client.get('/test/n-plus-one')
+        assert resp.headers[sql_profiler.PROFILE_HEADER].endswith('repeated=1')
+        assert 'N+1 候选 x4' in caplog.text
+        assert 'WHERE books.id = ?' in caplog.text
+
+    def test_streamed_export_logged_on_close(self, app, client, borrows, caplog, monkeypatch):
+        """测试流式导出在发送完成后写日志"""
+        monkeypatch.setattr(statistics, 'EXPORT_BATCH_SIZE', 5)
+        admin, _ = borrows
+        app.config['SQL_PROFILER_ENABLED'] = True
+        with caplog.at_level(logging.DEBUG, logger=app.logger.name):
+            resp = client.get('/api/statistics/export/borrows', headers=admin)
+            assert sql_profiler.PROFILE_HEADER not in resp.headers
+            resp.get_data()
+            resp.close()
+        assert 'SQL 分析 GET /api/statistics/export/borrows' in caplog.text
+
+
+class TestQueryBudgets:
+    """各接口的查询预算，超出或出现 N+1 时测试失败"""
+
+    def test_budget_fixture_fails_on_n_plus_one(self, query_budget, db_session):
+        """测试预算夹具能发现重复查询"""
+        _add_books(3)
+        with pytest.raises(AssertionError, match='N\\+1'):
+            with query_budget(10):
+                for book_id in range(1, 4):
+                    db.session.get(Book, book_id)
+                    db.session.expunge_all()
+
+    def test_book_list(self, client, db_session, query_budget):
+        """图书列表：计数与分页查询"""
+        _add_books(20)
+        with query_budget(2):
+            assert client.get('/api/books?per_page=20').status_code == 200
+
+    def test_book_detail(self, client, db_session, query_budget):
+        """图书详情"""
+        _add_books(1)
+        with query_budget(1):
+            assert client.get('/api/books/1').status_code == 200
+
+    def test_borrow_list(self, client, borrows, query_budget):
+        """借阅列表：读者与图书随记录一起加载，不随条数增加"""
+        admin, reader = borrows
+        with query_budget(2):
+            assert len(client.get('/api/borrows?per_page=20', headers=admin).get_json()['borrows']) == 16
+        with query_budget(2):
+            assert len(client.get('/api/borrows', headers=reader).get_json()['borrows']) == 4
+
+    def test_borrow_export(self, client, borrows, query_budget, monkeypatch):
+        """借阅导出：每批一条查询"""
+        monkeypatch.setattr(statistics, 'EXPORT_BATCH_SIZE', 5)
+        admin, _ = borrows
+        with query_budget(1):
+            resp = client.get('/api/statistics/export/borrows', headers=admin)
+            assert resp.get_data(as_text=True).count('\n') == 17
@@ -0,0 +1,115 @@
+"""
+统计查询索引使用测试
+
+通过 SQLite 的 EXPLAIN QUERY PLAN 验证统计接口发出的每条借阅表查询
+都走索引，而不是对 borrows 全表扫描。
+"""
+import pytest
+from datetime import date
+from app import db
+from app.models import User, Book, Borrow, BorrowStatus
+
+
+def _capture_statements(app, fn):
+    """执行 fn 并收集其间发出的 SQL 语句及参数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    db.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        fn()
+    finally:
+        db.event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def _query_plan(statement, parameters) -> str:
+    conn = db.session.connection().connection
+    cursor = conn.cursor()
+    cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return ' | '.join(row[-1] for row in cursor.fetchall())
+
+
+@pytest.fixture
+def admin_headers(client, db_session):
+    client.post('/api/auth/register', json={
+        'username': 'idxadmin',
+        'password': 'admin123',
+        'email': 'idxadmin@example.com'
+    })
+    admin = User.query.filter_by(username='idxadmin').first()
+    admin.role = 'admin'
+    book = Book(isbn='9787111111115', title='A', author='甲', total_stock=5, available_stock=5)
+    db_session.add(book)
+    db_session.commit()
+    for month in (1, 4, 4, 11):
+        db_session.add(Borrow(user_id=admin.id, book_id=book.id,
+                              borrow_date=date(2024, month, 2), due_date=date(2024, month, 28),
+                              status=BorrowStatus.RETURNED.value))
+    db_session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': 'idxadmin',
+        'password': 'admin123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestBorrowBuckets:
+    """分桶列填充测试"""
+
+    def test_bucket_columns_filled_on_insert_and_update(self, app, db_session, admin_headers):
+        """测试插入与修改借阅日期时自动填充分桶列"""
+        borrow = Borrow.query.filter_by(borrow_date=date(2024, 11, 2)).first()
+        assert (borrow.borrow_year, borrow.borrow_quarter, borrow.borrow_month) == (2024, 4, 11)
+
+        borrow.borrow_date = date(2025, 2, 1)
+        db_session.commit()
+        assert (borrow.borrow_year, borrow.borrow_quarter, borrow.borrow_month) == (2025, 1, 2)
+
+    def test_quarter_statistics(self, client, admin_headers):
+        """测试季度统计使用季度列"""
+        resp = client.get('/api/statistics/borrows?period=quarter&year=2024', headers=admin_headers)
+        counts = [s['count'] for s in resp.get_json()['period_stats']]
+        assert counts == [1, 2, 0, 1]
+
+
+class TestStatisticsIndexUsage:
+    """统计接口索引使用测试"""
+
+    @pytest.mark.parametrize('url', [
+        '/api/statistics/borrows?period=month&year=2024',
+        '/api/statistics/borrows?period=quarter&year=2024',
+        '/api/statistics/borrows?period=year&year=2024',
+        '/api/statistics/users?year=2024',
+        '/api/statistics/export/borrows?year=2024',
+        '/api/statistics/export/users?year=2024',
+    ])
+    def test_borrow_queries_use_indexes(self, app, client, admin_headers, url):
+        """测试涉及 borrows 表的查询均使用索引"""
+        # 导出接口在发送响应体时才查询，需读取响应体
+        statements = _capture_statements(app, lambda: client.get(url, headers=admin_headers).get_data())
+        borrow_statements = [
+            (stmt, params) for stmt, params in statements
+            if 'FROM borrows' in stmt or 'JOIN borrows' in stmt
+        ]
+        assert borrow_statements
+
+        for stmt, params in borrow_statements:
+            plan = _query_plan(stmt, params)
+            scans = [step for step in plan.split(' | ') if 'borrows' in step]
+            assert scans, plan
+            for step in scans:
+                assert 'INDEX' in step, f'{stmt}\n{plan}'
+
+    def test_year_filter_uses_covering_index(self, app, client, admin_headers):
+        """测试按月统计为覆盖索引扫描"""
+        statements = _capture_statements(
+            app, lambda: client.get('/api/statistics/borrows?period=month&year=2024',
+                                    headers=admin_headers)
+        )
+        month_stmt = next((s, p) for s, p in statements if 'borrow_month' in s and 'GROUP BY' in s)
+        plan = _query_plan(*month_stmt)
+        assert 'COVERING INDEX idx_borrow_year_quarter_month' in plan
@@ -0,0 +1,160 @@
+"""
+refresh token 与解码缓存测试
+"""
+import time
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+from app.models import User
+from app.services import token_cache
+from app.services.token_cache import DecodeCache
+
+
+def _login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'password': 'password123',
+        'email': f'{username}@example.com'
+    })
+    return client.post('/api/auth/login', json={
+        'username': username,
+        'password': 'password123'
+    }).get_json()
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestRefreshToken:
+    """refresh token 测试"""
+
+    def test_login_returns_refresh_token(self, client, app, db_session):
+        """测试登录同时返回 access token 与 refresh token"""
+        data = _login(client, 'tokenuser')
+        assert data['access_token']
+        assert data['refresh_token']
+        assert app.config['JWT_ACCESS_TOKEN_EXPIRES'] < app.config['JWT_REFRESH_TOKEN_EXPIRES']
+
+    def test_refresh_rotates_tokens(self, client, app, db_session):
+        """测试刷新签发新令牌，旧 refresh token 不能再次使用"""
+        data = _login(client, 'rotateuser')
+
+        resp = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token']))
+        assert resp.status_code == 200
+        tokens = resp.get_json()
+        assert tokens['refresh_token'] != data['refresh_token']
+        assert client.get('/api/borrows', headers=_bearer(tokens['access_token'])).status_code == 200
+
+        resp = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token']))
+        assert resp.status_code == 401
+
+    def test_reused_refresh_token_revokes_family(self, client, app, db_session):
+        """测试已轮换掉的 refresh token 被重放时吊销整个令牌族"""
+        data = _login(client, 'reuseuser')
+        tokens = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token'])).get_json()
+        assert decode_token(tokens['refresh_token'])['fam'] == decode_token(data['refresh_token'])['fam']
+
+        # 攻击者重放旧的 refresh token
+        assert client.post('/api/auth/refresh', headers=_bearer(data['refresh_token'])).status_code == 401
+
+        assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+        assert client.get('/api/borrows', headers=_bearer(tokens['access_token'])).status_code == 401
+
+    def test_reuse_does_not_affect_other_sessions(self, client, app, db_session):
+        """测试令牌族吊销只影响被重放的那次登录"""
+        first = _login(client, 'twosessions')
+        second = client.post('/api/auth/login', json={
+            'username': 'twosessions',
+            'password': 'password123'
+        }).get_json()
+        client.post('/api/auth/refresh', headers=_bearer(first['refresh_token']))
+        client.post('/api/auth/refresh', headers=_bearer(first['refresh_token']))
+
+        resp = client.post('/api/auth/refresh', headers=_bearer(second['refresh_token']))
+        assert resp.status_code == 200
+
+    def test_access_token_cannot_refresh(self, client, app, db_session):
+        """测试 access token 不能用于刷新"""
+        data = _login(client, 'wrongtype')
+        resp = client.post('/api/auth/refresh', headers=_bearer(data['access_token']))
+        assert resp.status_code == 422
+
+    def test_refresh_picks_up_role_change(self, client, app, db_session):
+        """测试刷新后的 access token 携带最新角色"""
+        data = _login(client, 'promoted')
+        user = User.query.filter_by(username='promoted').first()
+        user.role = 'admin'
+        db_session.commit()
+
+        tokens = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token'])).get_json()
+        resp = client.get('/api/users', headers=_bearer(tokens['access_token']))
+        assert resp.status_code == 200
+
+    def test_disabled_user_cannot_refresh(self, client, app, db_session):
+        """测试禁用用户不能刷新"""
+        data = _login(client, 'disabled')
+        user = User.query.filter_by(username='disabled').first()
+        user.is_active = False
+        db_session.commit()
+
+        resp = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token']))
+        assert resp.status_code == 403
+
+    def test_logout_revokes_refresh_token(self, client, app, db_session):
+        """测试登出时一并吊销 refresh token"""
+        data = _login(client, 'logoutall')
+        resp = client.post('/api/auth/logout', json={'refresh_token': data['refresh_token']},
+                           headers=_bearer(data['access_token']))
+        assert resp.status_code == 200
+        resp = client.post('/api/auth/refresh', headers=_bearer(data['refresh_token']))
+        assert resp.status_code == 401
+
+
+class TestDecodeCache:
+    """解码缓存测试"""
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的令牌"""
+        cache = DecodeCache(max_size=2)
+        cache.put('a', {'sub': '1'})
+        cache.put('b', {'sub': '2'})
+        cache.get('a')
+        cache.put('c', {'sub': '3'})
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+
+    def test_expired_entries_not_returned(self):
+        """测试过期令牌不从缓存返回"""
+        cache = DecodeCache()
+        cache.put('old', {'sub': '1', 'exp': time.time() - 1})
+        assert cache.get('old') is None
+
+    def test_repeated_requests_decode_once(self, client, app, db_session, monkeypatch):
+        """测试同一令牌的多次请求只校验一次签名"""
+        token = _login(client, 'cacheuser')['access_token']
+        calls = []
+
+        def counting(*args, **kwargs):
+            calls.append(1)
+            return decode_token(*args, **kwargs)
+
+        monkeypatch.setattr(token_cache, 'decode_token', counting)
+        for _ in range(5):
+            assert client.get('/api/borrows', headers=_bearer(token)).status_code == 200
+        assert len(calls) == 1
+
+    def test_revocation_checked_on_cache_hit(self, client, app, db_session):
+        """测试缓存命中时仍检查吊销"""
+        token = _login(client, 'cacherevoke')['access_token']
+        assert client.get('/api/borrows', headers=_bearer(token)).status_code == 200
+        client.post('/api/auth/logout', headers=_bearer(token))
+        assert client.get('/api/borrows', headers=_bearer(token)).status_code == 401
+
+    def test_expired_token_rejected(self, app):
+        """测试缓存不会放行已过期的令牌"""
+        from datetime import timedelta
+        from jwt import ExpiredSignatureError
+
+        token = create_access_token(identity='1', expires_delta=timedelta(seconds=-1))
+        with pytest.raises(ExpiredSignatureError):
+            token_cache.cached_decode_token(token)
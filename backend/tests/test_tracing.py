@@ -0,0 +1,194 @@
+"""
+请求链路追踪测试
+"""
+import json
+import pytest
+
+from app import db
+from app.models import Book, User
+from app.routes import statistics
+from app.services import tracing
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+def _add_books(count):
+    for i in range(count):
+        db.session.add(Book(isbn=f'97876666{i:05d}', title=f'追踪测试{i}', author='作者',
+                            publisher='出版社', total_stock=3, available_stock=3))
+    db.session.commit()
+
+
+def _login(client, username, admin=False):
+    client.post('/api/auth/register', json={
+        'username': username, 'password': 'password123', 'email': f'{username}@example.com'
+    })
+    if admin:
+        User.query.filter_by(username=username).update({'role': 'admin'})
+        db.session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': username, 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _spans(app, trace_id):
+    trace = app.extensions['trace_buffer'].get(trace_id)
+    return trace['resourceSpans'][0]['scopeSpans'][0]['spans']
+
+
+def _attributes(span):
+    return {a['key']: next(iter(a['value'].values())) for a in span['attributes']}
+
+
+@pytest.fixture
+def sampled(app):
+    """对所有请求采样"""
+    app.config['TRACING_SAMPLE_RATE'] = 1.0
+    app.extensions['trace_buffer'].clear()
+    return app
+
+
+class TestTraceparent:
+    """W3C traceparent 解析测试"""
+
+    @pytest.mark.parametrize('value,expected', [
+        (f'00-{TRACE_ID}-{PARENT_ID}-01', (TRACE_ID, PARENT_ID, True)),
+        (f'00-{TRACE_ID.upper()}-{PARENT_ID}-00', (TRACE_ID, PARENT_ID, False)),
+        (f'00-{"0" * 32}-{PARENT_ID}-01', None),
+        (f'01-{TRACE_ID}-{PARENT_ID}-01', None),
+        ('garbage', None),
+        (None, None),
+    ])
+    def test_parse(self, value, expected):
+        """测试解析合法与非法的 traceparent"""
+        assert tracing.parse_traceparent(value) == expected
+
+
+class TestRequestTracing:
+    """请求追踪测试"""
+
+    def test_unsampled(self, app, client, db_session):
+        """测试未采样的请求只返回追踪 ID"""
+        resp = client.get('/api/books')
+        assert len(resp.headers[tracing.TRACE_ID_HEADER]) == 32
+        assert app.extensions['trace_buffer'].recent() == []
+
+    def test_borrow_spans(self, sampled, client, db_session):
+        """测试借书请求记录处理函数、令牌解码、逾期检查、SQL、提交与序列化的 span"""
+        _add_books(1)
+        headers = _login(client, 'tracereader')
+        resp = client.post('/api/borrows', json={'book_id': 1}, headers=headers)
+        assert resp.status_code == 201
+
+        spans = _spans(sampled, resp.headers[tracing.TRACE_ID_HEADER])
+        by_name = {}
+        for span in spans:
+            by_name.setdefault(span['name'], span)
+        root = spans[0]
+        assert root['name'] == 'POST /api/borrows'
+        assert root['kind'] == tracing.KIND_SERVER
+        assert 'parentSpanId' not in root
+        assert _attributes(root)['http.status_code'] == '201'
+        for name in ('borrows.borrow_book', 'jwt.decode', 'borrow.check_overdue', 'db.commit', 'json.serialize'):
+            assert name in by_name
+
+        # 每个 span 的父 span 都在同一追踪中，逾期检查的 COUNT 查询挂在逾期检查下
+        ids = {span['spanId'] for span in spans}
+        assert all(span['parentSpanId'] in ids for span in spans[1:])
+        check = by_name['borrow.check_overdue']
+        count_query = next(span for span in spans if span.get('parentSpanId') == check['spanId'])
+        assert count_query['kind'] == tracing.KIND_CLIENT
+        assert 'count(*)' in _attributes(count_query)['db.statement']
+        assert by_name['borrows.borrow_book']['parentSpanId'] == root['spanId']
+        assert all(int(span['endTimeUnixNano']) >= int(span['startTimeUnixNano']) for span in spans)
+
+    def test_login_bcrypt_span(self, sampled, client, db_session):
+        """测试登录记录 bcrypt 校验的 span"""
+        client.post('/api/auth/register', json={
+            'username': 'tracelogin', 'password': 'password123', 'email': 'tracelogin@example.com'
+        })
+        resp = client.post('/api/auth/login', json={'username': 'tracelogin', 'password': 'password123'})
+        verify = [span for span in _spans(sampled, resp.headers[tracing.TRACE_ID_HEADER])
+                  if span['name'] == 'bcrypt.verify']
+        assert len(verify) == 1
+        assert _attributes(verify[0])['bcrypt.rounds'] == str(sampled.config['BCRYPT_ROUNDS'])
+
+    def test_traceparent_propagation(self, app, client, db_session):
+        """测试信任上游时沿用其追踪 ID 与采样标志"""
+        app.config['TRACING_TRUST_UPSTREAM'] = True
+        resp = client.get('/api/books', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+        assert resp.headers[tracing.TRACE_ID_HEADER] == TRACE_ID
+        root = _spans(app, TRACE_ID)[0]
+        assert root['parentSpanId'] == PARENT_ID
+
+        app.config['TRACING_SAMPLE_RATE'] = 1.0
+        app.extensions['trace_buffer'].clear()
+        resp = client.get('/api/books', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-00'})
+        assert resp.headers[tracing.TRACE_ID_HEADER] == TRACE_ID
+        assert app.extensions['trace_buffer'].recent() == []
+
+    def test_untrusted_traceparent_not_force_sampled(self, app, client, db_session):
+        """测试默认不信任客户端的采样标志：沿用追踪 ID，但按本地采样率决定是否记录"""
+        assert app.config['TRACING_SAMPLE_RATE'] == 0
+        resp = client.get('/api/books', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+        assert resp.headers[tracing.TRACE_ID_HEADER] == TRACE_ID
+        assert app.extensions['trace_buffer'].recent() == []
+
+        app.config['TRACING_SAMPLE_RATE'] = 1.0
+        client.get('/api/books', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-00'})
+        assert _spans(app, TRACE_ID)[0]['parentSpanId'] == PARENT_ID
+
+    def test_streamed_export(self, sampled, client, db_session, monkeypatch):
+        """测试流式导出在发送完成后结束根 span，包含发送期间的查询"""
+        monkeypatch.setattr(statistics, 'EXPORT_BATCH_SIZE', 2)
+        headers = _login(client, 'traceadmin', admin=True)
+        sampled.extensions['trace_buffer'].clear()
+        resp = client.get('/api/statistics/export/users', headers=headers)
+        trace_id = resp.headers[tracing.TRACE_ID_HEADER]
+        assert sampled.extensions['trace_buffer'].get(trace_id) is None
+
+        resp.get_data()
+        resp.close()
+        spans = _spans(sampled, trace_id)
+        assert any(span['name'] == 'SELECT' and 'borrow_count' in _attributes(span)['db.statement']
+                   for span in spans)
+        assert all(span['status']['code'] != tracing.STATUS_ERROR for span in spans)
+
+    def test_file_exporter(self, sampled, client, db_session, tmp_path):
+        """测试追踪按行追加为 OTLP/JSON"""
+        path = tmp_path / 'traces.jsonl'
+        sampled.extensions['trace_buffer'].path = str(path)
+        client.get('/api/books')
+        client.get('/api/books')
+
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 2
+        resource = json.loads(lines[0])['resourceSpans'][0]
+        assert resource['resource']['attributes'][0]['value']['stringValue'] == 'library-backend'
+        assert resource['scopeSpans'][0]['spans'][0]['name'] == 'GET /api/books'
+
+
+class TestTraceEndpoints:
+    """追踪查看接口测试"""
+
+    def test_list_and_detail(self, sampled, client, db_session):
+        """测试管理员查看最近的追踪与单个追踪"""
+        headers = _login(client, 'traceviewer', admin=True)
+        trace_id = client.get('/api/books').headers[tracing.TRACE_ID_HEADER]
+
+        traces = client.get('/api/metrics/traces?limit=5', headers=headers).get_json()['traces']
+        assert traces[0]['trace_id'] == trace_id
+        assert traces[0]['name'] == 'GET /api/books'
+        assert traces[0]['status_code'] == 200
+
+        resp = client.get(f'/api/metrics/traces/{trace_id}', headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json()['resourceSpans'][0]['scopeSpans'][0]['spans'][0]['traceId'] == trace_id
+        assert client.get(f'/api/metrics/traces/{"f" * 32}', headers=headers).status_code == 404
+
+    def test_admin_only(self, client, db_session):
+        """测试普通用户无权查看"""
+        headers = _login(client, 'tracenonadmin')
+        assert client.get('/api/metrics/traces', headers=headers).status_code == 403
@@ -0,0 +1,131 @@
+"""
+批量更新用户测试
+"""
+import pytest
+from datetime import datetime
+from app import db
+from app.models import User, TokenRevocation
+from app.services.user_cache import get_user_state
+
+
+def _login(client, username, password='password123'):
+    return client.post('/api/auth/login', json={
+        'username': username,
+        'password': password
+    }).get_json()['access_token']
+
+
+@pytest.fixture
+def admin_headers(client, db_session):
+    client.post('/api/auth/register', json={
+        'username': 'bulkadmin',
+        'password': 'admin123',
+        'email': 'bulkadmin@example.com'
+    })
+    admin = User.query.filter_by(username='bulkadmin').first()
+    admin.role = 'admin'
+    db_session.commit()
+    return {'Authorization': f'Bearer {_login(client, "bulkadmin", "admin123")}'}
+
+
+@pytest.fixture
+def students(client, db_session):
+    for i in range(6):
+        client.post('/api/auth/register', json={
+            'username': f'grad{i}',
+            'password': 'password123',
+            'email': f'grad{i}@example.com'
+        })
+    users = User.query.filter(User.username.like('grad%')).order_by(User.id).all()
+    for i, user in enumerate(users):
+        user.student_id = f'{2020 + i // 3}{i:04d}'
+        user.created_at = datetime(2020 + i // 3, 9, 1)
+    db_session.commit()
+    return users
+
+
+class TestBulkUpdate:
+    """批量更新接口测试"""
+
+    def test_disable_by_cohort_revokes_tokens(self, client, admin_headers, students):
+        """测试按届别批量禁用并吊销令牌"""
+        token = _login(client, 'grad0')
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/borrows', headers=headers).status_code == 200
+        assert get_user_state(students[0].id).is_active
+
+        resp = client.patch('/api/users', json={'filter': {'cohort': '2020'}, 'is_active': False},
+                            headers=admin_headers)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data['matched'] == 3
+        assert data['updated'] == 3
+        assert data['revoked'] == 3
+
+        assert client.get('/api/borrows', headers=headers).status_code == 401
+        assert not get_user_state(students[0].id).is_active
+        assert User.query.filter_by(is_active=False).count() == 3
+        assert TokenRevocation.query.filter_by(kind='user').count() == 3
+
+    def test_cohort_ending_in_9(self, client, admin_headers, students, db_session):
+        """测试以 9 结尾的届别能匹配（MySQL 排序规则下区间改写会匹配不到任何行）"""
+        for user in students[:2]:
+            user.student_id = '2019' + user.student_id[4:]
+        db_session.commit()
+        resp = client.patch('/api/users', json={'filter': {'cohort': '2019'}, 'is_active': False},
+                            headers=admin_headers)
+        assert resp.get_json()['matched'] == 2
+        assert resp.get_json()['updated'] == 2
+
+    def test_unchanged_rows_are_skipped(self, client, admin_headers, students):
+        """测试值未变化的行不更新、不吊销"""
+        client.patch('/api/users', json={'ids': [students[0].id], 'is_active': False}, headers=admin_headers)
+        resp = client.patch('/api/users', json={'ids': [s.id for s in students[:2]], 'is_active': False},
+                            headers=admin_headers)
+        data = resp.get_json()
+        assert data['matched'] == 2
+        assert data['updated'] == 1
+        assert data['revoked'] == 1
+
+    def test_enable_does_not_revoke(self, client, admin_headers, students):
+        """测试批量启用不吊销令牌"""
+        client.patch('/api/users', json={'filter': {'created_to': '2021-01-01'}, 'is_active': False},
+                     headers=admin_headers)
+        resp = client.patch('/api/users', json={'filter': {'created_to': '2021-01-01'}, 'is_active': True},
+                            headers=admin_headers)
+        data = resp.get_json()
+        assert data['updated'] == 3
+        assert data['revoked'] == 0
+
+    def test_role_change_with_combined_filter(self, client, admin_headers, students):
+        """测试多条件组合筛选变更角色"""
+        resp = client.patch('/api/users', json={
+            'filter': {'role': 'reader', 'created_from': '2021-01-01', 'ids': [s.id for s in students[2:5]]},
+            'role': 'admin'
+        }, headers=admin_headers)
+        data = resp.get_json()
+        assert data['updated'] == 2
+        assert data['revoked'] == 2
+        assert {u.username for u in User.query.filter_by(role='admin')} == {'bulkadmin', 'grad3', 'grad4'}
+
+    def test_caller_is_excluded(self, client, admin_headers, students):
+        """测试不会禁用当前管理员自身"""
+        admin = User.query.filter_by(username='bulkadmin').first()
+        resp = client.patch('/api/users', json={'ids': [admin.id], 'is_active': False}, headers=admin_headers)
+        assert resp.get_json()['updated'] == 0
+        assert client.get('/api/users', headers=admin_headers).status_code == 200
+
+    @pytest.mark.parametrize('body', [
+        {'ids': [1]},
+        {'is_active': False},
+        {'filter': {}, 'is_active': False},
+        {'ids': [], 'is_active': False},
+        {'ids': ['1'], 'is_active': False},
+        {'filter': {'created_from': 'yesterday'}, 'is_active': False},
+        {'filter': {'role': 'owner'}, 'is_active': False},
+        {'ids': [1], 'is_active': 'no'},
+    ])
+    def test_invalid_requests(self, client, admin_headers, body):
+        """测试参数校验"""
+        resp = client.patch('/api/users', json=body, headers=admin_headers)
+        assert resp.status_code == 400
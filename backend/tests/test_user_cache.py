@@ -0,0 +1,124 @@
+"""
+用户状态缓存测试
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import User, Book
+from app.services.user_cache import UserStateCache, get_user_state
+
+
+def _register_and_login(client, username):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'password': 'password123',
+        'email': f'{username}@example.com'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': username,
+        'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+class _UserQueryCounter:
+    """统计用户状态查询（不含 to_dict 懒加载整行用户）的次数"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement and 'password_hash' not in statement:
+            self.count += 1
+
+
+class TestUserStateCache:
+    """缓存结构测试"""
+
+    def test_ttl_expiry(self):
+        """测试过期后重新加载"""
+        cache = UserStateCache(ttl=0.05)
+        loads = []
+
+        def loader(user_id):
+            loads.append(user_id)
+            return user_id
+
+        cache.get(1, loader)
+        cache.get(1, loader)
+        assert loads == [1]
+
+        import time
+        time.sleep(0.06)
+        cache.get(1, loader)
+        assert loads == [1, 1]
+
+    def test_lru_eviction_and_negative_entries(self):
+        """测试容量淘汰与“不存在”条目缓存"""
+        cache = UserStateCache(max_size=2)
+        loads = []
+
+        def loader(user_id):
+            loads.append(user_id)
+            return None
+
+        assert cache.get(1, loader) is None
+        assert cache.get(1, loader) is None
+        cache.get(2, loader)
+        cache.get(3, loader)
+        cache.get(1, loader)
+        assert loads == [1, 2, 3, 1]
+
+
+class TestUserCacheIntegration:
+    """接口集成测试"""
+
+    def test_borrow_reads_user_once(self, client, app, db_session):
+        """测试重复借书不再按主键查询用户"""
+        headers = _register_and_login(client, 'cachedreader')
+        books = [Book(isbn=f'978711111111{i}', title=f'B{i}', author='甲',
+                      total_stock=5, available_stock=5) for i in range(3)]
+        db_session.add_all(books)
+        db_session.commit()
+
+        counter = _UserQueryCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        try:
+            for book in books:
+                resp = client.post('/api/borrows', json={'book_id': book.id}, headers=headers)
+                assert resp.status_code == 201
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', counter)
+        assert counter.count == 1
+
+    def test_update_user_invalidates(self, client, app, db_session):
+        """测试管理员禁用用户后缓存立即失效"""
+        _register_and_login(client, 'tobedisabled')
+        user = User.query.filter_by(username='tobedisabled').first()
+        assert get_user_state(user.id).is_active
+
+        user.is_active = False
+        db_session.commit()
+        assert not get_user_state(user.id).is_active
+
+    def test_registration_clears_missing_entry(self, client, app, db_session):
+        """测试注册新用户后“不存在”的缓存条目失效"""
+        assert get_user_state(1) is None
+        _register_and_login(client, 'newcomer')
+        assert get_user_state(1).username == 'newcomer'
+
+    def test_import_clears_cache(self, client, app, db_session):
+        """测试批量导入后缓存清空"""
+        import io
+        headers = _register_and_login(client, 'cacheadmin')
+        admin = User.query.filter_by(username='cacheadmin').first()
+        admin.role = 'admin'
+        db_session.commit()
+        headers = _register_and_login(client, 'cacheadmin')
+
+        assert get_user_state(admin.id + 1) is None
+        content = b'username,email,password\nimported,imported@example.com,password\n'
+        client.post('/api/users/import', headers=headers,
+                    data={'file': (io.BytesIO(content), 'a.csv')},
+                    content_type='multipart/form-data')
+        assert get_user_state(admin.id + 1).username == 'imported'
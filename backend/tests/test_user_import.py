@@ -0,0 +1,202 @@
+"""
+批量导入读者测试
+"""
+import io
+import time
+import pytest
+from openpyxl import Workbook
+from app import create_app, db
+from app.models import ImportJob, User
+from app.services.passwords import PasswordHasher
+from config import TestingConfig
+
+
+def _admin_headers(client, db_session):
+    client.post('/api/auth/register', json={
+        'username': 'importadmin',
+        'password': 'admin123',
+        'email': 'importadmin@example.com'
+    })
+    admin = User.query.filter_by(username='importadmin').first()
+    admin.role = 'admin'
+    db_session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': 'importadmin',
+        'password': 'admin123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _upload(client, headers, content, filename):
+    return client.post('/api/users/import', headers=headers,
+                       data={'file': (io.BytesIO(content), filename)},
+                       content_type='multipart/form-data')
+
+
+class TestHashMany:
+    """批量哈希测试"""
+
+    def test_parallel_hashes_match_input_order(self):
+        """测试进程池并行哈希结果与输入顺序一致"""
+        hasher = PasswordHasher(rounds=4)
+        passwords = [f'password{i}' for i in range(6)]
+        hashes = hasher.hash_many(passwords, workers=2)
+        assert len(hashes) == 6
+        assert all(hasher.verify(p, h) for p, h in zip(passwords, hashes))
+
+
+class TestUserImport:
+    """批量导入接口测试"""
+
+    def test_import_csv_with_error_report(self, client, app, db_session):
+        """测试 CSV 导入：有效行全部创建，无效行逐行报告"""
+        headers = _admin_headers(client, db_session)
+        content = (
+            'username,email,password\n'
+            'student1,s1@example.com,password1\n'
+            'student2,s2@example.com,password2\n'
+            'x,s3@example.com,password3\n'
+            'student4,bad-email,password4\n'
+            'student1,s5@example.com,password5\n'
+            'importadmin,s6@example.com,password6\n'
+            'student7,s1@example.com,password7\n'
+        ).encode('utf-8')
+
+        resp = _upload(client, headers, content, 'students.csv')
+        assert resp.status_code == 202
+        data = resp.get_json()['job']
+        assert data['status'] == 'done'
+        assert data['total'] == 7
+        assert data['created'] == 2
+        assert data['failed'] == 5
+        assert [(e['row'], e['code']) for e in data['errors']] == [
+            (4, 'INVALID_USERNAME'),
+            (5, 'INVALID_EMAIL'),
+            (6, 'USER_EXISTS'),
+            (7, 'USER_EXISTS'),
+            (8, 'EMAIL_EXISTS'),
+        ]
+
+        student = User.query.filter_by(username='student1').first()
+        assert student.role == 'reader'
+        assert student.is_active
+        assert student.check_password('password1')
+        login = client.post('/api/auth/login', json={'username': 'student2', 'password': 'password2'})
+        assert login.status_code == 200
+
+    def test_import_xlsx(self, client, app, db_session):
+        """测试 XLSX 导入"""
+        headers = _admin_headers(client, db_session)
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Username', 'Email', 'Password'])
+        for i in range(5):
+            sheet.append([f'xlsx{i}', f'xlsx{i}@example.com', f'secret{i}00'])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        resp = _upload(client, headers, buffer.getvalue(), 'students.xlsx')
+        assert resp.status_code == 202
+        assert resp.get_json()['job']['created'] == 5
+        assert User.query.filter(User.username.like('xlsx%')).count() == 5
+
+    def test_import_batches(self, client, app, db_session):
+        """测试多批次写入"""
+        headers = _admin_headers(client, db_session)
+        app.config['USER_IMPORT_BATCH_SIZE'] = 3
+        lines = ['username,email,password'] + [f'batch{i},batch{i}@example.com,password' for i in range(8)]
+        resp = _upload(client, headers, '\n'.join(lines).encode('utf-8'), 'batch.csv')
+        assert resp.get_json()['job']['created'] == 8
+        assert User.query.filter(User.username.like('batch%')).count() == 8
+
+    def test_rejects_bad_files(self, client, app, db_session):
+        """测试缺失文件、格式不支持与缺少列"""
+        headers = _admin_headers(client, db_session)
+        assert client.post('/api/users/import', headers=headers).status_code == 400
+        assert _upload(client, headers, b'data', 'students.txt').status_code == 400
+        resp = _upload(client, headers, b'username,email\na,b@example.com\n', 'students.csv')
+        assert resp.status_code == 400
+        assert resp.get_json()['error']['code'] == 'INVALID_FILE'
+
+    def test_requires_admin(self, client, app, db_session):
+        """测试非管理员不能导入"""
+        client.post('/api/auth/register', json={
+            'username': 'plainreader',
+            'password': 'password123',
+            'email': 'plainreader@example.com'
+        })
+        token = client.post('/api/auth/login', json={
+            'username': 'plainreader',
+            'password': 'password123'
+        }).get_json()['access_token']
+        resp = _upload(client, {'Authorization': f'Bearer {token}'}, b'username,email,password\n', 'a.csv')
+        assert resp.status_code == 403
+
+    def test_job_status(self, client, app, db_session):
+        """测试按任务ID查询状态与报告，任务不存在时返回 404"""
+        headers = _admin_headers(client, db_session)
+        resp = _upload(client, headers, b'username,email,password\njob1,job1@example.com,password1\nx,a@b.c,p\n',
+                       'readers.csv')
+        job_id = resp.get_json()['job']['id']
+        assert resp.headers['Location'] == f'/api/users/import/{job_id}'
+
+        resp = client.get(f'/api/users/import/{job_id}', headers=headers)
+        assert resp.status_code == 200
+        job = resp.get_json()['job']
+        assert (job['status'], job['created'], job['failed']) == ('done', 1, 1)
+        assert job['errors'][0]['row'] == 3
+        assert job['finished_at'] is not None
+        assert client.get('/api/users/import/999', headers=headers).status_code == 404
+
+    def test_row_limit(self, client, app, db_session):
+        """测试超出行数上限时拒绝"""
+        headers = _admin_headers(client, db_session)
+        app.config['USER_IMPORT_MAX_ROWS'] = 2
+        content = ''.join(['username,email,password\n'] +
+                          [f'limit{i},limit{i}@example.com,password{i}\n' for i in range(3)]).encode('utf-8')
+        resp = _upload(client, headers, content, 'readers.csv')
+        assert resp.status_code == 400
+        error = resp.get_json()['error']
+        assert error['code'] == 'TOO_MANY_ROWS'
+        assert User.query.filter(User.username.like('limit%')).count() == 0
+        assert ImportJob.query.count() == 0
+
+
+@pytest.fixture
+def background_app(tmp_path):
+    """后台线程需要与请求共享数据库，使用临时 SQLite 文件"""
+    class BackgroundConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path}/library.db'
+        USER_IMPORT_BACKGROUND = True
+
+    app = create_app(BackgroundConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    app.extensions['user_import_executor'].shutdown()
+
+
+class TestBackgroundImport:
+    """后台导入任务测试"""
+
+    def test_import_runs_in_background(self, background_app):
+        """测试接口立即返回 202，任务在后台完成后可查询报告"""
+        client = background_app.test_client()
+        headers = _admin_headers(client, db.session)
+        lines = ['username,email,password'] + [f'bg{i},bg{i}@example.com,password{i}' for i in range(20)]
+        resp = _upload(client, headers, '\n'.join(lines).encode('utf-8'), 'readers.csv')
+        assert resp.status_code == 202
+        job_id = resp.get_json()['job']['id']
+        assert resp.get_json()['job']['status'] in ('pending', 'running', 'done')
+
+        deadline = time.time() + 30
+        while True:
+            job = client.get(f'/api/users/import/{job_id}', headers=headers).get_json()['job']
+            if job['status'] in ('done', 'failed') or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        assert (job['status'], job['created'], job['failed']) == ('done', 20, 0)
+        login = client.post('/api/auth/login', json={'username': 'bg7', 'password': 'password7'})
+        assert login.status_code == 200
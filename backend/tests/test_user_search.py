@@ -0,0 +1,163 @@
+"""
+用户搜索与游标分页测试
+"""
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import User
+
+
+@pytest.fixture
+def admin_headers(client, db_session):
+    client.post('/api/auth/register', json={
+        'username': 'searchadmin',
+        'password': 'admin123',
+        'email': 'searchadmin@example.com'
+    })
+    admin = User.query.filter_by(username='searchadmin').first()
+    admin.role = 'admin'
+    admin.created_at = datetime(2020, 1, 1)
+    base = datetime(2024, 9, 1)
+    for i in range(25):
+        db_session.add(User(username=f'student{i:02d}', email=f'stu{i:02d}@school.edu',
+                            student_id=f'2024{i:04d}', role='reader', is_active=i % 5 != 0,
+                            password_hash='x', created_at=base + timedelta(minutes=i // 2)))
+    db_session.commit()
+    token = client.post('/api/auth/login', json={
+        'username': 'searchadmin',
+        'password': 'admin123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _query_plan(statement, parameters) -> str:
+    conn = db.session.connection().connection
+    cursor = conn.cursor()
+    cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return ' | '.join(row[-1] for row in cursor.fetchall())
+
+
+def _user_statements(fn):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement and 'password_hash' in statement:
+            statements.append((statement, parameters))
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        fn()
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+class TestUserSearch:
+    """前缀搜索测试"""
+
+    @pytest.mark.parametrize('q, expected', [
+        ('student1', 10),
+        ('stu01@', 1),
+        ('20240002', 1),
+        ('2024002', 5),
+    ])
+    def test_prefix_search(self, client, admin_headers, q, expected):
+        """测试按用户名、邮箱、学号前缀搜索"""
+        resp = client.get(f'/api/users?q={q}&per_page=50', headers=admin_headers)
+        assert resp.status_code == 200
+        assert len(resp.get_json()['users']) == expected
+
+    def test_explicit_field(self, client, admin_headers):
+        """测试显式指定搜索列"""
+        resp = client.get('/api/users?q=stu&field=email&per_page=50', headers=admin_headers)
+        assert len(resp.get_json()['users']) == 25
+        resp = client.get('/api/users?q=stu&field=username&per_page=50', headers=admin_headers)
+        assert len(resp.get_json()['users']) == 25
+
+    @pytest.mark.parametrize('q, expected', [
+        ('2019', 2),
+        ('student0z', 1),
+        ('studentZ', 0),
+    ])
+    def test_prefix_ending_in_9_or_z(self, client, admin_headers, db_session, q, expected):
+        """测试以 9、z 结尾的前缀（MySQL 排序规则下区间改写会得到空结果）"""
+        db_session.add(User(username='student0z', email='zz@school.edu', student_id='20190001',
+                            role='reader', password_hash='x'))
+        db_session.add(User(username='student0y', email='yy@school.edu', student_id='20199999',
+                            role='reader', password_hash='x'))
+        db_session.commit()
+        resp = client.get(f'/api/users?q={q}&per_page=50', headers=admin_headers)
+        assert len(resp.get_json()['users']) == expected
+
+    def test_wildcards_are_literal(self, client, admin_headers, db_session):
+        """测试搜索词中的 % 和 _ 按字面匹配"""
+        db_session.add(User(username='student_x', email='underscore@school.edu', role='reader',
+                            password_hash='x'))
+        db_session.commit()
+        resp = client.get('/api/users?q=student_&field=username&per_page=50', headers=admin_headers)
+        assert [u['username'] for u in resp.get_json()['users']] == ['student_x']
+        resp = client.get('/api/users?q=%25&field=username&per_page=50', headers=admin_headers)
+        assert resp.get_json()['users'] == []
+
+    def test_search_uses_prefix_like(self, app, client, admin_headers):
+        """测试前缀搜索使用不以通配符开头的 LIKE（MySQL 在唯一索引上做范围扫描）"""
+        statements = _user_statements(
+            lambda: client.get('/api/users?q=student1&cursor=', headers=admin_headers)
+        )
+        statement, parameters = statements[-1]
+        assert 'users.username LIKE ? ESCAPE' in statement
+        assert 'student1%' in parameters
+
+
+class TestCursorPagination:
+    """游标分页测试"""
+
+    def _collect(self, client, headers, query):
+        seen, cursor, pages = [], '', 0
+        while cursor is not None:
+            resp = client.get(f'/api/users?{query}&per_page=4&cursor={cursor}', headers=headers)
+            assert resp.status_code == 200
+            data = resp.get_json()
+            seen.extend(u['username'] for u in data['users'])
+            cursor = data['next_cursor']
+            pages += 1
+        return seen, pages
+
+    def test_walks_all_rows_in_order(self, client, admin_headers):
+        """测试游标遍历覆盖所有行且无重复（包括 created_at 相同的行）"""
+        seen, pages = self._collect(client, admin_headers, 'role=reader')
+        assert len(seen) == 25
+        assert len(set(seen)) == 25
+        assert pages == 7
+        expected = [u.username for u in User.query.filter_by(role='reader')
+                    .order_by(User.created_at.desc(), User.id.desc())]
+        assert seen == expected
+
+    def test_search_cursor(self, client, admin_headers):
+        """测试搜索结果的游标分页"""
+        seen, _ = self._collect(client, admin_headers, 'q=student')
+        assert seen == sorted(seen)
+        assert len(seen) == 25
+
+    def test_filtered_listing_uses_composite_index(self, app, client, admin_headers):
+        """测试按角色与状态筛选的列表走复合索引，且不发出 COUNT"""
+        statements = _user_statements(
+            lambda: client.get('/api/users?role=reader&is_active=true&cursor=', headers=admin_headers)
+        )
+        assert len(statements) == 1
+        plan = _query_plan(*statements[0])
+        assert 'idx_users_role_active_created' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_invalid_cursor(self, client, admin_headers):
+        """测试无效游标返回 400"""
+        resp = client.get('/api/users?cursor=not-a-cursor', headers=admin_headers)
+        assert resp.status_code == 400
+        assert resp.get_json()['error']['code'] == 'INVALID_CURSOR'
+
+    def test_page_mode_still_supported(self, client, admin_headers):
+        """测试未提供游标时仍支持页码分页"""
+        resp = client.get('/api/users?page=2&per_page=10', headers=admin_headers)
+        data = resp.get_json()
+        assert data['pagination']['total'] == 26
+        assert len(data['users']) == 10
@@ -0,0 +1,37 @@
+"""
+生产环境 WSGI 入口
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+开发环境仍使用 python run.py（Werkzeug 开发服务器）。
+"""
+import os
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from app import create_app, db
+from app.services.borrow_store import borrow_events
+from app.services.pool_metrics import all_engines
+from config import config
+
+app = create_app(config[os.environ.get('FLASK_ENV') or 'production'])
+
+
+def after_fork() -> None:
+    """
+    预加载模式下在每个工作进程 fork 之后调用
+
+    主进程创建应用时可能已经建立数据库连接（例如执行 CLI 命令或预热），
+    子进程不能复用这些连接：丢弃继承的连接池（不关闭，避免影响其他进程），
+    并让限流存储重新打开 SQLite 连接。最后启动借阅事件存储的后台加载线程，
+    使统计请求到达前数据已加载。
+    """
+    with app.app_context():
+        db.session.remove()
+    for engine in all_engines(app).values():
+        engine.dispose(close=False)
+    limiter = app.extensions.get('rate_limiter')
+    if hasattr(limiter, 'reset'):
+        limiter.reset()
+    borrow_events.start(app)
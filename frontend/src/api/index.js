@@ -22,16 +22,52 @@ api.interceptors.request.use(
   }
 )
 
+// 刷新 access token，并发的 401 请求共用同一次刷新
+let refreshing = null
+
+function refreshAccessToken() {
+  const refreshToken = localStorage.getItem('refreshToken')
+  if (!refreshToken) {
+    return Promise.reject(new Error('no refresh token'))
+  }
+  if (!refreshing) {
+    refreshing = axios.post('/api/auth/refresh', null, {
+      headers: { Authorization: `Bearer ${refreshToken}` },
+      timeout: 10000
+    }).then(res => {
+      localStorage.setItem('token', res.data.access_token)
+      localStorage.setItem('refreshToken', res.data.refresh_token)
+      return res.data.access_token
+    }).finally(() => {
+      refreshing = null
+    })
+  }
+  return refreshing
+}
+
 // 响应拦截器
 api.interceptors.response.use(
   response => {
     return response.data
   },
-  error => {
+  async error => {
+    const config = error.config
+    if (error.response && error.response.status === 401 && config && !config._retried &&
+        !config.url.startsWith('/auth/')) {
+      config._retried = true
+      try {
+        const token = await refreshAccessToken()
+        config.headers.Authorization = `Bearer ${token}`
+        return api(config)
+      } catch (e) {
+        // 刷新失败，按登录过期处理
+      }
+    }
     if (error.response) {
       const { status, data } = error.response
       if (status === 401) {
         localStorage.removeItem('token')
+        localStorage.removeItem('refreshToken')
         router.push('/login')
         ElMessage.error('登录已过期，请重新登录')
       } else if (data && data.error) {
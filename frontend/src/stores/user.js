@@ -3,6 +3,7 @@ import { ref } from 'vue'
 
 export const useUserStore = defineStore('user', () => {
   const token = ref(localStorage.getItem('token') || '')
+  const refreshToken = ref(localStorage.getItem('refreshToken') || '')
   const userInfo = ref(JSON.parse(localStorage.getItem('userInfo') || '{}'))
 
   function setToken(newToken) {
@@ -10,6 +11,11 @@ export const useUserStore = defineStore('user', () => {
     localStorage.setItem('token', newToken)
   }
 
+  function setRefreshToken(newToken) {
+    refreshToken.value = newToken
+    localStorage.setItem('refreshToken', newToken)
+  }
+
   function setUserInfo(info) {
     userInfo.value = info
     localStorage.setItem('userInfo', JSON.stringify(info))
@@ -17,8 +23,10 @@ export const useUserStore = defineStore('user', () => {
 
   function logout() {
     token.value = ''
+    refreshToken.value = ''
     userInfo.value = {}
     localStorage.removeItem('token')
+    localStorage.removeItem('refreshToken')
     localStorage.removeItem('userInfo')
   }
 
@@ -28,8 +36,10 @@ export const useUserStore = defineStore('user', () => {
 
   return {
     token,
+    refreshToken,
     userInfo,
     setToken,
+    setRefreshToken,
     setUserInfo,
     logout,
     isAdmin